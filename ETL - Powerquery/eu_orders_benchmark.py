@@ -0,0 +1,227 @@
+"""
+Benchmarks for eu_orders_etl_skript.py
+
+1. Parallel transform vs. core count (default): generates a few synthetic
+   regional order CSVs, runs the serial streaming pipeline once and the
+   process-pool pipeline with 1, 2, 4, ... workers (up to the CPU count), and
+   prints wall time, throughput and speedup against the serial run.
+
+2. Scale (--scale 1M 10M 100M): generates one synthetic export per size
+   (eu_orders_synthetic.py, cached in --data-dir so reruns skip it) and runs
+   each pipeline mode in a fresh process, so every peak memory figure is
+   that mode's own. Prints throughput and peak memory, and appends one JSON
+   line per size and mode, tagged with the git commit, to --results. Rerun
+   on another commit to see the change against the last result of a
+   different commit. The in-memory mode is skipped above --memory-max-rows.
+
+Usage:
+    python eu_orders_benchmark.py
+    python eu_orders_benchmark.py --files 16 --rows 500000 --chunksize 200000
+    python eu_orders_benchmark.py --scale
+    python eu_orders_benchmark.py --scale 1M 10M --modes stream parallel --duplicate-rate 0.05
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+import eu_orders_etl_skript as etl
+from eu_orders_synthetic import generate_orders, parse_rows
+
+MODES = ("memory", "stream", "parallel")
+DEFAULT_SCALE = ["1M", "10M", "100M"]
+DEFAULT_DATA_DIR = Path(tempfile.gettempdir()) / "eu_orders_benchmark"
+DEFAULT_RESULTS = etl.SCRIPT_DIR / "eu_orders_benchmark_results.jsonl"
+
+
+def write_regional_files(folder, files, rows, seed=42):
+    """Write `files` CSVs with `rows` orders each; ~5% repeated OrderIDs."""
+    paths = []
+    for i in range(files):
+        path = Path(folder) / f"orders_region_{i:02d}.csv"
+        generate_orders(path, rows, seed=seed + i, first_order_id=100_000 + i * rows,
+                        duplicate_rate=0.05, non_eu_share=0.25)
+        paths.append(path)
+    return paths
+
+
+def timed_run(func, *args, **kwargs):
+    """Run one pipeline quietly and return its wall time in seconds."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def git_commit():
+    """Short hash of the checked-out commit (+ "-dirty" with local changes)."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=etl.SCRIPT_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=etl.SCRIPT_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit + ("-dirty" if dirty else "")
+
+
+def run_one(mode, csv_path, output, chunksize, workers):
+    """Child process side of --scale: run one mode and print its numbers as JSON."""
+    pipelines = {
+        "memory": lambda: etl.etl_pipeline_in_memory([csv_path], output, preview=False),
+        "stream": lambda: etl.etl_pipeline_streaming([csv_path], output, chunksize, preview=False),
+        "parallel": lambda: etl.etl_pipeline_parallel([csv_path], output, chunksize, workers=workers),
+    }
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = pipelines[mode]()
+    seconds = time.perf_counter() - start
+    print(json.dumps({
+        "seconds": seconds,
+        "peak_rss_bytes": max((m["peak_rss_bytes"] or 0) for m in stats.metrics.values()) or etl.peak_rss_bytes(),
+        "rows_out": stats.metrics["load"]["rows_out"],
+        "stages": {stage: m["wall_seconds"] for stage, m in stats.metrics.items()},
+    }))
+
+
+def previous_results(results_path, commit):
+    """Latest result per (rows, mode) from a commit other than this one."""
+    previous = {}
+    if results_path.exists():
+        for line in results_path.read_text(encoding="utf-8").splitlines():
+            record = json.loads(line)
+            if record["commit"] != commit:
+                previous[(record["rows"], record["mode"])] = record
+    return previous
+
+
+def scale_benchmark(args):
+    sizes = [parse_rows(size) for size in args.scale]
+    data_dir = Path(args.data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    results_path = Path(args.results)
+    commit = git_commit()
+    previous = previous_results(results_path, commit)
+    workers = args.workers or os.cpu_count() or 1
+    options = {"duplicate_rate": args.duplicate_rate, "missing_email_rate": args.missing_email_rate,
+               "non_eu_share": args.non_eu_share}
+
+    print(f"📏 Scale benchmark at commit {commit} ({os.cpu_count()} CPU core(s), parallel with {workers} workers)")
+    print(f"\n{'rows':>12} {'mode':<9} {'seconds':>9} {'rows/sec':>12} {'peak MB':>9} {'vs last':>16}")
+    for rows in sizes:
+        name = "_".join(f"{value:g}" for value in options.values())
+        csv_path = data_dir / f"orders_{rows}_{name}.csv"
+        if not csv_path.exists():
+            print(f"🧪 Generating {rows:,} rows into {csv_path}...")
+            generate_orders(csv_path.with_suffix(".tmp"), rows, **options)
+            csv_path.with_suffix(".tmp").replace(csv_path)
+
+        for mode in args.modes:
+            if mode == "memory" and rows > args.memory_max_rows:
+                print(f"{rows:>12,} {mode:<9} {'skipped (above --memory-max-rows)':>49}")
+                continue
+            with tempfile.TemporaryDirectory(dir=data_dir) as folder:
+                child = subprocess.run(
+                    [sys.executable, __file__, "--run-one", mode, str(csv_path), str(Path(folder) / "clean.csv"),
+                     "--chunksize", str(args.chunksize), "--workers", str(workers)],
+                    cwd=etl.SCRIPT_DIR, capture_output=True, text=True,
+                )
+            if child.returncode != 0:
+                print(f"{rows:>12,} {mode:<9} failed: {child.stderr.strip().splitlines()[-1:]}")
+                continue
+            run = json.loads(child.stdout.strip().splitlines()[-1])
+            record = {
+                "commit": commit,
+                "run_at": pd.Timestamp.now().isoformat(timespec="seconds"),
+                "rows": rows,
+                "mode": mode,
+                "workers": workers if mode == "parallel" else 1,
+                "chunksize": args.chunksize,
+                **options,
+                "seconds": round(run["seconds"], 3),
+                "rows_per_sec": round(rows / run["seconds"]),
+                "peak_rss_mb": round(run["peak_rss_bytes"] / 1e6, 1) if run["peak_rss_bytes"] else None,
+                "rows_out": run["rows_out"],
+                "stage_seconds": {stage: round(s, 3) for stage, s in run["stages"].items()},
+                "python": platform.python_version(),
+                "pandas": pd.__version__,
+                "cpus": os.cpu_count(),
+            }
+            with open(results_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+            last = previous.get((rows, mode))
+            change = (f"{record['rows_per_sec'] / last['rows_per_sec'] - 1:+.0%} @ {last['commit']}"
+                      if last else "")
+            peak = f"{record['peak_rss_mb']:9.1f}" if record["peak_rss_mb"] is not None else f"{'n/a':>9}"
+            print(f"{rows:>12,} {mode:<9} {record['seconds']:9.2f} {record['rows_per_sec']:>12,} {peak} {change:>16}")
+
+    print(f"\n💾 Results appended to {results_path}")
+
+
+def workers_benchmark(args):
+    cpus = os.cpu_count() or 1
+    worker_counts = [1]
+    while worker_counts[-1] * 2 <= cpus:
+        worker_counts.append(worker_counts[-1] * 2)
+    if worker_counts[-1] != cpus:
+        worker_counts.append(cpus)
+
+    with tempfile.TemporaryDirectory() as folder:
+        print(f"🧪 Generating {args.files} files x {args.rows:,} rows...")
+        csv_paths = write_regional_files(folder, args.files, args.rows)
+        total_rows = args.files * args.rows
+        output = Path(folder) / "clean.csv"
+
+        print(f"\n{'mode':<12} {'workers':>7} {'seconds':>9} {'rows/sec':>14} {'speedup':>8}")
+        serial = timed_run(etl.etl_pipeline_streaming, csv_paths, output, args.chunksize, preview=False)
+        print(f"{'serial':<12} {1:>7} {serial:9.2f} {total_rows / serial:>14,.0f} {1.0:>7.2f}x")
+        for workers in worker_counts:
+            seconds = timed_run(etl.etl_pipeline_parallel, csv_paths, output, args.chunksize, workers=workers)
+            print(f"{'process pool':<12} {workers:>7} {seconds:9.2f} {total_rows / seconds:>14,.0f} {serial / seconds:>7.2f}x")
+
+    print(f"\n💡 {cpus} CPU core(s) available. Speedup flattens once the serial parts")
+    print("   (global OrderID dedupe and writing the output) dominate.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the EU orders ETL")
+    parser.add_argument("--files", type=int, default=8, help="number of regional CSVs")
+    parser.add_argument("--rows", type=parse_rows, default=250_000, help="rows per CSV")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="rows per chunk / piece")
+    parser.add_argument("--scale", nargs="*", metavar="ROWS",
+                        help=f"run the scale benchmark at these sizes (default: {' '.join(DEFAULT_SCALE)})")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES), help="pipelines for --scale")
+    parser.add_argument("--workers", type=int, default=None, help="workers for the parallel mode (default: CPUs)")
+    parser.add_argument("--memory-max-rows", type=parse_rows, default=10_000_000,
+                        help="largest size the in-memory mode runs at (default: 10M)")
+    parser.add_argument("--duplicate-rate", type=float, default=0.02)
+    parser.add_argument("--missing-email-rate", type=float, default=0.1)
+    parser.add_argument("--non-eu-share", type=float, default=0.1)
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="where generated CSVs are cached")
+    parser.add_argument("--results", default=DEFAULT_RESULTS, help="JSON lines file results are appended to")
+    parser.add_argument("--run-one", nargs=3, metavar=("MODE", "CSV", "OUTPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        mode, csv_path, output = args.run_one
+        run_one(mode, Path(csv_path), Path(output), args.chunksize, args.workers)
+    elif args.scale is not None:
+        args.scale = args.scale or DEFAULT_SCALE
+        scale_benchmark(args)
+    else:
+        workers_benchmark(args)
+
+
+if __name__ == "__main__":
+    main()
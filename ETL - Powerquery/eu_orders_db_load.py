@@ -0,0 +1,223 @@
+"""
+Bulk database loader for the EU orders ETL — Day 3
+
+df.to_sql(..., if_exists="append") sends one INSERT per row. These loaders
+push a whole chunk per round trip instead, inside one transaction per chunk,
+and upsert on OrderID so reruns never create duplicates:
+
+- SQLite:   one prepared INSERT ... ON CONFLICT(OrderID) DO UPDATE run with
+            executemany() over batches of rows (SQLite has no COPY)
+- Postgres: COPY ... FROM STDIN (CSV) into a temp staging table, then one
+            INSERT ... SELECT ... ON CONFLICT (OrderID) DO UPDATE
+            Needs: pip install psycopg2-binary
+
+Used by eu_orders_etl_skript.py --format sqlite/postgres --db TARGET.
+Run this file for a quick SQLite demo (load twice, still one row per order):
+    python eu_orders_db_load.py
+    python eu_orders_db_load.py --postgres "dbname=etl user=etl host=localhost"
+Tests (Postgres only with EU_ORDERS_TEST_POSTGRES_DSN set to a scratch database):
+    pytest test_eu_orders_db_load.py
+"""
+
+import argparse
+import csv
+import io
+import sqlite3
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+DEFAULT_TABLE = "eu_orders_clean"
+DEFAULT_BATCH_ROWS = 50_000
+
+
+def sql_type(dtype, date_column=False):
+    """SQL column type for a pandas dtype (works for SQLite and Postgres)."""
+    if pd.api.types.is_bool_dtype(dtype):
+        return "BOOLEAN"
+    if pd.api.types.is_integer_dtype(dtype):
+        return "BIGINT"
+    if pd.api.types.is_float_dtype(dtype):
+        return "DOUBLE PRECISION"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "DATE" if date_column else "TIMESTAMP"
+    return "TEXT"
+
+
+class BulkLoader:
+    """Shared part of the loaders: table layout and row conversion.
+
+    The table is created from the first chunk's columns, with key as primary
+    key. Datetime columns listed in date_columns are stored as dates, other
+    datetimes as timestamps.
+    """
+
+    def __init__(self, table=DEFAULT_TABLE, key="OrderID", date_columns=("OrderDate",),
+                 batch_rows=DEFAULT_BATCH_ROWS):
+        self.table = table
+        self.key = key
+        self.date_columns = set(date_columns)
+        self.batch_rows = batch_rows
+        self.columns = None
+
+    def _create_table_sql(self, df):
+        columns = ", ".join(
+            f'"{col}" {sql_type(df[col].dtype, col in self.date_columns)}'
+            + (" PRIMARY KEY" if col == self.key else "")
+            for col in df.columns
+        )
+        return f'CREATE TABLE IF NOT EXISTS "{self.table}" ({columns})'
+
+    def _upsert_sql(self, source):
+        names = ", ".join(f'"{col}"' for col in self.columns)
+        updates = ", ".join(f'"{col}" = excluded."{col}"' for col in self.columns if col != self.key)
+        return (f'INSERT INTO "{self.table}" ({names}) {source} '
+                f'ON CONFLICT ("{self.key}") DO UPDATE SET {updates}')
+
+    def _as_text(self, df):
+        """Dates/timestamps as ISO strings, the format both databases parse."""
+        df = df.copy()
+        for col in df.columns:
+            if pd.api.types.is_datetime64_any_dtype(df[col]):
+                fmt = "%Y-%m-%d" if col in self.date_columns else "%Y-%m-%d %H:%M:%S.%f"
+                df[col] = df[col].dt.strftime(fmt)
+        return df
+
+    def batches(self, df):
+        for start in range(0, len(df), self.batch_rows):
+            yield df.iloc[start:start + self.batch_rows]
+
+
+class SQLiteBulkLoader(BulkLoader):
+    """Upserts chunks into a SQLite file, one transaction per chunk."""
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path)
+        # WAL + NORMAL sync: one fsync per transaction instead of several
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+
+    def __str__(self):
+        return f"{self.path} (table {self.table})"
+
+    def load_chunk(self, df):
+        """Upsert df; returns the size of the inserted rows as CSV bytes.
+
+        Not the growth of the .db file: under WAL the pages go to the -wal
+        file first and are copied over at checkpoints, so the .db size hardly
+        moves per chunk. CSV bytes are also what PostgresBulkLoader reports.
+        """
+        if len(df) == 0:
+            return 0
+        inserted = 0
+        with self.conn:  # one transaction, rolled back on error
+            if self.columns is None:
+                self.conn.execute(self._create_table_sql(df))
+                self.columns = list(df.columns)
+            values = ", ".join("?" * len(self.columns))
+            sql = self._upsert_sql(f"VALUES ({values})")
+            for batch in self.batches(self._as_text(df[self.columns])):
+                rows = batch.astype(object).where(batch.notna(), None).itertuples(index=False, name=None)
+                self.conn.executemany(sql, rows)
+                inserted += len(batch.to_csv(index=False, header=False, quoting=csv.QUOTE_MINIMAL))
+        return inserted
+
+    def count(self):
+        return self.conn.execute(f'SELECT COUNT(*) FROM "{self.table}"').fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+class PostgresBulkLoader(BulkLoader):
+    """COPYs chunks into a staging table and upserts them, one transaction per chunk."""
+
+    def __init__(self, dsn, **kwargs):
+        import psycopg2
+
+        super().__init__(**kwargs)
+        self.conn = psycopg2.connect(dsn)
+
+    def __str__(self):
+        return f"Postgres table {self.table}"
+
+    def load_chunk(self, df):
+        """Upsert df; returns the number of CSV bytes sent with COPY."""
+        if len(df) == 0:
+            return 0
+        sent = 0
+        with self.conn:  # psycopg2: commit on success, rollback on error
+            with self.conn.cursor() as cur:
+                if self.columns is None:
+                    cur.execute(self._create_table_sql(df))
+                    self.columns = list(df.columns)
+                cur.execute(f'CREATE TEMP TABLE IF NOT EXISTS "{self.table}_stage" '
+                            f'(LIKE "{self.table}" INCLUDING DEFAULTS) ON COMMIT DELETE ROWS')
+                names = ", ".join(f'"{col}"' for col in self.columns)
+                for batch in self.batches(self._as_text(df[self.columns])):
+                    buffer = io.StringIO()
+                    batch.to_csv(buffer, index=False, header=False, quoting=csv.QUOTE_MINIMAL)
+                    sent += buffer.tell()
+                    buffer.seek(0)
+                    cur.copy_expert(f'COPY "{self.table}_stage" ({names}) FROM STDIN WITH (FORMAT csv)', buffer)
+                cur.execute(self._upsert_sql(f'SELECT {names} FROM "{self.table}_stage"'))
+        return sent
+
+    def count(self):
+        with self.conn.cursor() as cur:
+            cur.execute(f'SELECT COUNT(*) FROM "{self.table}"')
+            return cur.fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+def open_loader(output_format, target, **kwargs):
+    """SQLiteBulkLoader for "sqlite" (target = file path), PostgresBulkLoader
+    for "postgres" (target = libpq DSN / URL)."""
+    if output_format == "sqlite":
+        return SQLiteBulkLoader(target, **kwargs)
+    return PostgresBulkLoader(target, **kwargs)
+
+
+def demo(loader):
+    """Load the same chunk twice: the second load updates, it never duplicates."""
+    chunk = pd.DataFrame({
+        "OrderID": [1001, 1002, 1004],
+        "CustomerName": ["Hans Müller", "Marie Dubois", "Luigi Rossi"],
+        "Country": ["DE", "FR", "IT"],
+        "Amount": [150.0, 200.0, 175.5],
+        "OrderDate": pd.to_datetime(["2025-01-15", "2025-01-16", "2025-01-18"]),
+        "HighValue": [False, False, False],
+        "ProcessedDate": pd.Timestamp.now(),
+    })
+    loader.load_chunk(chunk)
+    print(f"✓ First load:  {loader.count()} rows")
+    chunk.loc[0, "Amount"] = 250.0
+    loader.load_chunk(chunk)
+    print(f"✓ Second load: {loader.count()} rows (OrderID 1001 updated, no duplicates)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk loader demo (SQLite, optional Postgres)")
+    parser.add_argument("--postgres", metavar="DSN", help="also run the demo against this Postgres database")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        print("SQLite:")
+        loader = SQLiteBulkLoader(Path(folder) / "orders.db", table="demo_orders")
+        demo(loader)
+        loader.close()
+
+    if args.postgres:
+        try:
+            print("\nPostgres:")
+            loader = PostgresBulkLoader(args.postgres, table="demo_orders")
+            demo(loader)
+            loader.close()
+        except ImportError:
+            print("psycopg2 not installed")
+            print("Install with: pip install psycopg2-binary")
@@ -6,69 +6,1139 @@ Steps:
 1. Extract from CSV
 2. Transform: Clean, standardize, enrich
 3. Load: Save as clean CSV
+
+Modes:
+- in-memory (default): read the whole CSV at once, fine for small files
+- streaming (--stream): run extract → transform → load chunk by chunk,
+  memory stays flat no matter how big the export is
+
+Dedup index (--dedup-index): OrderIDs are remembered on disk between runs,
+so reruns and overlapping exports never load the same order twice. Once the
+index exists, new rows are appended to eu_orders_clean.csv instead of
+replacing it.
+
+Incremental runs (--incremental): a state file remembers the high-water mark
+(max OrderDate/OrderID) and how far each source file was read. The next run
+only extracts rows appended since then (or, for new/rewritten files, rows
+above the watermark) and appends them to eu_orders_clean.csv. Combine with
+--dedup-index to be safe against reruns after a crash.
+
+Parquet output (--format parquet): instead of the clean CSV, write a typed,
+zstd-compressed Parquet dataset partitioned by Country and order month
+(Country=DE/OrderMonth=2025-01/...). Power BI, DuckDB or pandas can then read
+only the partitions and columns they need. Needs: pip install pyarrow
+
+Database output (--format sqlite|postgres --db TARGET): bulk-load each chunk
+into a table, one transaction per chunk, upserting on OrderID so reruns
+are idempotent (see eu_orders_db_load.py). Postgres uses COPY and needs:
+pip install psycopg2-binary
+
+Parallel transform (--workers N): input files are cut into line-aligned
+byte ranges of about --chunksize rows; a process pool extracts and transforms
+them, and the parent dedupes and loads the results in input order. Output is
+identical to the serial run. Benchmark: python eu_orders_benchmark.py
+
+Benchmarks: python eu_orders_benchmark.py (speedup vs. workers) and
+python eu_orders_benchmark.py --scale (throughput and peak memory at
+1M/10M/100M synthetic rows from eu_orders_synthetic.py, logged per commit).
+
+Transform spec (--spec tenant.yaml): the transform rules (required columns,
+fills, country allow-list, VAT rate, HighValue threshold) are data, see
+DEFAULT_TRANSFORM_SPEC. They are compiled into a single vectorized pass per
+chunk, e.g.:
+    allow: {Country: [AT, DE]}
+    derive: {AmountWithVAT: {multiply: [Amount, 1.20]},
+             HighValue: {greater_than: [Amount, 500]}}
+Keys left out of a spec file are not applied, so start from a full copy.
+
+Metrics (--metrics json|prometheus, --metrics-file): per stage wall time,
+CPU time, rows in/out, bytes read/written and peak memory, as JSON lines
+(appended, one line per stage and run) or Prometheus text (for the
+node_exporter textfile collector). --no-preview skips the df.head() prints.
+
+Usage:
+    python eu_orders_etl_skript.py
+    python eu_orders_etl_skript.py --stream --chunksize 500000
+    python eu_orders_etl_skript.py --stream --dedup-index export_a.csv export_b.csv
+    python eu_orders_etl_skript.py --incremental --dedup-index
+    python eu_orders_etl_skript.py --stream --format parquet
+    python eu_orders_etl_skript.py --stream --format postgres --db "postgresql://etl@localhost/warehouse"
+    python eu_orders_etl_skript.py --workers 8 regional/*.csv
+    python eu_orders_etl_skript.py --stream --no-preview --metrics json --metrics-file etl_metrics.jsonl
 """
 
+import argparse
+import hashlib
+import itertools
+import io
+import json
+import os
+import shutil
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
-def etl_pipeline():
+SCRIPT_DIR = Path(__file__).parent
+EU_COUNTRIES = ["DE", "FR", "IT", "ES", "NL"]
+DEFAULT_CHUNKSIZE = 100_000
+DEFAULT_DEDUP_INDEX = SCRIPT_DIR / "eu_orders_seen_ids.npy"
+DEFAULT_STATE_FILE = SCRIPT_DIR / "eu_orders_etl_state.json"
+# Read schema for the order CSVs. Country has a handful of distinct values,
+# so a categorical stores one small code per row instead of one string.
+# OrderDate is parsed while reading. Amount stays float64: it is money, and
+# float32 would change the VAT results. OrderID is downcast after reading.
+ORDER_DTYPES = {"CustomerName": "str", "Email": "str", "Country": "category"}
+ORDER_DATE_COLUMNS = ["OrderDate"]
+ORDER_DATE_FORMAT = "%Y-%m-%d"
+CLEAN_CSV = SCRIPT_DIR / "eu_orders_clean.csv"
+CLEAN_PARQUET_DIR = SCRIPT_DIR / "eu_orders_clean_parquet"
+CLEAN_SQLITE_DB = SCRIPT_DIR / "eu_orders_clean.db"
+DB_FORMATS = ("sqlite", "postgres")
+FINGERPRINT_BYTES = 64 * 1024
+
+
+def peak_rss_bytes():
+    """Peak resident memory of this process so far (None on Windows)."""
+    # Linux: VmHWM starts fresh at exec; ru_maxrss keeps the parent's peak
+    # when the process was started by a bigger one (subprocess.run)
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class StageStats:
+    """Per-stage metrics for extract/transform/load.
+
+    For every stage: wall and CPU seconds, rows in/out, bytes read/written and
+    the peak resident memory of the process seen at the end of the stage.
+    Peak memory only ever grows, so the first stage where it jumps is the one
+    that needed the memory. In the process-pool mode, extract/transform times
+    are summed over the workers and the peak is the largest worker's.
+    """
+
+    STAGES = ("extract", "transform", "load")
+    FIELDS = ("wall_seconds", "cpu_seconds", "rows_in", "rows_out", "bytes_read", "bytes_written", "rows_rejected")
+
+    def __init__(self, mode="memory"):
+        self.mode = mode
+        self.run_id = pd.Timestamp.now().isoformat()
+        self.metrics = {stage: {**dict.fromkeys(self.FIELDS, 0), "peak_rss_bytes": None} for stage in self.STAGES}
+
+    @contextmanager
+    def measure(self, stage):
+        """Time the block; the block adds rows/bytes to the yielded dict."""
+        metrics = self.metrics[stage]
+        wall, cpu = time.perf_counter(), time.process_time()
+        yield metrics
+        metrics["wall_seconds"] += time.perf_counter() - wall
+        metrics["cpu_seconds"] += time.process_time() - cpu
+        self._note_peak(metrics, peak_rss_bytes())
+
+    def add(self, stage, peak_rss_bytes=None, **values):
+        """Add numbers measured somewhere else (e.g. in a pool worker)."""
+        metrics = self.metrics[stage]
+        for field, value in values.items():
+            metrics[field] += value
+        self._note_peak(metrics, peak_rss_bytes)
+
+    @staticmethod
+    def _note_peak(metrics, peak):
+        if peak is not None:
+            metrics["peak_rss_bytes"] = max(metrics["peak_rss_bytes"] or 0, peak)
+
+    def report(self):
+        print("⏱️ Stage metrics:")
+        print(f"   {'stage':<9} {'rows in':>12} {'rows out':>12} {'wall s':>8} {'cpu s':>8} "
+              f"{'rows/sec':>12} {'MB read':>9} {'MB written':>10} {'peak MB':>8}")
+        for stage, m in self.metrics.items():
+            rate = m["rows_in"] / m["wall_seconds"] if m["wall_seconds"] > 0 else float("inf")
+            peak = f"{m['peak_rss_bytes'] / 1e6:8.1f}" if m["peak_rss_bytes"] is not None else f"{'n/a':>8}"
+            print(f"   {stage:<9} {m['rows_in']:>12,} {m['rows_out']:>12,} {m['wall_seconds']:8.3f} "
+                  f"{m['cpu_seconds']:8.3f} {rate:>12,.0f} {m['bytes_read'] / 1e6:9.1f} "
+                  f"{m['bytes_written'] / 1e6:10.1f} {peak}")
+        rejected = sum(m["rows_rejected"] for m in self.metrics.values())
+        if rejected:
+            print(f"⚠️ {rejected:,} rows rejected: OrderID missing or not a whole number")
+
+    def to_json_lines(self):
+        """One JSON object per stage, e.g. for a nightly metrics log."""
+        return "".join(
+            json.dumps({"run_id": self.run_id, "mode": self.mode, "stage": stage, **metrics}) + "\n"
+            for stage, metrics in self.metrics.items()
+        )
+
+    def to_prometheus(self):
+        """Prometheus text exposition format, one gauge per field."""
+        lines = []
+        for field in (*self.FIELDS, "peak_rss_bytes"):
+            name = f"eu_orders_etl_{field}"
+            lines.append(f"# TYPE {name} gauge")
+            for stage, metrics in self.metrics.items():
+                if metrics[field] is not None:
+                    lines.append(f'{name}{{stage="{stage}",mode="{self.mode}"}} {metrics[field]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, metrics_format, path=None):
+        """Print the metrics or write them to path.
+
+        JSON lines are appended (one history file), Prometheus text replaces
+        the file atomically (the textfile collector reads the latest state).
+        """
+        text = self.to_json_lines() if metrics_format == "json" else self.to_prometheus()
+        if path is None:
+            print(text, end="")
+        elif metrics_format == "json":
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(text)
+        else:
+            tmp_path = Path(str(path) + ".tmp")
+            tmp_path.write_text(text, encoding="utf-8")
+            os.replace(tmp_path, path)
+
+
+class OrderIDIndex:
+    """Compact set of already loaded OrderIDs, optionally persisted as .npy.
+
+    IDs live in sorted int64 arrays (8 bytes per ID), lookups are binary
+    searches (O(log n)). The saved file is memory-mapped on load, so even
+    hundreds of millions of IDs are not read into RAM just to check a chunk.
+    IDs added during a run are kept as a few sorted "runs" that are merged
+    together now and then, and into the file on save().
+    checkpoint() makes the IDs added since the last checkpoint durable
+    without rewriting the whole file: they are appended to <index>.log,
+    which is read back on load and folded into the file by save().
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self.log_path = self.path.with_name(self.path.name + ".log") if self.path else None
+        self._base = np.empty(0, dtype=np.int64)
+        self._runs = []
+        self._unlogged = []
+        if self.path and self.path.exists():
+            self._base = np.load(self.path, mmap_mode="r")
+        if self.log_path and self.log_path.exists():
+            data = self.log_path.read_bytes()
+            logged = np.unique(np.frombuffer(data[:len(data) // 8 * 8], dtype="<i8").astype(np.int64))
+            logged = logged[~self.contains(logged)]  # a crash between save() and removing the log
+            if len(logged):
+                self._runs.append(logged)
+
+    def __len__(self):
+        return len(self._base) + sum(len(run) for run in self._runs)
+
+    def contains(self, ids):
+        """Boolean mask: which of ids are already in the index."""
+        ids = np.asarray(ids, dtype=np.int64)
+        # Searching with sorted needles walks the index in order (cache friendly)
+        order = np.argsort(ids)
+        needles = ids[order]
+        found_sorted = np.zeros(len(ids), dtype=bool)
+        for arr in [self._base, *self._runs]:
+            if len(arr) == 0:
+                continue
+            pos = np.searchsorted(arr, needles)
+            pos[pos == len(arr)] = len(arr) - 1
+            found_sorted |= arr[pos] == needles
+        found = np.empty_like(found_sorted)
+        found[order] = found_sorted
+        return found
+
+    def add_new(self, ids):
+        """Add ids and return a mask of the ones that were new.
+
+        Only the first occurrence of an ID inside ids counts as new, the same
+        "keep first" rule as drop_duplicates().
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        _, first_pos = np.unique(ids, return_index=True)
+        new = np.zeros(len(ids), dtype=bool)
+        new[first_pos] = True
+        new &= ~self.contains(ids)
+        if new.any():
+            self._runs.append(np.sort(ids[new]))
+            if self.log_path is not None:
+                self._unlogged.append(self._runs[-1])
+            # Merge runs of similar size (like a binary counter): this keeps
+            # only O(log n) runs to search and each ID is re-sorted rarely
+            while len(self._runs) > 1 and len(self._runs[-2]) <= 2 * len(self._runs[-1]):
+                last = self._runs.pop()
+                self._runs[-1] = np.sort(np.concatenate([self._runs[-1], last]), kind="stable")
+        return new
+
+    def checkpoint(self):
+        """Append the IDs added since the last checkpoint to the log and fsync it."""
+        if self.log_path is None or not self._unlogged:
+            return
+        with open(self.log_path, "ab") as f:
+            f.write(np.concatenate(self._unlogged).astype("<i8").tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self._unlogged = []
+
+    def save(self):
+        """Merge everything into one sorted array and write it atomically."""
+        if self.path is None or not self._runs:
+            return
+        merged = np.sort(np.concatenate([np.asarray(self._base), *self._runs]), kind="stable")
+        # Release the memory map before replacing the file (needed on Windows)
+        self._base = merged
+        self._runs = []
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, merged)
+        os.replace(tmp_path, self.path)
+        self._unlogged = []
+        self.log_path.unlink(missing_ok=True)  # everything in it is in the file now
+
+
+def _sha256_range(path, start, length):
+    with open(path, "rb") as f:
+        f.seek(start)
+        return hashlib.sha256(f.read(length)).hexdigest()
+
+
+def _complete_lines_end(path, size, block=64 * 1024):
+    """Offset just after the last b"\n" in the first size bytes of path (0 if none)."""
+    with open(path, "rb") as f:
+        pos = size
+        while pos > 0:
+            start = max(0, pos - block)
+            f.seek(start)
+            newline = f.read(pos - start).rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            pos = start
+    return 0
+
+
+class _FileRegion(io.RawIOBase):
+    """Read-only view of bytes [start, end) of a file, for pd.read_csv."""
+
+    def __init__(self, path, start, end):
+        self._file = open(path, "rb")
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._file.read(min(len(buffer), self._remaining))
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def above_watermark(df, watermark):
+    """Mask of rows newer than watermark = (OrderDate, OrderID)."""
+    if watermark is None:
+        return pd.Series(True, index=df.index)
+    wm_date, wm_id = watermark
+    dates = pd.to_datetime(df["OrderDate"], errors="coerce")
+    return (dates > wm_date) | ((dates == wm_date) & (df["OrderID"] > wm_id))
+
+
+def newest_order(df):
+    """(OrderDate, OrderID) of the newest row in df, or None."""
+    dates = pd.to_datetime(df["OrderDate"], errors="coerce")
+    if dates.notna().sum() == 0:
+        return None
+    newest_date = dates.max()
+    return newest_date, int(df.loc[dates == newest_date, "OrderID"].max())
+
+
+class ETLState:
+    """High-water mark and per-file read positions for incremental runs.
+
+    Stored as JSON:
+        {"watermark": {"OrderDate": "2025-01-19", "OrderID": 1005},
+         "files": {"/abs/eu_orders.csv": {"offset": ..., "columns": [...],
+                                          "head_sha256": ..., "tail_sha256": ...,
+                                          "size": ..., "mtime_ns": ...}}}
+
+    A file counts as "appended to" when the bytes at its start and just before
+    the saved offset still hash the same; then reading resumes at the offset.
+    Otherwise (new or rewritten file) it is read in full and rows at or below
+    the watermark are skipped. The watermark is the one from the start of the
+    run for every file; the newest row seen only becomes the watermark in
+    finish(), so a later input with older orders is not cut off.
+    Reading stops after the last newline: a last line without one may still be
+    being written, so it is left for the next run and the offset never points
+    into the middle of a record. If the file has not changed since the last
+    run (same size and mtime), or final=True, that last line is complete and
+    read too.
+    """
+
+    def __init__(self, path, final=False):
+        self.path = Path(path)
+        self.final = final
+        self.watermark = None
+        self.newest = None
+        self.files = {}
+        self._stat = {}  # resolved path → (size, mtime_ns) when plan() looked at it
+        if self.path.exists():
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if data.get("watermark"):
+                self.watermark = (pd.Timestamp(data["watermark"]["OrderDate"]), data["watermark"]["OrderID"])
+            self.files = data.get("files", {})
+
+    def plan(self, csv_path):
+        """Return (start, end, columns, filter_by_watermark) for reading csv_path."""
+        stat = csv_path.stat()
+        size = stat.st_size
+        entry = self.files.get(str(csv_path.resolve()))
+        self._stat[str(csv_path.resolve())] = (size, stat.st_mtime_ns)
+        end = _complete_lines_end(csv_path, size)
+        if end < size:
+            if self.final or (entry and (entry.get("size"), entry.get("mtime_ns")) == (size, stat.st_mtime_ns)):
+                end = size  # nobody wrote to the file since the last run: the last line is complete
+            else:
+                print(f"⏳ {csv_path.name}: last line has no newline yet, {size - end:,} bytes left for the next run "
+                      f"(--final reads it now)")
+        if entry and end >= entry["offset"] and self._fingerprint(csv_path, entry["offset"]) == (
+            entry["head_sha256"], entry["tail_sha256"]
+        ):
+            return entry["offset"], end, entry["columns"], False
+        return 0, end, None, self.watermark is not None
+
+    def above_watermark(self, df):
+        """Mask of rows newer than the watermark (by OrderDate, then OrderID)."""
+        return above_watermark(df, self.watermark)
+
+    def advance(self, df):
+        """Remember the newest row in df for the watermark of the next run."""
+        self.advance_to(newest_order(df))
+
+    def advance_to(self, newest):
+        if newest is not None and (self.newest is None or newest > self.newest):
+            self.newest = newest
+
+    def file_done(self, csv_path, offset, columns):
+        head_sha256, tail_sha256 = self._fingerprint(csv_path, offset)
+        size, mtime_ns = self._stat[str(csv_path.resolve())]
+        self.files[str(csv_path.resolve())] = {
+            "offset": offset,
+            "columns": list(columns),
+            "head_sha256": head_sha256,
+            "tail_sha256": tail_sha256,
+            "size": size,
+            "mtime_ns": mtime_ns,
+        }
+
+    def finish(self):
+        """End of the run: the newest row seen becomes the watermark, then save."""
+        if self.newest is not None and (self.watermark is None or self.newest > self.watermark):
+            self.watermark = self.newest
+        self.save()
+
+    def save(self):
+        data = {"watermark": None, "files": self.files}
+        if self.watermark is not None:
+            data["watermark"] = {"OrderDate": self.watermark[0].isoformat(), "OrderID": self.watermark[1]}
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _fingerprint(csv_path, offset):
+        head = _sha256_range(csv_path, 0, min(FINGERPRINT_BYTES, offset))
+        tail_start = max(0, offset - FINGERPRINT_BYTES)
+        tail = _sha256_range(csv_path, tail_start, offset - tail_start)
+        return head, tail
+
+
+def extract_chunks(csv_path, chunksize=None, start=0, end=None, columns=None):
+    """Yield raw DataFrames from csv_path, one per chunk (or one in total).
+
+    start/end limit reading to a byte range; when start > 0 the header line is
+    not part of the range, so the column names must be passed in.
+    Columns are typed by ORDER_DTYPES / ORDER_DATE_COLUMNS (see downcast()).
+    """
+    read_kwargs = {"dtype": ORDER_DTYPES, "parse_dates": ORDER_DATE_COLUMNS, "date_format": ORDER_DATE_FORMAT}
+    if start == 0 and end is None:
+        source = csv_path
+    elif start == end:
+        return
+    else:
+        source = io.TextIOWrapper(io.BufferedReader(_FileRegion(csv_path, start, end)), encoding="utf-8", newline="")
+        if start > 0:
+            read_kwargs.update(header=None, names=columns)
+
+    if chunksize is None:
+        yield downcast(pd.read_csv(source, **read_kwargs))
+    else:
+        with pd.read_csv(source, chunksize=chunksize, **read_kwargs) as reader:
+            for chunk in reader:
+                yield downcast(chunk)
+    if source is not csv_path:
+        source.close()
+
+
+def downcast(df):
+    """Shrink integer columns (OrderID) to the smallest type that fits."""
+    for col in df.select_dtypes(include="integer").columns:
+        df[col] = pd.to_numeric(df[col], downcast="integer")
+    return df
+
+
+def extract_memory_report(csv_path, nrows=DEFAULT_CHUNKSIZE):
+    """Print memory of the first nrows read with inferred vs. schema dtypes."""
+    inferred = pd.read_csv(csv_path, nrows=nrows)
+    typed = next(extract_chunks(csv_path, nrows), inferred.iloc[:0])
+    before = inferred.memory_usage(deep=True, index=False)
+    after = typed.memory_usage(deep=True, index=False)
+    print(f"🧠 Extract memory for the first {len(inferred):,} rows of {csv_path.name}:")
+    print(f"   {'column':<14} {'inferred':>28} {'schema':>28}")
+    for col in inferred.columns:
+        print(f"   {col:<14} {str(inferred[col].dtype):>14} {before[col]:>12,} B "
+              f"{str(typed[col].dtype):>14} {after[col]:>12,} B")
+    ratio = before.sum() / max(1, after.sum())
+    print(f"   {'total':<14} {before.sum():>27,} B {after.sum():>27,} B  ({ratio:.1f}x smaller)\n")
+
+
+def transform(df, seen_ids, processed_at, enrich=None):
+    """Clean, standardize and enrich one DataFrame (whole file or one chunk).
+
+    seen_ids is an OrderIDIndex with every OrderID handled before (earlier
+    chunks, earlier files, earlier runs), so the "drop duplicates on
+    OrderID" rule works across all of them. It is updated in place.
+    enrich is the CompiledTransform for everything after the dedupe
+    (default: DEFAULT_TRANSFORM_SPEC).
+    Returns (transformed df, number of rows rejected for a bad OrderID).
+    """
+    df, rejected = with_order_ids(df)
+
+    # Drop duplicates on OrderID (inside this chunk and against everything seen before)
+    df = df[seen_ids.add_new(df["OrderID"].to_numpy())]
+
+    return (enrich or CompiledTransform())(df, processed_at), rejected
+
+
+def with_order_ids(df):
+    """Rows without a whole-number OrderID cannot be deduplicated, drop them.
+
+    Returns (df with an int64 OrderID, number of rejected rows). Empty, text
+    ("A-17") and fractional IDs are rejected instead of failing the run.
+    """
+    if pd.api.types.is_integer_dtype(df["OrderID"]):
+        return df, 0
+    ids = pd.to_numeric(df["OrderID"], errors="coerce")
+    valid = (ids.notna() & (ids % 1 == 0)).to_numpy()
+    df = df[valid].assign(OrderID=ids[valid].astype("int64"))
+    return df, int((~valid).sum())
+
+
+# Declarative version of the classic transform chain: drop rows missing
+# CustomerName/Amount → fill Email → upper-case Country → keep EU countries →
+# Amount to numeric → VAT (19%) → HighValue flag (> 200) → ProcessedDate.
+# Tenants can override it with a JSON/YAML file (--spec), e.g. for another
+# VAT rate, country list or threshold.
+DEFAULT_TRANSFORM_SPEC = {
+    "required": ["CustomerName", "Amount"],
+    "fill": {"Email": "noemail@example.com"},
+    "uppercase": ["Country"],
+    "allow": {"Country": EU_COUNTRIES},
+    "numeric": ["Amount"],
+    "derive": {
+        "AmountWithVAT": {"multiply": ["Amount", 1.19]},
+        "HighValue": {"greater_than": ["Amount", 200]},
+    },
+    "timestamp_column": "ProcessedDate",
+}
+
+DERIVE_OPERATIONS = {
+    "multiply": np.multiply,
+    "add": np.add,
+    "subtract": np.subtract,
+    "divide": np.divide,
+    "greater_than": np.greater,
+    "greater_equal": np.greater_equal,
+    "less_than": np.less,
+    "less_equal": np.less_equal,
+    "equal": np.equal,
+}
+
+
+def load_transform_spec(path):
+    """Read a transform spec from .json or .yaml/.yml (YAML needs PyYAML)."""
+    path = Path(path)
+    text = path.read_text(encoding="utf-8")
+    if path.suffix in (".yaml", ".yml"):
+        import yaml
+
+        return yaml.safe_load(text)
+    return json.loads(text)
+
+
+class CompiledTransform:
+    """A transform spec turned into one pass over a DataFrame.
+
+    Instead of one full-frame copy per step, all row filters (required
+    columns, allow-lists) are folded into a single boolean mask first.
+    Allow-list checks run on the distinct values only (pd.factorize), so
+    upper-casing and isin() cost next to nothing for low-cardinality columns
+    like Country. Then every column is copied exactly once for the surviving
+    rows, and fill/uppercase/numeric/derive work on those small copies.
+
+    Instances are plain objects, so they can be sent to pool workers.
+    """
+
+    KEYS = {"required", "fill", "uppercase", "allow", "numeric", "derive", "timestamp_column"}
+
+    def __init__(self, spec=None):
+        spec = DEFAULT_TRANSFORM_SPEC if spec is None else spec
+        unknown = set(spec) - self.KEYS
+        if unknown:
+            raise ValueError(f"Unknown transform spec keys: {sorted(unknown)}")
+        self.required = list(spec.get("required", []))
+        self.fill = dict(spec.get("fill", {}))
+        self.uppercase = set(spec.get("uppercase", []))
+        self.allow = {col: set(values) for col, values in spec.get("allow", {}).items()}
+        self.numeric = set(spec.get("numeric", []))
+        self.derive = []
+        for name, expression in spec.get("derive", {}).items():
+            if len(expression) != 1 or next(iter(expression)) not in DERIVE_OPERATIONS:
+                raise ValueError(f"Derived column {name}: use one of {sorted(DERIVE_OPERATIONS)}")
+            operation, operands = next(iter(expression.items()))
+            self.derive.append((name, DERIVE_OPERATIONS[operation], list(operands)))
+        self.timestamp_column = spec.get("timestamp_column")
+
+    def __call__(self, df, processed_at):
+        # 1. One keep-mask for every row filter
+        keep = np.ones(len(df), dtype=bool)
+        for col in self.required:
+            keep &= df[col].notna().to_numpy()
+        allowed_values = {}
+        for col, allowed in self.allow.items():
+            codes, uniques = pd.factorize(df[col])
+            if col in self.uppercase:
+                uniques = uniques.str.upper()
+            # code -1 (missing value) looks up the trailing False
+            keep &= np.append(uniques.isin(allowed), False)[codes]
+            allowed_values[col] = (codes, uniques)
+        rows = np.flatnonzero(keep)
+
+        # 2. Copy each column once for the surviving rows, then clean it
+        index = df.index[rows]
+        out = {}
+        for col in df.columns:
+            if col in allowed_values:
+                codes, uniques = allowed_values[col]
+                values = pd.Series(uniques.take(codes[rows]), index=index, name=col)
+            else:
+                values = df[col].iloc[rows]
+                if col in self.uppercase:
+                    values = values.str.upper()
+            if col in self.fill:
+                values = values.fillna(self.fill[col])
+            if col in self.numeric:
+                values = pd.to_numeric(values, errors="coerce").astype("float64")
+            out[col] = values
+
+        # 3. Derived columns and the run timestamp
+        for name, operation, operands in self.derive:
+            args = [out[op].to_numpy() if isinstance(op, str) else op for op in operands]
+            out[name] = pd.Series(operation(*args), index=index)
+        if self.timestamp_column:
+            out[self.timestamp_column] = pd.Series(processed_at, index=index)
+        return pd.DataFrame(out, index=index)
+
+
+def parquet_schema():
+    """Column types of the Parquet output (Country/OrderMonth become folders)."""
+    import pyarrow as pa
+
+    return pa.schema([
+        ("OrderID", pa.int64()),
+        ("CustomerName", pa.string()),
+        ("Email", pa.string()),
+        ("Country", pa.string()),
+        ("Amount", pa.float64()),
+        ("OrderDate", pa.date32()),
+        ("AmountWithVAT", pa.float64()),
+        ("HighValue", pa.bool_()),
+        ("ProcessedDate", pa.timestamp("us")),
+        ("OrderMonth", pa.string()),
+    ])
+
+
+def load(df, output, create, output_format="csv", part_name="part"):
+    """Write one transformed DataFrame (whole run or one chunk) to output.
+
+    csv:     create=True writes a new file with header, otherwise append.
+    parquet: every call adds new files named part_name-*.parquet to the
+             partitioned dataset; create=True first removes the old dataset.
+    sqlite/postgres: output is a bulk loader (eu_orders_db_load.py); rows
+             are upserted on OrderID, so create makes no difference.
+    Returns the number of bytes written.
+    """
+    if output_format in DB_FORMATS:
+        return output.load_chunk(df)
+    if output_format == "csv":
+        size_before = 0 if create or not output.exists() else output.stat().st_size
+        df.to_csv(output, index=False, mode="w" if create else "a", header=create)
+        return output.stat().st_size - size_before
+
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    if create and output.exists():
+        shutil.rmtree(output)
+    order_dates = pd.to_datetime(df["OrderDate"], errors="coerce")
+    typed = df.assign(OrderDate=order_dates.dt.date, OrderMonth=order_dates.dt.strftime("%Y-%m"))
+    table = pa.Table.from_pandas(typed, schema=parquet_schema(), preserve_index=False)
+    written_files = []
+    ds.write_dataset(
+        table,
+        output,
+        format="parquet",
+        partitioning=["Country", "OrderMonth"],
+        partitioning_flavor="hive",
+        basename_template=f"{part_name}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+        file_visitor=lambda written_file: written_files.append(written_file.path),
+    )
+    return sum(os.path.getsize(path) for path in written_files)
+
+
+def etl_pipeline(inputs=None, stream=False, chunksize=DEFAULT_CHUNKSIZE, dedup_index=None, state_file=None,
+                 output_format="csv", workers=1, transform_spec=None, preview=True, metrics_format=None,
+                 metrics_file=None, db_target=None, final=False):
+    """Run the ETL over one or more order CSVs (default: eu_orders.csv).
+
+    dedup_index: path of a persistent OrderIDIndex. Without it, duplicates
+    are only removed within this run and the clean CSV is rewritten. With
+    it, OrderIDs from earlier runs are skipped too and the clean CSV is
+    appended to.
+
+    state_file: path of an ETLState JSON file for incremental runs. Only rows
+    that are new since the last run are extracted and appended.
+
+    final: the inputs are complete - in incremental runs, read a last line
+    without a trailing newline at once instead of waiting for the next run.
+
+    output_format: "csv" (eu_orders_clean.csv), "parquet"
+    (eu_orders_clean_parquet/, partitioned by Country and OrderMonth),
+    "sqlite" or "postgres" (db_target: SQLite file, default
+    eu_orders_clean.db, or Postgres DSN).
+
+    workers: more than 1 runs extract + transform in a process pool
+    (always streaming).
+
+    transform_spec: path of a JSON/YAML transform spec (default:
+    DEFAULT_TRANSFORM_SPEC).
+
+    preview: print df.head() samples (costs time on big frames).
+
+    metrics_format / metrics_file: emit StageStats as "json" lines or
+    "prometheus" text, to stdout or to metrics_file.
+    """
+    csv_paths = [Path(p) for p in inputs] if inputs else [SCRIPT_DIR / "eu_orders.csv"]
+    missing = [p for p in csv_paths if not p.exists()]
+    if missing:
+        print(f"⚠️ No {missing[0].name} found. Please create the sample file first.")
+        return
+
+    if output_format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("pyarrow not installed")
+            print("Install with: pip install pyarrow")
+            return
+        output = CLEAN_PARQUET_DIR
+    elif output_format in DB_FORMATS:
+        from eu_orders_db_load import open_loader
+
+        if output_format == "postgres" and not db_target:
+            print("⚠️ --format postgres needs --db with a connection string.")
+            return
+        try:
+            output = open_loader(output_format, db_target or CLEAN_SQLITE_DB, date_columns=ORDER_DATE_COLUMNS)
+        except ImportError:
+            print("psycopg2 not installed")
+            print("Install with: pip install psycopg2-binary")
+            return
+    else:
+        output = CLEAN_CSV
+
+    enrich = CompiledTransform(load_transform_spec(transform_spec) if transform_spec else None)
+    seen_ids = OrderIDIndex(dedup_index)
+    state = ETLState(state_file, final=final) if state_file is not None else None
+    # Earlier runs already wrote the clean output: append to it (tables are always upserted)
+    append = output_format in DB_FORMATS or (output.exists() and (len(seen_ids) > 0 or (state is not None and state.files)))
+    if dedup_index is not None:
+        print(f"🔑 Dedup index {seen_ids.path.name}: {len(seen_ids):,} known OrderIDs")
+    if state is not None and state.watermark is not None:
+        print(f"🌊 Watermark: OrderDate {state.watermark[0].date()}, OrderID {state.watermark[1]}")
+
+    try:
+        if workers > 1:
+            stats = etl_pipeline_parallel(csv_paths, output, chunksize, seen_ids, append, state, output_format,
+                                          workers, enrich)
+        elif stream:
+            stats = etl_pipeline_streaming(csv_paths, output, chunksize, seen_ids, append, state, output_format,
+                                           enrich, preview)
+        else:
+            stats = etl_pipeline_in_memory(csv_paths, output, seen_ids, append, state, output_format, enrich,
+                                           preview)
+    finally:
+        if output_format in DB_FORMATS:
+            output.close()
+
+    if metrics_format:
+        stats.write(metrics_format, metrics_file)
+    return stats
+
+
+def etl_pipeline_in_memory(csv_paths, output=CLEAN_CSV, seen_ids=None, append=False, state=None,
+                           output_format="csv", enrich=None, preview=True):
+    """The classic pipeline: every input is read into one DataFrame."""
+    stats = StageStats("memory")
+    if seen_ids is None:
+        seen_ids = OrderIDIndex()
+
     # -------------------
     # EXTRACT
     # -------------------
     print("📂 Extracting data...")
-    try:
-        script_dir = Path(__file__).parent
-        csv_path = script_dir / "eu_orders.csv"
-        df = pd.read_csv(csv_path)
-    except FileNotFoundError:
-        print("⚠️ No eu_orders.csv found. Please create the sample file first.")
-        return
+    with stats.measure("extract") as metrics:
+        frames = []
+        read_positions = []
+        for csv_path in csv_paths:
+            region_start, region_end, columns, use_watermark = state.plan(csv_path) if state else (0, None, None, False)
+            for df in extract_chunks(csv_path, None, region_start, region_end, columns):
+                metrics["rows_in"] += len(df)
+                if use_watermark:
+                    df = df[state.above_watermark(df)]
+                frames.append(df)
+                columns = df.columns
+            metrics["bytes_read"] += (region_end or csv_path.stat().st_size) - region_start
+            read_positions.append((csv_path, region_end, columns))
+        df = pd.concat(frames, ignore_index=True) if frames else None
+        metrics["rows_out"] += 0 if df is None else len(df)
+    if df is None:
+        print("✅ No new rows since the last run.")
+        if state is not None:  # still remember the file sizes (see ETLState.plan())
+            _files_done(state, read_positions)
+            state.finish()
+        return stats
 
-    print("Preview of raw data:")
-    print(df.head(), "\n")
+    if preview:
+        print("Preview of raw data:")
+        print(df.head(), "\n")
 
     # -------------------
     # TRANSFORM
     # -------------------
     print("🔄 Transforming data...")
+    processed_at = pd.Timestamp.now()
+    with stats.measure("transform") as metrics:
+        metrics["rows_in"] += len(df)
+        if state is not None:
+            state.advance(df)
+        df, metrics["rows_rejected"] = transform(df, seen_ids, processed_at, enrich)
+        metrics["rows_out"] += len(df)
+
+    if preview:
+        print("✅ Transformed data sample:")
+        print(df.head(), "\n")
+
+    # -------------------
+    # LOAD
+    # -------------------
+    with stats.measure("load") as metrics:
+        metrics["rows_in"] += len(df)
+        metrics["bytes_written"] += load(df, output, not append, output_format,
+                                         part_name=f"run-{processed_at:%Y%m%dT%H%M%S%f}")
+        metrics["rows_out"] += len(df)
+    seen_ids.save()
+    if state is not None:
+        _files_done(state, read_positions)
+        state.finish()
+    print(f"📊 Clean data saved to {output} with {len(df)} records.")
+    stats.report()
+    return stats
+
+
+def _files_done(state, read_positions):
+    for csv_path, region_end, columns in read_positions:
+        if columns is not None:  # nothing complete to read in this file yet
+            state.file_done(csv_path, region_end, columns)
+
+
+def etl_pipeline_streaming(csv_paths, output=CLEAN_CSV, chunksize=DEFAULT_CHUNKSIZE, seen_ids=None, append=False,
+                           state=None, output_format="csv", enrich=None, preview=True):
+    """Same pipeline as etl_pipeline_in_memory(), but over fixed-size chunks.
+
+    Chunks are line-aligned byte ranges of about chunksize rows (the same
+    pieces as the parallel mode), so only one chunk is held in memory at a
+    time and each chunk knows where it ends in the file. The output file is
+    identical to the in-memory run: same rows, same order, one ProcessedDate
+    per run. After each chunk is loaded, its OrderIDs are checkpointed to the
+    dedup index log and the state offset moves to the end of the chunk, so a
+    crash mid-file only repeats the chunk that was being loaded.
+    """
+    stats = StageStats("stream")
+    if seen_ids is None:
+        seen_ids = OrderIDIndex()
+    processed_at = pd.Timestamp.now()
+    written = 0
+    chunk_no = 0
+    first_chunk = True
 
-    # Drop duplicates on OrderID
+    current_path = None
+    for csv_path, start, end, columns, watermark, _ in _csv_tasks(csv_paths, chunksize, state):
+        if csv_path != current_path:
+            print(f"📂 Streaming {csv_path.name} in chunks of about {chunksize:,} rows...")
+            current_path = csv_path
+        # EXTRACT
+        with stats.measure("extract") as metrics:
+            chunk = next(extract_chunks(csv_path, None, start, end, columns), None)
+            metrics["bytes_read"] += end - start
+            if chunk is not None:
+                metrics["rows_in"] += len(chunk)
+                if watermark is not None:
+                    chunk = chunk[above_watermark(chunk, watermark)]
+                metrics["rows_out"] += len(chunk)
+        if chunk is None:
+            if state is not None:  # still remember the file size (see ETLState.plan())
+                state.file_done(csv_path, end, columns)
+            continue
+
+        if first_chunk and preview:
+            print("Preview of raw data (first chunk):")
+            print(chunk.head(), "\n")
+
+        # TRANSFORM
+        with stats.measure("transform") as metrics:
+            metrics["rows_in"] += len(chunk)
+            if state is not None:
+                state.advance(chunk)
+            chunk, rejected = transform(chunk, seen_ids, processed_at, enrich)
+            metrics["rows_rejected"] += rejected
+            metrics["rows_out"] += len(chunk)
+
+        # LOAD (first chunk creates the output, the rest append)
+        with stats.measure("load") as metrics:
+            part_name = f"run-{processed_at:%Y%m%dT%H%M%S%f}-{chunk_no:06d}"
+            metrics["rows_in"] += len(chunk)
+            metrics["bytes_written"] += load(chunk, output, first_chunk and not append, output_format, part_name)
+            metrics["rows_out"] += len(chunk)
+
+        # Only now is the chunk done: remember its OrderIDs and where it ended
+        seen_ids.checkpoint()
+        if state is not None:
+            state.file_done(csv_path, end, columns)
+            state.save()
+        written += len(chunk)
+        chunk_no += 1
+        first_chunk = False
+    seen_ids.save()
+    if state is not None:
+        state.finish()
+
+    if first_chunk:
+        print("✅ No new rows to load.")
+        return stats
+
+    print(f"📊 Clean data saved to {output} with {written} records.")
+    stats.report()
+    return stats
+
+
+def split_ranges(csv_path, start, end, chunksize):
+    """Cut bytes [start, end) of csv_path into pieces of about chunksize rows.
+
+    Every piece ends on a line break. This assumes no quoted field contains
+    a newline, which holds for the order exports.
+    """
+    with open(csv_path, "rb") as f:
+        f.seek(start)
+        sample = f.read(FINGERPRINT_BYTES)
+        bytes_per_row = len(sample) / max(1, sample.count(b"\n"))
+        target = max(1, int(chunksize * bytes_per_row))
+        while start < end:
+            f.seek(min(start + target, end))
+            f.readline()
+            cut = min(f.tell(), end)
+            yield start, cut
+            start = cut
+
+
+def _csv_tasks(csv_paths, chunksize, state):
+    """(csv_path, start, end, columns, watermark) for every piece of every file.
+
+    Every file is planned before the first piece is read, against the
+    watermark from the start of the run.
+    """
+    plans = [(csv_path, *(state.plan(csv_path) if state else (0, csv_path.stat().st_size, None, False)))
+             for csv_path in csv_paths]
+    for csv_path, start, end, columns, use_watermark in plans:
+        if start == 0:
+            # Read the header here, so every piece (including the first) is header-less
+            columns = pd.read_csv(csv_path, nrows=0).columns.tolist()
+            with open(csv_path, "rb") as f:
+                start = min(len(f.readline()), end)
+        watermark = state.watermark if use_watermark else None
+        pieces = list(split_ranges(csv_path, start, end, chunksize)) or [(start, start)]
+        for piece_start, piece_end in pieces:
+            yield csv_path, piece_start, piece_end, columns, watermark, end
+
+
+def _extract_transform_piece(csv_path, start, end, columns, watermark, processed_at, enrich):
+    """Worker: extract one byte range and run everything but the global dedupe.
+
+    Dedupe within the piece happens here; which of the remaining OrderIDs were
+    already seen in earlier pieces is decided by the parent, in input order.
+    """
+    wall, cpu = time.perf_counter(), time.process_time()
+    raw = next(extract_chunks(csv_path, None, start, end, columns), None)
+    if raw is None:
+        raw = pd.DataFrame(columns=columns)
+    rows_read = len(raw)
+    if watermark is not None:
+        raw = raw[above_watermark(raw, watermark)]
+    extract = {"wall_seconds": time.perf_counter() - wall, "cpu_seconds": time.process_time() - cpu,
+               "rows_in": rows_read, "rows_out": len(raw), "bytes_read": end - start,
+               "peak_rss_bytes": peak_rss_bytes()}
+
+    wall, cpu = time.perf_counter(), time.process_time()
+    df, rejected = with_order_ids(raw)
     df = df.drop_duplicates(subset=["OrderID"])
+    result = {
+        "newest": newest_order(raw),
+        "ids": df["OrderID"].to_numpy(),
+        "positions": df.index.to_numpy(),
+        "df": enrich(df, processed_at),
+        "extract": extract,
+    }
+    result["transform"] = {"wall_seconds": time.perf_counter() - wall, "cpu_seconds": time.process_time() - cpu,
+                           "rows_in": len(raw), "rows_rejected": rejected, "peak_rss_bytes": peak_rss_bytes()}
+    return result
 
-    # Remove rows missing critical info
-    df = df.dropna(subset=["CustomerName", "Amount"])
 
-    # Fill missing emails
-    df["Email"] = df["Email"].fillna("noemail@example.com")
+def etl_pipeline_parallel(csv_paths, output=CLEAN_CSV, chunksize=DEFAULT_CHUNKSIZE, seen_ids=None, append=False,
+                          state=None, output_format="csv", workers=None, enrich=None):
+    """Streaming pipeline with extract + transform fanned out to a process pool.
 
-    # Standardize country codes to upper-case
-    df["Country"] = df["Country"].str.upper()
+    Pieces are submitted in input order and their results are consumed in the
+    same order, with at most 2 x workers pieces in flight, so memory stays
+    bounded and the output is the same as etl_pipeline_streaming().
+    Extract/transform times in the report are summed over all workers.
+    The dedup index and state are checkpointed after every loaded chunk.
+    """
+    stats = StageStats("parallel")
+    if seen_ids is None:
+        seen_ids = OrderIDIndex()
+    processed_at = pd.Timestamp.now()
+    workers = workers or os.cpu_count()
+    enrich = enrich or CompiledTransform()
+    written = 0
+    chunk_no = 0
 
-    # Keep only selected EU countries
-    eu_countries = ["DE", "FR", "IT", "ES", "NL"]
-    df = df[df["Country"].isin(eu_countries)]
+    print(f"⚙️ Transforming {len(csv_paths)} file(s) with {workers} worker processes...")
+    wall_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        tasks = _csv_tasks(csv_paths, chunksize, state)
+        in_flight = deque()
+        while True:
+            for csv_path, start, end, columns, watermark, _ in itertools.islice(tasks, 2 * workers - len(in_flight)):
+                future = pool.submit(_extract_transform_piece, csv_path, start, end, columns, watermark, processed_at,
+                                     enrich)
+                in_flight.append((csv_path, end, columns, future))
+            if not in_flight:
+                break
 
-    # Convert Amount to numeric
-    df["Amount"] = pd.to_numeric(df["Amount"], errors="coerce")
+            csv_path, end, columns, future = in_flight.popleft()
+            result = future.result()
+            stats.add("extract", **result["extract"])
+            stats.add("transform", **result["transform"])
+            if state is not None:
+                state.advance_to(result["newest"])
 
-    # VAT Calculation (19%)
-    df["AmountWithVAT"] = df["Amount"] * 1.19
+            # Global dedupe in input order, then keep the matching transformed rows
+            with stats.measure("transform") as metrics:
+                keep = result["positions"][seen_ids.add_new(result["ids"])]
+                chunk = result["df"][result["df"].index.isin(keep)]
+                metrics["rows_out"] += len(chunk)
 
-    # Add HighValue flag if > 200
-    df["HighValue"] = df["Amount"] > 200
+            with stats.measure("load") as metrics:
+                part_name = f"run-{processed_at:%Y%m%dT%H%M%S%f}-{chunk_no:06d}"
+                metrics["rows_in"] += len(chunk)
+                metrics["bytes_written"] += load(chunk, output, chunk_no == 0 and not append, output_format, part_name)
+                metrics["rows_out"] += len(chunk)
 
-    # Add processing timestamp
-    df["ProcessedDate"] = pd.Timestamp.now()
+            # Same per-chunk checkpoint as etl_pipeline_streaming()
+            seen_ids.checkpoint()
+            if state is not None:
+                state.file_done(csv_path, end, columns)
+                state.save()
+            written += len(chunk)
+            chunk_no += 1
+    seen_ids.save()
+    if state is not None:
+        state.finish()
 
-    print("✅ Transformed data sample:")
-    print(df.head(), "\n")
+    print(f"📊 Clean data saved to {output} with {written} records "
+          f"in {time.perf_counter() - wall_start:.2f}s wall time.")
+    stats.report()
+    return stats
 
-    # -------------------
-    # LOAD
-    # -------------------
-    clean_csv = script_dir / "eu_orders_clean.csv"
-    df.to_csv(clean_csv, index=False)
-    print(f"📊 Clean data saved to {clean_csv} with {len(df)} records.")
 
 if __name__ == "__main__":
-    etl_pipeline()
+    parser = argparse.ArgumentParser(description="EU orders ETL (CSV → clean CSV/Parquet)")
+    parser.add_argument("inputs", nargs="*", help="order CSVs to process (default: eu_orders.csv)")
+    parser.add_argument("--stream", action="store_true", help="process the input in fixed-size chunks")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows per chunk in --stream mode")
+    parser.add_argument("--dedup-index", nargs="?", const=DEFAULT_DEDUP_INDEX, default=None,
+                        help=f"persistent OrderID index, skips orders loaded in earlier runs (default: {DEFAULT_DEDUP_INDEX.name})")
+    parser.add_argument("--incremental", nargs="?", const=DEFAULT_STATE_FILE, default=None, metavar="STATE_FILE",
+                        help=f"only process rows new since the last run (default state: {DEFAULT_STATE_FILE.name})")
+    parser.add_argument("--final", action="store_true",
+                        help="inputs are complete: read a last line without a newline in --incremental runs")
+    parser.add_argument("--format", choices=["csv", "parquet", *DB_FORMATS], default="csv", dest="output_format",
+                        help="clean CSV, Parquet dataset partitioned by Country/OrderMonth, or a database table")
+    parser.add_argument("--db", dest="db_target",
+                        help=f"SQLite file (default: {CLEAN_SQLITE_DB.name}) or Postgres DSN for the database formats")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes for the parallel extract/transform (default: 1 = no pool)")
+    parser.add_argument("--memory-report", action="store_true",
+                        help="print extract memory with inferred vs. schema dtypes before running")
+    parser.add_argument("--spec", dest="transform_spec",
+                        help="JSON/YAML transform spec (VAT rate, country list, thresholds, ...)")
+    parser.add_argument("--no-preview", action="store_false", dest="preview",
+                        help="skip the df.head() previews")
+    parser.add_argument("--metrics", choices=["json", "prometheus"], dest="metrics_format",
+                        help="emit per-stage metrics as JSON lines or Prometheus text")
+    parser.add_argument("--metrics-file", help="append JSON lines / write Prometheus text here instead of stdout")
+    args = parser.parse_args()
+    if args.memory_report:
+        extract_memory_report(Path(args.inputs[0]) if args.inputs else SCRIPT_DIR / "eu_orders.csv", args.chunksize)
+    etl_pipeline(args.inputs, stream=args.stream, chunksize=args.chunksize, dedup_index=args.dedup_index,
+                 state_file=args.incremental, output_format=args.output_format, workers=args.workers,
+                 transform_spec=args.transform_spec, preview=args.preview, metrics_format=args.metrics_format,
+                 metrics_file=args.metrics_file, db_target=args.db_target, final=args.final)
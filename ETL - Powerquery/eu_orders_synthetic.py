@@ -0,0 +1,124 @@
+"""
+Synthetic EU order generator — Day 3
+
+Writes CSVs with the same columns as eu_orders.csv
+(OrderID,CustomerName,Email,Country,Amount,OrderDate) at any size, so the
+ETL can be measured on realistic volumes without real customer data
+(GDPR-safe by construction). Rows are produced and written in chunks, so
+even 100M rows need only one chunk in memory.
+
+Knobs:
+- duplicate rate:      share of rows that repeat an earlier OrderID
+- missing-email rate:  share of rows with an empty Email
+- missing-name rate:   share of rows with an empty CustomerName
+- non-EU share:        share of rows from countries the ETL filters out
+- lowercase rate:      share of country codes written in lower case
+
+Usage:
+    python eu_orders_synthetic.py orders_1M.csv --rows 1M
+    python eu_orders_synthetic.py orders_10M.csv --rows 10M --duplicate-rate 0.05 --non-eu-share 0.3
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+EU_COUNTRIES = ["DE", "FR", "IT", "ES", "NL"]
+NON_EU_COUNTRIES = ["US", "GB", "CH", "NO", "CN"]
+EMAIL_DOMAINS = {"DE": "example.de", "FR": "example.fr", "IT": "example.it", "ES": "example.es",
+                 "NL": "example.nl", "US": "example.us", "GB": "example.co.uk", "CH": "example.ch",
+                 "NO": "example.no", "CN": "example.cn"}
+FIRST_NAMES = ["Hans", "Marie", "Luigi", "Emma", "Lucas", "Sofia", "Jan", "Chloé", "Pablo", "Anna",
+               "Lars", "Giulia", "Noah", "Lea", "Mateo", "Eva"]
+LAST_NAMES = ["Müller", "Dubois", "Rossi", "Schmidt", "García", "de Vries", "Bianchi", "Martin",
+              "Fischer", "Jansen", "López", "Weber", "Moreau", "Romano", "Bakker", "Wagner"]
+FIRST_ORDER_ID = 1001
+
+
+def parse_rows(text):
+    """'250k' → 250_000, '10M' → 10_000_000, '1000' → 1000."""
+    text = str(text).strip().upper()
+    factor = {"K": 1_000, "M": 1_000_000, "B": 1_000_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("KMB")) * factor)
+
+
+def order_chunk(rng, first_row, rows, total_rows, duplicate_rate=0.02, missing_email_rate=0.1,
+                missing_name_rate=0.005, non_eu_share=0.1, lowercase_rate=0.05,
+                start_date="2025-01-01", days=365, first_order_id=FIRST_ORDER_ID):
+    """One DataFrame of synthetic orders, rows first_row .. first_row + rows - 1.
+
+    OrderIDs grow with the row number and OrderDates move forward through the
+    period, like a real export. Duplicates reuse an ID from anywhere earlier
+    in the file.
+    """
+    row_numbers = np.arange(first_row, first_row + rows)
+    order_ids = first_order_id + row_numbers
+    duplicates = (rng.random(rows) < duplicate_rate) & (row_numbers > 0)
+    order_ids[duplicates] = first_order_id + rng.integers(0, row_numbers[duplicates])
+
+    non_eu = rng.random(rows) < non_eu_share
+    countries = np.where(non_eu, rng.choice(NON_EU_COUNTRIES, rows), rng.choice(EU_COUNTRIES, rows))
+    first = rng.choice(FIRST_NAMES, rows)
+    last = rng.choice(LAST_NAMES, rows)
+    names = pd.Series(first).str.cat(pd.Series(last), sep=" ")
+    emails = (pd.Series(first).str.lower().str.cat(pd.Series(row_numbers).astype(str), sep=".")
+              + "@" + pd.Series(countries).map(EMAIL_DOMAINS))
+    countries = np.where(rng.random(rows) < lowercase_rate, np.char.lower(countries), countries)
+
+    day_offsets = (row_numbers * days // max(1, total_rows)) + rng.integers(0, 2, rows)
+    order_dates = pd.Timestamp(start_date) + pd.to_timedelta(np.minimum(day_offsets, days - 1), unit="D")
+
+    return pd.DataFrame({
+        "OrderID": order_ids,
+        "CustomerName": names.where(rng.random(rows) >= missing_name_rate, ""),
+        "Email": emails.where(rng.random(rows) >= missing_email_rate, ""),
+        "Country": countries,
+        "Amount": np.round(rng.lognormal(mean=4.8, sigma=0.7, size=rows), 2),
+        "OrderDate": order_dates.strftime("%Y-%m-%d"),
+    })
+
+
+def generate_orders(path, rows, chunk_rows=1_000_000, seed=42, **options):
+    """Write `rows` synthetic orders to path, chunk by chunk.
+
+    options are passed to order_chunk() (rates, shares, date range).
+    Returns the file size in bytes.
+    """
+    rng = np.random.default_rng(seed)
+    path = Path(path)
+    for first_row in range(0, rows, chunk_rows):
+        chunk = order_chunk(rng, first_row, min(chunk_rows, rows - first_row), rows, **options)
+        chunk.to_csv(path, index=False, mode="w" if first_row == 0 else "a", header=first_row == 0)
+    if rows == 0:
+        pd.DataFrame(columns=["OrderID", "CustomerName", "Email", "Country", "Amount", "OrderDate"]).to_csv(
+            path, index=False)
+    return path.stat().st_size
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic EU order CSVs")
+    parser.add_argument("path", help="CSV file to write")
+    parser.add_argument("--rows", default="1M", help="number of rows, e.g. 250k, 1M, 100M")
+    parser.add_argument("--duplicate-rate", type=float, default=0.02)
+    parser.add_argument("--missing-email-rate", type=float, default=0.1)
+    parser.add_argument("--missing-name-rate", type=float, default=0.005)
+    parser.add_argument("--non-eu-share", type=float, default=0.1)
+    parser.add_argument("--lowercase-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rows = parse_rows(args.rows)
+    start = time.perf_counter()
+    size = generate_orders(
+        args.path, rows, seed=args.seed,
+        duplicate_rate=args.duplicate_rate,
+        missing_email_rate=args.missing_email_rate,
+        missing_name_rate=args.missing_name_rate,
+        non_eu_share=args.non_eu_share,
+        lowercase_rate=args.lowercase_rate,
+    )
+    seconds = time.perf_counter() - start
+    print(f"✓ Wrote {rows:,} orders ({size / 1e6:,.1f} MB) to {args.path} in {seconds:.1f}s")
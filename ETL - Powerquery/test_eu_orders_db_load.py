@@ -0,0 +1,75 @@
+"""Tests for the bulk loaders in eu_orders_db_load.py (run with: pytest).
+
+The Postgres cases run against the database in EU_ORDERS_TEST_POSTGRES_DSN
+(e.g. "dbname=etl_test user=etl host=localhost") and are skipped without it.
+They create and drop their own table.
+"""
+
+import os
+import uuid
+
+import pandas as pd
+import pytest
+
+import eu_orders_db_load as db_load
+
+POSTGRES_DSN = os.environ.get("EU_ORDERS_TEST_POSTGRES_DSN")
+
+
+def orders(ids, amount=100.0):
+    return pd.DataFrame({
+        "OrderID": ids,
+        "CustomerName": [f"Name {i}" for i in ids],
+        "Country": "DE",
+        "Amount": [amount + i for i in ids],
+        "OrderDate": pd.to_datetime([f"2025-01-{i % 28 + 1:02d}" for i in ids]),
+        "HighValue": False,
+        "ProcessedDate": pd.Timestamp("2025-02-01 12:00:00"),
+    })
+
+
+def rows(loader):
+    """{OrderID: Amount} of everything in the loader's table."""
+    sql = f'SELECT "OrderID", "Amount" FROM "{loader.table}"'
+    if isinstance(loader, db_load.SQLiteBulkLoader):
+        return dict(loader.conn.execute(sql).fetchall())
+    with loader.conn.cursor() as cur:
+        cur.execute(sql)
+        return dict(cur.fetchall())
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def loader(request, tmp_path):
+    table = f"test_orders_{uuid.uuid4().hex[:8]}"
+    if request.param == "sqlite":
+        loader = db_load.open_loader("sqlite", tmp_path / "orders.db", table=table, batch_rows=2)
+        yield loader
+        loader.close()
+        return
+    if not POSTGRES_DSN:
+        pytest.skip("set EU_ORDERS_TEST_POSTGRES_DSN to run the Postgres tests")
+    pytest.importorskip("psycopg2")
+    loader = db_load.open_loader("postgres", POSTGRES_DSN, table=table, batch_rows=2)
+    try:
+        yield loader
+    finally:
+        loader.conn.rollback()
+        with loader.conn, loader.conn.cursor() as cur:
+            cur.execute(f'DROP TABLE IF EXISTS "{table}"')
+        loader.close()
+
+
+def test_reload_is_idempotent(loader):
+    chunk = orders([1, 2, 3, 4, 5])
+    loader.load_chunk(chunk)
+    loader.load_chunk(chunk)
+    assert loader.count() == 5
+    assert rows(loader) == {i: 100.0 + i for i in range(1, 6)}
+
+
+def test_upsert_updates_known_orders_and_adds_new_ones(loader):
+    loader.load_chunk(orders([1, 2, 3]))
+    loader.load_chunk(orders([2, 3, 4, 5], amount=500.0))  # several COPY batches, two known OrderIDs
+    assert loader.count() == 5
+    assert rows(loader) == {1: 101.0, 2: 502.0, 3: 503.0, 4: 504.0, 5: 505.0}
+
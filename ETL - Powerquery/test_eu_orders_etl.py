@@ -0,0 +1,85 @@
+"""Tests for incremental runs of eu_orders_etl_skript.py (run with: pytest)."""
+
+import pandas as pd
+import pytest
+
+import eu_orders_etl_skript as etl
+
+HEADER = "OrderID,CustomerName,Email,Country,Amount,OrderDate\n"
+
+
+def order_line(order_id):
+    return f"{order_id},Name {order_id},n{order_id}@example.de,DE,{order_id}.50,2025-01-{order_id:02d}\n"
+
+
+def run(mode, csv_path, tmp_path, append):
+    kwargs = dict(output=tmp_path / "clean.csv", append=append, seen_ids=etl.OrderIDIndex(tmp_path / "ids.npy"),
+                  state=etl.ETLState(tmp_path / "state.json"))
+    if mode == "memory":
+        etl.etl_pipeline_in_memory([csv_path], preview=False, **kwargs)
+    else:
+        etl.etl_pipeline_streaming([csv_path], chunksize=2, preview=False, **kwargs)
+    return pd.read_csv(tmp_path / "clean.csv")["OrderID"].tolist()
+
+
+@pytest.mark.parametrize("mode", ["memory", "stream"])
+def test_half_written_last_line_is_read_once_complete(mode, tmp_path):
+    csv_path = tmp_path / "orders.csv"
+    line = order_line(3)
+    csv_path.write_text(HEADER + order_line(1) + order_line(2) + line[:20], encoding="utf-8")
+
+    assert run(mode, csv_path, tmp_path, append=False) == [1, 2]
+    assert etl.ETLState(tmp_path / "state.json").files[str(csv_path.resolve())]["offset"] == len(
+        HEADER + order_line(1) + order_line(2)
+    )
+
+    with open(csv_path, "a", encoding="utf-8") as f:
+        f.write(line[20:] + order_line(4))
+    assert run(mode, csv_path, tmp_path, append=True) == [1, 2, 3, 4]
+
+
+def test_file_without_any_complete_line_is_skipped(tmp_path):
+    csv_path = tmp_path / "orders.csv"
+    csv_path.write_text(HEADER[:10], encoding="utf-8")
+    etl.etl_pipeline_streaming([csv_path], tmp_path / "clean.csv", state=etl.ETLState(tmp_path / "state.json"),
+                               preview=False)
+    assert not (tmp_path / "clean.csv").exists()
+
+
+@pytest.mark.parametrize("mode", ["memory", "stream", "parallel"])
+def test_later_file_with_older_orders_is_not_cut_off(mode, tmp_path):
+    newer, older = tmp_path / "a.csv", tmp_path / "b.csv"
+    newer.write_text(HEADER + order_line(20) + order_line(21), encoding="utf-8")
+    older.write_text(HEADER + order_line(10) + order_line(11), encoding="utf-8")
+    state = etl.ETLState(tmp_path / "state.json")
+    output = tmp_path / "clean.csv"
+    if mode == "parallel":
+        etl.etl_pipeline_parallel([newer, older], output, chunksize=1, state=state, workers=2)
+    elif mode == "stream":
+        etl.etl_pipeline_streaming([newer, older], output, chunksize=1, state=state, preview=False)
+    else:
+        etl.etl_pipeline_in_memory([newer, older], output, state=state, preview=False)
+    assert pd.read_csv(output)["OrderID"].tolist() == [20, 21, 10, 11]
+    assert etl.ETLState(tmp_path / "state.json").watermark == (pd.Timestamp("2025-01-21"), 21)
+
+
+@pytest.mark.parametrize("mode", ["memory", "stream"])
+def test_last_line_without_newline_is_read_once_the_file_is_unchanged(mode, tmp_path):
+    csv_path = tmp_path / "orders.csv"
+    csv_path.write_text(HEADER + order_line(1) + order_line(2).rstrip("\n"), encoding="utf-8")
+
+    assert run(mode, csv_path, tmp_path, append=False) == [1]      # may still be being written
+    assert run(mode, csv_path, tmp_path, append=True) == [1, 2]    # unchanged since: complete
+    assert run(mode, csv_path, tmp_path, append=True) == [1, 2]
+
+    with open(csv_path, "a", encoding="utf-8") as f:
+        f.write("\n" + order_line(3))
+    assert run(mode, csv_path, tmp_path, append=True) == [1, 2, 3]
+
+
+def test_final_reads_last_line_without_newline_at_once(tmp_path):
+    csv_path = tmp_path / "orders.csv"
+    csv_path.write_text(HEADER + order_line(1) + order_line(2).rstrip("\n"), encoding="utf-8")
+    etl.etl_pipeline_streaming([csv_path], tmp_path / "clean.csv", preview=False,
+                               state=etl.ETLState(tmp_path / "state.json", final=True))
+    assert pd.read_csv(tmp_path / "clean.csv")["OrderID"].tolist() == [1, 2]
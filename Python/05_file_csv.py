@@ -47,6 +47,11 @@ with open("data.csv", "r") as file:
     for row in reader:
         print(f"Name: {row['Name']}, Age: {row['Age']}, City: {row['City']}")
 
+# NOTE: DictReader creates a new dict of strings for every row. For exports
+#       with millions of rows see 25_csv_typed_reader.py (typed tuples,
+#       __slots__ records, column arrays - converted in batches) and
+#       26_csv_parallel_split.py (one file parsed on all CPU cores)
+
 # ============================================================================
 # CSV FOR BI & DATA PIPELINES
 # ============================================================================
@@ -103,6 +108,9 @@ with open("sales_data.csv", "w", newline="") as f:
 # - Set refresh schedule (hourly/daily)
 # - Publish to Power BI Service
 """)
+# NOTE: For exports with millions of records see 27_csv_bulk_writer.py -
+#       batched writes, gzip/zstd, and an atomic rename so Power BI never
+#       refreshes from a half-written file
 
 print("\n🔗 Make.com / n8n Integration:")
 print("- Trigger: Scheduled (daily 9am)")
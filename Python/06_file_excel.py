@@ -52,6 +52,11 @@ try:
     for row in ws.iter_rows(values_only=True):
         print(f"  {row}")
 
+    # NOTE: load_workbook() builds a Cell object for every cell - fine here,
+    #       minutes and gigabytes for a 500k-row sheet. For big workbooks see
+    #       28_excel_streaming_read.py (row batches / DataFrame chunks
+    #       streamed from the sheet XML in constant memory)
+
     # ============================================================================
     # ACCESSING SPECIFIC CELLS
     # ============================================================================
@@ -96,6 +101,11 @@ try:
 
     print("✓ Applied formatting")
 
+    # NOTE: Every Font()/PatternFill() here is a new style object, and the
+    #       whole workbook stays in memory until wb.save(). For big reports
+    #       see 29_excel_streaming_report.py (write-only sheets, named styles
+    #       defined once, constant memory)
+
     # ============================================================================
     # WORKING WITH FORMULAS
     # ============================================================================
@@ -111,6 +121,10 @@ try:
 
     print("✓ Added formulas to 'Calculations' sheet")
 
+    # NOTE: openpyxl stores only the formula text - the results exist once
+    #       Excel opens the file. To check totals without Excel see
+    #       31_excel_formula_engine.py (parser, dependency graph, numpy)
+
     # ============================================================================
     # SAVING CHANGES
     # ============================================================================
@@ -128,11 +142,16 @@ try:
     - Merge data from CSV → Excel
     - Create dashboards with formulas
     """)
+    # NOTE: Many workbooks with slightly different columns → see
+    #       30_excel_consolidate.py (process pool, target schema, cache)
 
     print("\n📊 For BI Integration:")
     print("- Read Excel → Transform → Load to Power BI")
     print("- Export processed data to Excel for stakeholders")
     print("- Automate monthly/weekly report generation")
+    # NOTE: Jobs that re-read the same unchanged workbooks every run → see
+    #       32_conversion_cache.py (parsed once, then loaded from an Arrow
+    #       file keyed by the content hash)
 
     # Clean up
     import os
@@ -21,6 +21,12 @@ for count, filename in enumerate(os.listdir(".")):
         # os.rename(filename, new_name)  # Commented out for safety
         print(f"Would rename: {filename} -> {new_name}")
 
+# NOTE: count comes from ALL files, and os.rename() silently replaces an
+#       existing file_3.txt. For real batches see 33_rename_planner.py (plan
+#       checked for collisions and cycles first, journal for resume/rollback)
+#       and 34_rename_templates.py (whole folder trees, templates with dates
+#       from file metadata, counters and regex captures, dry run)
+
 print("\n# WHY USE THIS:")
 print("# - Rename hundreds of files instantly")
 print("# - Add prefixes, suffixes, or dates to file names")
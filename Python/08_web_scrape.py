@@ -27,9 +27,16 @@ try:
 
     response = requests.get(url)
     html = response.text
+    # NOTE: One page at a time - the program waits for every answer. For
+    #       thousands of pages see 35_async_crawler.py (asyncio + aiohttp,
+    #       reused connections, per-host limits and delays, robots.txt)
+    #       Scheduled scrapes of unchanged pages: 37_http_cache.py
 
     # Parse HTML with BeautifulSoup
     soup = BeautifulSoup(html, "html.parser")
+    # NOTE: This builds a Python object for every tag and text on the page.
+    #       For scrape jobs see 36_html_extract.py (field spec compiled once,
+    #       lxml + XPath or a streaming parser without a tree)
 
     # Extract data
     print(f"✓ Page title: {soup.title.string if soup.title else 'No title'}")
@@ -114,6 +121,10 @@ soup = BeautifulSoup(html, "html.parser")
 # Close browser
 driver.quit()
 ''')
+# NOTE: A new Chrome per job costs seconds of startup, and every image and
+#       font is downloaded. For many pages see 39_browser_pool.py (warm
+#       browsers shared by jobs, assets blocked, plain HTTP for pages that
+#       do not need JavaScript)
 
 # ============================================================================
 # WHEN TO USE WHICH?
@@ -145,6 +156,10 @@ print("""
 # PRACTICAL AUTOMATION IDEAS
 # ============================================================================
 
+# NOTE: Price monitors and news aggregators that poll many pages: see
+#       38_change_detection.py (per-URL fingerprints, simhash for texts,
+#       only real changes reach alerts and downstream jobs)
+
 print("\n" + "="*60)
 print("AUTOMATION IDEAS (FROM ATBS)")
 print("="*60)
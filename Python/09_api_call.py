@@ -14,6 +14,9 @@ try:
     # Make GET request to API
     url = "https://api.coindesk.com/v1/bpi/currentprice.json"
     response = requests.get(url)
+    # NOTE: Polling every hour downloads the full answer every time. For
+    #       monitoring jobs see 37_http_cache.py (ETag/Last-Modified,
+    #       conditional requests, 304 served from disk)
 
     # Check if request was successful
     if response.status_code == 200:
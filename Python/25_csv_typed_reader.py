@@ -0,0 +1,291 @@
+# ============================================================================
+# 25. TYPED CSV READER - FEWER OBJECTS PER ROW
+# ============================================================================
+# WHAT: Read CSV rows as typed tuples, __slots__ records or column arrays
+# WHY: csv.DictReader (05_file_csv.py) builds a new dict of strings for every
+#      row, and every value still has to be converted by hand. On exports with
+#      millions of rows most of the time goes into creating those objects.
+# WHEN: Scanning big CSV exports (sales, orders, logs) in plain Python
+#
+# Run the benchmark (default 1M rows; --rows 50000000 writes a ~2 GB file):
+#     python 25_csv_typed_reader.py
+#     python 25_csv_typed_reader.py --rows 50000000
+#     python 25_csv_typed_reader.py --file big_export.csv
+
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+from datetime import date, timedelta
+from functools import partial
+from itertools import islice
+from operator import itemgetter
+
+# ============================================================================
+# SCHEMA - COLUMN NAME → CONVERTER
+# ============================================================================
+# WHAT: Which columns to read and how to turn the text into Python values
+# WHY: Columns not in the schema are never converted (projection)
+# NOTE: Converters run on whole columns (map over a batch), not cell by cell
+#       in a Python loop - map() calls float/int/date.fromisoformat from C
+
+SALES_SCHEMA = {
+    "Date": date.fromisoformat,
+    "Region": str,
+    "Revenue": float,
+    "Items": int,
+}
+
+# float/int columns can be stored unboxed: 8 bytes per value in an array
+# instead of a 24-32 byte Python object plus an 8 byte list slot
+ARRAY_TYPECODES = {float: "d", int: "q"}
+
+
+def optional(convert):
+    """Converter for nullable columns: "" → None, anything else → convert(value).
+
+    Use it in a schema for columns that may be empty, e.g.
+    {"Discount": optional(float)}. Without it an empty numeric cell raises
+    ValueError. Optional columns are read as lists (an array cannot hold None).
+    """
+    def convert_or_none(value):
+        return convert(value) if value != "" else None
+    return convert_or_none
+
+
+# Same export with the nullable Discount column (empty for most orders)
+SALES_SCHEMA_WITH_DISCOUNT = {**SALES_SCHEMA, "Discount": optional(float)}
+
+
+# ============================================================================
+# RAW BATCHES - csv.reader + itemgetter
+# ============================================================================
+# WHAT: Read `batch_rows` rows at a time, keep only the schema columns
+# WHY: csv.reader returns plain lists (no dict per row); itemgetter picks the
+#      wanted columns in C
+
+def raw_batches(path, schema, batch_rows=10_000):
+    """Yield lists of raw string tuples (schema column order)."""
+    with open(path, newline="", encoding="utf-8") as file:
+        reader = csv.reader(file)
+        header = next(reader, [])
+        missing = [column for column in schema if column not in header]
+        if missing:
+            raise ValueError(f"{path}: missing columns {missing}")
+        positions = [header.index(column) for column in schema]
+        if len(positions) == 1:
+            position = positions[0]
+            pick = lambda row: (row[position],)  # noqa: E731 - itemgetter(i) would not return a tuple
+        else:
+            pick = itemgetter(*positions)
+        while True:
+            batch = list(map(pick, islice(reader, batch_rows)))
+            if not batch:
+                return
+            yield batch
+
+
+def typed_columns(batch, schema):
+    """Transpose a raw batch and convert each column in one map() call."""
+    return [convert_column(name, convert, list, column) for (name, convert), column in zip(schema.items(), zip(*batch))]
+
+
+def convert_column(name, convert, container, raw):
+    """container(map(convert, raw)), with the column name in conversion errors."""
+    try:
+        return container(map(convert, raw))
+    except ValueError as error:
+        hint = " (use optional() for columns with empty cells)" if "" in raw else ""
+        raise ValueError(f"column {name!r}: {error}{hint}") from None
+
+
+# ============================================================================
+# ROW API - TUPLES OR __slots__ RECORDS
+# ============================================================================
+# WHAT: Iterate typed rows
+# WHY: A tuple is the cheapest row object; a __slots__ class gives named
+#      attributes (row.revenue) without a per-object __dict__
+
+class SaleRecord:
+    __slots__ = ("date", "region", "revenue", "items")
+
+    def __init__(self, date, region, revenue, items):
+        self.date = date
+        self.region = region
+        self.revenue = revenue
+        self.items = items
+
+    def __repr__(self):
+        return f"SaleRecord({self.date}, {self.region!r}, {self.revenue}, {self.items})"
+
+
+def read_typed(path, schema=SALES_SCHEMA, record=None, batch_rows=10_000):
+    """Yield typed tuples, or record(*values) objects if record is given.
+
+    record takes the values in schema order (e.g. SaleRecord).
+    """
+    for batch in raw_batches(path, schema, batch_rows):
+        columns = typed_columns(batch, schema)
+        yield from (map(record, *columns) if record else zip(*columns))
+
+
+# ============================================================================
+# COLUMNAR API - ONE ARRAY PER COLUMN PER BATCH
+# ============================================================================
+# WHAT: Yield {column: values} per batch - array('d') / array('q') for
+#       float/int columns, lists for everything else
+# WHY: No row objects at all; numeric columns hold raw machine numbers and
+#      feed sum(), statistics, numpy.frombuffer() or pandas without copies
+# WHEN: Aggregations and scans ("total revenue per region")
+
+def read_columns(path, schema=SALES_SCHEMA, batch_rows=100_000):
+    for batch in raw_batches(path, schema, batch_rows):
+        columns = {}
+        for (name, convert), raw in zip(schema.items(), zip(*batch)):
+            typecode = ARRAY_TYPECODES.get(convert)
+            container = partial(array, typecode) if typecode else list
+            columns[name] = convert_column(name, convert, container, raw)
+        yield columns
+
+
+# ============================================================================
+# BENCHMARK - DictReader vs. typed rows vs. columns
+# ============================================================================
+# Every reader computes the same thing: total revenue and items per region
+
+def write_sample_csv(path, rows, seed=42):
+    """Sales export with a few extra columns the readers skip."""
+    rng = random.Random(seed)
+    regions = ["DE", "FR", "IT", "ES", "NL", "AT", "BE", "PL"]
+    start = date(2025, 1, 1)
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["OrderID", "Date", "Region", "Customer", "Revenue", "Items", "Channel", "Discount"])
+        for first in range(0, rows, 100_000):
+            writer.writerows(
+                (i, (start + timedelta(days=i % 365)).isoformat(), rng.choice(regions), f"Customer {i % 9973}",
+                 round(rng.uniform(5, 500), 2), rng.randint(1, 9), "web" if i % 3 else "shop",
+                 0.1 if i % 7 == 0 else "")
+                for i in range(first, min(first + 100_000, rows))
+            )
+
+
+def scan_dictreader(path):
+    totals = {}
+    with open(path, newline="", encoding="utf-8") as file:
+        for row in csv.DictReader(file):
+            revenue, items = totals.get(row["Region"], (0.0, 0))
+            date.fromisoformat(row["Date"])  # same conversion work as the typed readers
+            totals[row["Region"]] = (revenue + float(row["Revenue"]), items + int(row["Items"]))
+    return totals
+
+
+def scan_tuples(path):
+    totals = {}
+    for _, region, revenue, items in read_typed(path):
+        total_revenue, total_items = totals.get(region, (0.0, 0))
+        totals[region] = (total_revenue + revenue, total_items + items)
+    return totals
+
+
+def scan_records(path):
+    totals = {}
+    for sale in read_typed(path, record=SaleRecord):
+        total_revenue, total_items = totals.get(sale.region, (0.0, 0))
+        totals[sale.region] = (total_revenue + sale.revenue, total_items + sale.items)
+    return totals
+
+
+def scan_columns(path):
+    totals = {}
+    for columns in read_columns(path):
+        for region, revenue, items in zip(columns["Region"], columns["Revenue"], columns["Items"]):
+            total_revenue, total_items = totals.get(region, (0.0, 0))
+            totals[region] = (total_revenue + revenue, total_items + items)
+    return totals
+
+
+def peak_memory(scan, path):
+    """Peak traced Python memory while scanning (run on a sample, tracing is slow)."""
+    tracemalloc.start()
+    scan(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def held_column_bytes(values):
+    """Memory for keeping one numeric column: container + value objects."""
+    if isinstance(values, array):
+        return sys.getsizeof(values)
+    return sys.getsizeof(values) + sum(sys.getsizeof(value) for value in values)
+
+
+def run_benchmark(path, sample_rows=200_000):
+    size_mb = os.path.getsize(path) / 1e6
+    print(f"File: {path} ({size_mb:,.1f} MB)")
+    readers = {
+        "csv.DictReader": scan_dictreader,
+        "typed tuples": scan_tuples,
+        "__slots__ records": scan_records,
+        "column arrays": scan_columns,
+    }
+
+    with tempfile.TemporaryDirectory() as folder:
+        sample = os.path.join(folder, "sample.csv")
+        with open(path, newline="", encoding="utf-8") as source, open(sample, "w", newline="", encoding="utf-8") as target:
+            target.writelines(islice(source, sample_rows + 1))
+        peaks = {name: peak_memory(scan, sample) for name, scan in readers.items()}
+
+    print(f"\n{'reader':<18} {'seconds':>9} {'MB/sec':>8} {'speedup':>8} {'peak KB*':>9}")
+    baseline = None
+    results = []
+    for name, scan in readers.items():
+        start = time.perf_counter()
+        results.append(scan(path))
+        seconds = time.perf_counter() - start
+        baseline = baseline or seconds
+        print(f"{name:<18} {seconds:9.2f} {size_mb / seconds:8.1f} {baseline / seconds:7.2f}x {peaks[name] / 1024:9.0f}")
+    print(f"* traced Python memory while scanning the first {sample_rows:,} rows -")
+    print("  the batched readers hold one batch (batch_rows) at a time, DictReader one row")
+
+    # All readers must agree (float sums can differ in the last digit)
+    for totals in results[1:]:
+        assert totals.keys() == results[0].keys()
+        for region, (revenue, items) in totals.items():
+            assert items == results[0][region][1] and abs(revenue - results[0][region][0]) < 1e-6 * revenue
+
+    first_batch = next(read_columns(path, batch_rows=100_000))
+    boxed = list(first_batch["Revenue"])
+    print(f"\nKeeping 100k Revenue values: list of floats {held_column_bytes(boxed) / 1e6:.1f} MB, "
+          f"array('d') {held_column_bytes(first_batch['Revenue']) / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Typed CSV reader vs. csv.DictReader")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="rows in the generated sample file")
+    parser.add_argument("--file", help="benchmark an existing CSV with Date,Region,Revenue,Items columns")
+    args = parser.parse_args()
+
+    print("Typed rows:")
+    with tempfile.TemporaryDirectory() as folder:
+        path = args.file or os.path.join(folder, "sales_export.csv")
+        if not args.file:
+            print(f"Writing {args.rows:,} sample rows...")
+            write_sample_csv(path, args.rows)
+        for row in islice(read_typed(path), 2):
+            print("  tuple: ", row)
+        for sale in islice(read_typed(path, record=SaleRecord), 2):
+            print("  record:", sale)
+        columns = next(read_columns(path, batch_rows=5))
+        print("  columns:", columns)
+        if not args.file:
+            discounts = next(read_columns(path, SALES_SCHEMA_WITH_DISCOUNT, batch_rows=8))["Discount"]
+            print("  nullable Discount:", discounts)
+        print()
+        run_benchmark(path)
@@ -0,0 +1,247 @@
+# ============================================================================
+# 26. PARALLEL CSV PARSING - MEMORY-MAPPED SPLITTER + PROCESS POOL
+# ============================================================================
+# WHAT: Cut one big CSV into byte ranges that start and end on whole records,
+#       parse the ranges in a process pool, get the results back in order
+# WHY: 05_file_csv.py reads line by line on one core. A 20 GB export takes
+#      minutes that way; with N cores it takes roughly 1/N of that
+# WHEN: Big single-file exports (sales, logs) and aggregations over them
+#
+# How the split works:
+# - The file is opened with mmap: workers read only their own range and
+#   the OS shares the pages, nothing is loaded up front
+# - A cut at an arbitrary byte offset moves forward to the next newline that
+#   really ends a record. A newline inside a quoted field ("Street 1\nBerlin")
+#   does not, which is why plain "seek + readline" splitting breaks CSVs
+# - "fast" boundaries (default): check the candidate by parsing a few records
+#   from it (strict quoting, right number of columns). Only the bytes around
+#   each cut are read - no pass over the file just to split it. It is a
+#   check, not a proof: a quoted field whose lines look like whole records
+#   ("a,b,c\nd,e,f" in a 3-column file) can fool it
+# - "exact" boundaries (opt-in): every worker counts the quote characters in
+#   its range, a prefix sum gives the quote state at each cut. Correct for
+#   any RFC 4180 file, costs one extra parallel pass (a byte count, not
+#   parsing). Use it for files with multi-line fields of that kind
+#
+# Run the demo (--rows 100000000 for a multi-GB file):
+#     python 26_csv_parallel_split.py
+#     python 26_csv_parallel_split.py --file sales.csv --workers 8 --boundaries exact
+
+import argparse
+import csv
+import io
+import mmap
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_RANGE_BYTES = 64 * 1024 * 1024   # piece size: big enough to amortise the pool, small enough for RAM
+CHECK_ROWS = 8                            # records a "fast" boundary must parse cleanly
+CHECK_WINDOW = 256 * 1024                 # bytes read to check one candidate
+
+
+# ============================================================================
+# HEADER + RECORD BOUNDARIES
+# ============================================================================
+
+def read_header(data):
+    """Header fields and the offset of the first data record."""
+    end = data.find(b"\n")
+    end = len(data) if end == -1 else end + 1
+    header = next(csv.reader([data[:end].decode("utf-8-sig")]), [])
+    return header, end
+
+
+def looks_like_record_start(data, offset, columns):
+    """Do the bytes at offset parse as CHECK_ROWS complete records?"""
+    window_end = min(len(data), offset + CHECK_WINDOW)
+    if window_end < len(data):
+        window_end = data.rfind(b"\n", offset, window_end) + 1
+        if window_end <= offset:
+            return False
+    text = data[offset:window_end].decode("utf-8", errors="replace")
+    try:
+        for number, record in enumerate(csv.reader(io.StringIO(text), strict=True), 1):
+            if len(record) != columns:
+                return False
+            if number == CHECK_ROWS:
+                return True
+    except csv.Error:
+        return False
+    return True  # fewer records than CHECK_ROWS, but all of them clean
+
+
+def next_record_start(data, offset, columns):
+    """First offset >= offset right after a newline that ends a record."""
+    while True:
+        newline = data.find(b"\n", offset)
+        if newline == -1:
+            return len(data)
+        offset = newline + 1
+        if looks_like_record_start(data, offset, columns):
+            return offset
+
+
+def quote_info(path, start, end):
+    """Worker: quote count of [start, end) and the first newline after which
+    the number of quotes since start is even (0) or odd (1)."""
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        chunk = data[start:end]
+    first_after = [None, None]
+    position = parity = 0
+    while None in first_after:
+        newline = chunk.find(b"\n", position)
+        if newline == -1:
+            break
+        parity ^= chunk.count(b'"', position, newline) & 1
+        if first_after[parity] is None:
+            first_after[parity] = start + newline + 1
+        position = newline + 1
+    return chunk.count(b'"'), first_after
+
+
+def split_ranges(path, parts, boundaries="fast", executor=None):
+    """Header and a list of (start, end) byte ranges that hold whole records."""
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return [], []
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            header, first = read_header(data)
+            size = len(data)
+            if first >= size:
+                return header, []
+            step = max(1, (size - first) // max(1, parts))
+            cuts = list(range(first + step, size, step))[:parts - 1]
+            if boundaries == "fast":
+                starts = [first]
+                for cut in cuts:
+                    start = next_record_start(data, max(cut, starts[-1]) - 1, len(header))
+                    if start > starts[-1] and start < size:
+                        starts.append(start)
+                return header, list(zip(starts, starts[1:] + [size]))
+
+    # exact: quote parity at every cut, from per-range counts done in parallel
+    raw = list(zip([first] + cuts, cuts + [size]))
+    infos = executor.map(quote_info, [path] * len(raw), *zip(*raw)) if executor else \
+        (quote_info(path, start, end) for start, end in raw)
+    starts = [first]
+    inside_quotes = 0
+    for index, (quotes, first_after) in enumerate(infos):
+        # a record starts after a newline with an even number of quotes since the file start
+        if index > 0 and first_after[inside_quotes] is not None:
+            starts.append(first_after[inside_quotes])
+        inside_quotes ^= quotes & 1
+    starts = sorted(set(start for start in starts if start < size))
+    return header, list(zip(starts, starts[1:] + [size]))
+
+
+# ============================================================================
+# PARSING A RANGE - RUNS IN THE WORKER
+# ============================================================================
+# handler(header, rows) is called with a csv.reader over the range and returns
+# whatever should come back to the parent (keep it small: totals, counts, a
+# typed batch). It must be a top-level function so it can be pickled.
+
+def parse_range(path, start, end, header, handler):
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        text = data[start:end].decode("utf-8")
+    return handler(header, csv.reader(io.StringIO(text)))
+
+
+def parallel_parse(path, handler, workers=None, range_bytes=DEFAULT_RANGE_BYTES, boundaries="fast"):
+    """Yield handler results for consecutive pieces of the file, in file order."""
+    workers = workers or os.cpu_count() or 1
+    size = os.path.getsize(path)
+    parts = max(workers * 4, -(-size // range_bytes))  # ceil division
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        header, ranges = split_ranges(path, parts, boundaries, executor)
+        if not ranges:
+            return
+        starts, ends = zip(*ranges)
+        count = len(ranges)
+        # map() hands the results back in submission order
+        yield from executor.map(parse_range, [path] * count, starts, ends, [header] * count, [handler] * count)
+
+
+# ============================================================================
+# HANDLERS + DEMO
+# ============================================================================
+
+def count_rows(header, rows):
+    return sum(1 for _ in rows)
+
+
+def region_totals(header, rows):
+    region, revenue = header.index("Region"), header.index("Revenue")
+    totals = {}
+    for row in rows:
+        totals[row[region]] = totals.get(row[region], 0.0) + float(row[revenue])
+    return totals
+
+
+def piece_order_ids(header, rows):
+    """First and last OrderID of the piece - shows the results arrive in order."""
+    ids = [row[0] for row in rows]
+    return (ids[0], ids[-1]) if ids else None
+
+
+def merge_totals(results):
+    merged = {}
+    for totals in results:
+        for region, revenue in totals.items():
+            merged[region] = merged.get(region, 0.0) + revenue
+    return merged
+
+
+def write_sample_csv(path, rows, seed=42):
+    """Sales export whose Note column has quoted commas, quotes and newlines."""
+    rng = random.Random(seed)
+    regions = ["DE", "FR", "IT", "ES", "NL", "AT"]
+    notes = ["", "gift", "deliver to: Hauptstr. 1,\nBerlin", 'customer said "urgent"', "line one\nline two\n"]
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["OrderID", "Region", "Revenue", "Note"])
+        for first in range(0, rows, 100_000):
+            writer.writerows((i, rng.choice(regions), round(rng.uniform(5, 500), 2), rng.choice(notes))
+                             for i in range(first, min(first + 100_000, rows)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory-mapped parallel CSV parsing")
+    parser.add_argument("--rows", type=int, default=2_000_000, help="rows in the generated sample file")
+    parser.add_argument("--file", help="parse an existing CSV with Region and Revenue columns instead")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--boundaries", choices=["fast", "exact"], default="fast")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = args.file or os.path.join(folder, "sales_with_notes.csv")
+        if not args.file:
+            print(f"Writing {args.rows:,} sample rows (notes with quoted newlines)...")
+            write_sample_csv(path, args.rows)
+        size_mb = os.path.getsize(path) / 1e6
+
+        # Small pieces so even the demo file is cut in many places
+        pieces = list(parallel_parse(path, piece_order_ids, args.workers, range_bytes=4_000_000,
+                                     boundaries=args.boundaries))
+        print(f"\n{len(pieces)} pieces, in order: {pieces[:3]} ... {pieces[-1]}")
+
+        print(f"\n{'reader':<22} {'seconds':>9} {'MB/sec':>8}")
+        start = time.perf_counter()
+        with open(path, newline="", encoding="utf-8") as file:
+            reader = csv.reader(file)
+            serial = region_totals(next(reader), reader)
+        seconds = time.perf_counter() - start
+        print(f"{'serial csv.reader':<22} {seconds:9.2f} {size_mb / seconds:8.1f}")
+
+        start = time.perf_counter()
+        parallel = merge_totals(parallel_parse(path, region_totals, args.workers, boundaries=args.boundaries))
+        seconds = time.perf_counter() - start
+        workers = args.workers or os.cpu_count()
+        print(f"{f'{workers} processes ({args.boundaries})':<22} {seconds:9.2f} {size_mb / seconds:8.1f}")
+
+        same = serial.keys() == parallel.keys() and all(abs(serial[k] - parallel[k]) < 1e-6 * serial[k] for k in serial)
+        print(f"\nSame totals as the serial run: {same}")
+        print(f"Rows: {sum(parallel_parse(path, count_rows, args.workers, boundaries=args.boundaries)):,}")
@@ -0,0 +1,391 @@
+# ============================================================================
+# 28. STREAMING EXCEL INGESTION - ROW BATCHES STRAIGHT FROM THE SHEET XML
+# ============================================================================
+# WHAT: Read .xlsx sheets row by row without building a Cell object per cell
+# WHY: load_workbook("people.xlsx") in 06_file_excel.py loads the whole
+#      workbook into memory (one Python object per cell). A 500k-row finance
+#      workbook takes minutes and gigabytes that way
+# WHEN: Ingesting big exports (finance, ERP, CRM) into pandas / a database
+#
+# How it works:
+# - An .xlsx file is a ZIP archive. Each sheet is an XML file
+#   (xl/worksheets/sheet1.xml), and texts are stored once in
+#   xl/sharedStrings.xml and referenced by number
+# - xml.etree.ElementTree.iterparse() reads the sheet XML as a stream from
+#   the ZIP. Each finished <row> is turned into a tuple and then cleared, so
+#   memory stays flat no matter how many rows the sheet has
+# - Only the shared strings (unique texts) and the date styles are kept
+# - Standard library only; pandas is needed just for the DataFrame chunks
+#
+# Run the benchmark (--rows 500000 for a finance-sized workbook):
+#     python 28_excel_streaming_read.py
+#     python 28_excel_streaming_read.py --rows 500000
+#     python 28_excel_streaming_read.py --file finance.xlsx --sheet Ledger
+
+import argparse
+import os
+import posixpath
+import re
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from itertools import islice
+from xml.etree.ElementTree import iterparse
+
+REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PACKAGE_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# Built-in number formats that are dates/times (ECMA-376 18.8.30)
+BUILTIN_DATE_FORMATS = {14, 15, 16, 17, 18, 19, 20, 21, 22, 45, 46, 47}
+EPOCH_1900 = datetime(1899, 12, 30)  # Excel's 1900 leap-year bug is baked into this epoch
+EPOCH_1904 = datetime(1904, 1, 1)
+
+
+def local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def namespace(tag):
+    return tag[:tag.index("}") + 1] if tag.startswith("{") else ""
+
+
+# ============================================================================
+# WORKBOOK PARTS - SHEET PATHS, SHARED STRINGS, DATE STYLES
+# ============================================================================
+
+def sheet_paths(archive):
+    """{sheet name: path inside the ZIP} in workbook order, and the 1904 flag."""
+    rels = {}
+    with archive.open("xl/_rels/workbook.xml.rels") as f:
+        for _, elem in iterparse(f):
+            if elem.tag == PACKAGE_REL_NS + "Relationship":
+                target = elem.get("Target")
+                rels[elem.get("Id")] = target.lstrip("/") if target.startswith("/") else posixpath.join("xl", target)
+    sheets, date1904 = {}, False
+    with archive.open("xl/workbook.xml") as f:
+        for _, elem in iterparse(f):
+            name = local_name(elem.tag)
+            if name == "sheet":
+                sheets[elem.get("name")] = rels[elem.get(REL_NS + "id")]
+            elif name == "workbookPr":
+                date1904 = elem.get("date1904") in ("1", "true")
+    return sheets, date1904
+
+
+def shared_strings(archive):
+    """List of all shared strings (rich text runs joined)."""
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return []
+    strings = []
+    with archive.open("xl/sharedStrings.xml") as f:
+        for _, elem in iterparse(f):
+            if local_name(elem.tag) == "si":
+                # <si><t>text</t></si> or rich text <si><r><t>a</t></r><r><t>b</t></r></si>
+                strings.append("".join(t.text or "" for t in elem.iter() if local_name(t.tag) == "t"))
+                elem.clear()
+    return strings
+
+
+def is_date_format(code):
+    """Does a custom number format like 'dd.mm.yyyy hh:mm' show a date/time?"""
+    code = re.sub(r'"[^"]*"|\[[^\]]*\]|\\.', "", code)  # drop literals, colours, escapes
+    return bool(re.search(r"[dmyhs]", code, re.IGNORECASE))
+
+
+def date_style_ids(archive):
+    """Indexes of the cell styles (the s="..." attribute) that format dates."""
+    if "xl/styles.xml" not in archive.namelist():
+        return set()
+    custom_dates, xf_formats, in_cell_xfs = set(), [], False
+    with archive.open("xl/styles.xml") as f:
+        for event, elem in iterparse(f, events=("start", "end")):
+            name = local_name(elem.tag)
+            if name == "cellXfs":
+                in_cell_xfs = event == "start"
+            elif event == "end" and name == "numFmt" and is_date_format(elem.get("formatCode", "")):
+                custom_dates.add(int(elem.get("numFmtId")))
+            elif event == "start" and name == "xf" and in_cell_xfs:
+                xf_formats.append(int(elem.get("numFmtId", 0)))
+    date_formats = BUILTIN_DATE_FORMATS | custom_dates
+    return {index for index, fmt in enumerate(xf_formats) if fmt in date_formats}
+
+
+# ============================================================================
+# STREAMING ROWS
+# ============================================================================
+
+def column_index(reference):
+    """'C12' → 2 (0-based)."""
+    index = 0
+    for char in reference:
+        if char.isdigit():
+            break
+        index = index * 26 + ord(char) - 64
+    return index - 1
+
+
+def iter_sheet_rows(path, sheet=None):
+    """Yield each row of the sheet as a tuple of Python values.
+
+    Types: shared/inline strings → str, numbers → int/float, booleans → bool,
+    date-formatted numbers → datetime, errors → the error text ("#DIV/0!").
+    Formulas give their cached value (None if never calculated). Rows
+    that are missing in the XML (completely empty rows) are skipped.
+    """
+    with zipfile.ZipFile(path) as archive:
+        sheets, date1904 = sheet_paths(archive)
+        if sheet is None:
+            sheet = next(iter(sheets))
+        if sheet not in sheets:
+            raise KeyError(f"{path}: no sheet {sheet!r} (sheets: {', '.join(sheets)})")
+        strings = shared_strings(archive)
+        date_styles = date_style_ids(archive)
+        epoch = EPOCH_1904 if date1904 else EPOCH_1900
+
+        with archive.open(sheets[sheet]) as xml:
+            events = iterparse(xml, events=("start", "end"))
+            _, root = next(events)
+            ns = namespace(root.tag)
+            row_tag, cell_tag, value_tag, sheet_data_tag = ns + "row", ns + "c", ns + "v", ns + "sheetData"
+            inline_tag, text_tag = ns + "is", ns + "t"
+            sheet_data = root
+
+            for event, elem in events:
+                if event == "start":
+                    if elem.tag == sheet_data_tag:
+                        sheet_data = elem
+                    continue
+                if elem.tag != row_tag:
+                    continue
+
+                values = []
+                for cell in elem:
+                    if cell.tag != cell_tag:
+                        continue
+                    reference = cell.get("r")
+                    if reference is not None:
+                        position = column_index(reference)
+                        if position > len(values):
+                            values.extend([None] * (position - len(values)))  # skipped empty cells
+                    cell_type = cell.get("t")
+                    if cell_type == "inlineStr":
+                        inline = cell.find(inline_tag)
+                        values.append("".join(t.text or "" for t in inline.iter(text_tag)) if inline is not None else None)
+                        continue
+                    value = cell.find(value_tag)
+                    text = value.text if value is not None else None
+                    if text is None:
+                        values.append(None)
+                    elif cell_type is None or cell_type == "n":
+                        number = float(text)
+                        if int(cell.get("s", 0)) in date_styles:
+                            values.append(epoch + timedelta(milliseconds=round(number * 86_400_000)))  # Excel stores ms precision
+                        else:
+                            values.append(int(number) if number.is_integer() and "." not in text and "E" not in text else number)
+                    elif cell_type == "s":
+                        values.append(strings[int(text)])
+                    elif cell_type == "b":
+                        values.append(text == "1")
+                    elif cell_type == "d":
+                        values.append(datetime.fromisoformat(text))
+                    else:  # "str" (formula result) and "e" (error)
+                        values.append(text)
+                yield tuple(values)
+                sheet_data.clear()  # drop the finished row: constant memory
+
+
+def iter_row_batches(path, sheet=None, batch_rows=10_000):
+    """Yield lists of up to batch_rows row tuples (header row included)."""
+    rows = iter_sheet_rows(path, sheet)
+    while batch := list(islice(rows, batch_rows)):
+        yield batch
+
+
+def iter_dataframes(path, sheet=None, batch_rows=50_000, dtypes=None):
+    """Yield typed pandas DataFrame chunks; the first row is the header.
+
+    dtypes: optional {column: dtype} like pandas' read_csv. Without it the
+    types are inferred once, from the first chunk (see chunk_dtypes()), and
+    every chunk is cast to them, so all chunks have the same dtypes and
+    pd.concat() does not fall back to object columns. The one exception: an
+    integer column that gets fractions later on continues as float64.
+    """
+    import pandas as pd
+
+    rows = iter_sheet_rows(path, sheet)
+    header = next(rows, None)
+    if header is None:
+        return
+    columns = [str(name) if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+    width = len(columns)
+    while batch := list(islice(rows, batch_rows)):
+        batch = [row[:width] if len(row) >= width else row + (None,) * (width - len(row)) for row in batch]
+        df = pd.DataFrame.from_records(batch, columns=columns)
+        if dtypes is None:
+            dtypes = inferred = chunk_dtypes(df)
+        try:
+            yield df.astype(dtypes)
+        except (TypeError, ValueError) as error:
+            if dtypes is not inferred:
+                raise
+            yield df.astype(widen_dtypes(df, dtypes, path, error))
+
+
+def chunk_dtypes(df):
+    """dtypes inferred from one chunk, widened so later chunks fit them:
+    integers become nullable Int64 (an empty cell later on is not an error),
+    booleans nullable boolean, text and mixed columns stay object."""
+    import pandas as pd
+
+    dtypes = {}
+    for column, dtype in df.infer_objects().dtypes.items():
+        if pd.api.types.is_bool_dtype(dtype):
+            dtypes[column] = "boolean"
+        elif pd.api.types.is_integer_dtype(dtype):
+            dtypes[column] = "Int64"
+        elif pd.api.types.is_float_dtype(dtype) or pd.api.types.is_datetime64_any_dtype(dtype):
+            dtypes[column] = dtype
+        else:
+            dtypes[column] = object
+    return dtypes
+
+
+def widen_dtypes(df, dtypes, path, error):
+    """Int64 columns that get fractions in a later chunk (5 in the first
+    chunk, 7.31 later) become float64 from then on; other mismatches raise."""
+    for column, dtype in dtypes.items():
+        try:
+            df[column].astype(dtype)
+        except (TypeError, ValueError):
+            if dtype != "Int64":
+                raise ValueError(f"{path}: column {column!r} does not fit the dtype {dtype} inferred from "
+                                 f"the first chunk ({error}); pass dtypes= explicitly") from None
+            dtypes[column] = "float64"
+    return dtypes
+
+
+# ============================================================================
+# BENCHMARK - load_workbook + iter_rows vs. streaming
+# ============================================================================
+# Every reader runs in a fresh process, so the peak memory is its own.
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB (Linux/macOS).
+
+    Shared by the other benchmarks in this folder (29, 34), which import it
+    from here.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1024
+
+
+def write_finance_workbook(path, rows):
+    """Ledger sheet: date, account, text, amounts - written with write_only."""
+    from openpyxl import Workbook
+    from openpyxl.styles import NamedStyle
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Ledger")
+    date_style = NamedStyle(name="ledger_date", number_format="YYYY-MM-DD")
+    wb.add_named_style(date_style)
+    ws.append(["BookingDate", "Account", "CostCenter", "Text", "Debit", "Credit", "Posted"])
+    start = datetime(2025, 1, 1)
+    from openpyxl.cell import WriteOnlyCell
+    for i in range(rows):
+        booked = WriteOnlyCell(ws, value=start + timedelta(days=i % 365))
+        booked.style = "ledger_date"
+        ws.append([booked, 4000 + i % 50, f"CC-{i % 17:02d}", f"Invoice {i}", round((i * 7.31) % 1000, 2),
+                   0.0, i % 5 != 0])
+    wb.save(path)
+
+
+def read_full(path, sheet):
+    from openpyxl import load_workbook
+    wb = load_workbook(path)
+    return sum(1 for _ in wb[sheet].iter_rows(values_only=True))
+
+
+def read_openpyxl_read_only(path, sheet):
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True)
+    rows = sum(1 for _ in wb[sheet].iter_rows(values_only=True))
+    wb.close()
+    return rows
+
+
+def read_streaming(path, sheet):
+    return sum(len(batch) for batch in iter_row_batches(path, sheet))
+
+
+def read_dataframes(path, sheet):
+    return sum(len(df) for df in iter_dataframes(path, sheet)) + 1  # + header row
+
+
+def timed_in_fresh_process(reader, path, sheet):
+    start = time.perf_counter()
+    rows = reader(path, sheet)
+    return rows, time.perf_counter() - start, peak_rss_mb()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming Excel reader vs. openpyxl iter_rows")
+    parser.add_argument("--rows", type=int, default=100_000, help="rows in the generated workbook")
+    parser.add_argument("--file", help="benchmark an existing .xlsx instead")
+    parser.add_argument("--sheet", help="sheet name (default: Ledger / first sheet)")
+    parser.add_argument("--skip-full", action="store_true", help="skip the full load_workbook run (slow on big files)")
+    args = parser.parse_args()
+
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        print("openpyxl not installed")
+        print("Install with: pip install openpyxl")
+        sys.exit()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = args.file or os.path.join(folder, "finance.xlsx")
+        sheet = args.sheet or (None if args.file else "Ledger")
+        if not args.file:
+            print(f"Writing {args.rows:,}-row workbook...")
+            write_finance_workbook(path, args.rows)
+        sheet = sheet or next(iter(sheet_paths(zipfile.ZipFile(path))[0]))
+        print(f"File: {path} ({os.path.getsize(path) / 1e6:.1f} MB), sheet {sheet}\n")
+
+        for row in islice(iter_sheet_rows(path, sheet), 3):
+            print("  ", row)
+        try:
+            print(next(iter_dataframes(path, sheet, batch_rows=3)).dtypes.to_string(), "\n")
+        except ImportError:
+            print("pandas not installed - DataFrame chunks skipped\n")
+
+        readers = {
+            "load_workbook + iter_rows": read_full,
+            "read_only + iter_rows": read_openpyxl_read_only,
+            "streaming row batches": read_streaming,
+            "streaming DataFrames": read_dataframes,
+        }
+        if args.skip_full:
+            del readers["load_workbook + iter_rows"]
+        print(f"{'reader':<27} {'rows':>10} {'seconds':>9} {'rows/sec':>10} {'peak MB':>9}")
+        for name, reader in readers.items():
+            with ProcessPoolExecutor(max_workers=1) as pool:  # fresh process per reader
+                try:
+                    rows, seconds, peak = pool.submit(timed_in_fresh_process, reader, path, sheet).result()
+                except ImportError:
+                    print(f"{name:<27} skipped (pandas not installed)")
+                    continue
+            print(f"{name:<27} {rows:>10,} {seconds:9.2f} {rows / seconds:>10,.0f} {peak:9.1f}")
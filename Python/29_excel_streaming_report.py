@@ -0,0 +1,249 @@
+# ============================================================================
+# 29. STREAMING EXCEL REPORTS - WRITE-ONLY WORKBOOK + CACHED NAMED STYLES
+# ============================================================================
+# WHAT: Write big formatted Excel reports row by row, in constant memory
+# WHY: 06_file_excel.py builds the report in a normal Workbook (every cell
+#      stays in memory until wb.save) and styles cells one by one with new
+#      Font/PatternFill objects. Monthly reports with a million rows run
+#      out of RAM before wb.save() is reached
+# WHEN: Stakeholder reports, exports for Excel users, anything > 100k rows
+#
+# How:
+# - Workbook(write_only=True): ws.append() serialises each row to a temp
+#   file right away; nothing but the unique strings is kept in memory
+# - Styles are NamedStyles registered once per workbook. Each one is turned
+#   into its style array once (cached); every styled cell reuses that array
+#   instead of building and de-duplicating new Font/Fill objects per cell
+# - Column widths and frozen header are set up front (write-only sheets
+#   cannot change them after the first row)
+# - Saved to a temp file and renamed into place, like 27_csv_bulk_writer.py
+#
+# Run the benchmark (--rows 1000000 --skip-classic for a million-row report):
+#     python 29_excel_streaming_report.py
+
+import argparse
+import importlib
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+
+# Module names starting with a digit cannot be imported with "import ..."
+bulk_writer = importlib.import_module("27_csv_bulk_writer")
+streaming = importlib.import_module("28_excel_streaming_read")
+
+try:
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import Cell
+    from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+except ImportError:
+    Workbook = None
+
+# ============================================================================
+# STYLE CATALOGUE - DEFINED ONCE, REFERENCED BY NAME
+# ============================================================================
+# Each entry: keyword arguments for NamedStyle. "<name> highlight" variants
+# (yellow fill) are derived automatically when a row is highlighted.
+
+HIGHLIGHT_FILL = "FFF2CC"
+
+
+def report_styles():
+    return {
+        "header": dict(font=Font(bold=True, color="FFFFFF"), alignment=Alignment(horizontal="center"),
+                       fill=PatternFill(fill_type="solid", start_color="305496", end_color="305496")),
+        "text": dict(),
+        "integer": dict(number_format="#,##0"),
+        "money": dict(number_format="#,##0.00 [$€-407]"),
+        "percent": dict(number_format="0.0%"),
+        "date": dict(number_format="YYYY-MM-DD"),
+        "total": dict(font=Font(bold=True), number_format="#,##0.00 [$€-407]"),
+    }
+
+
+# ============================================================================
+# STREAMING REPORT WRITER
+# ============================================================================
+
+class ReportSheet:
+    """One write-only sheet; columns = [(header, style name, width), ...]."""
+
+    def __init__(self, report, title, columns, freeze_header=True):
+        self.report = report
+        self.ws = report.wb.create_sheet(title)
+        self.styles = [style for _, style, _ in columns]
+        self.rows_written = 0
+        for index, (_, _, width) in enumerate(columns, 1):
+            if width:
+                self.ws.column_dimensions[column_letter(index)].width = width
+        if freeze_header:
+            self.ws.freeze_panes = "A2"
+        header_style = report.style_array("header")
+        self.ws.append([styled_cell(self.ws, name, header_style) for name, _, _ in columns])
+
+    def write_row(self, values, highlight=False):
+        arrays = [self.report.style_array(style, highlight) for style in self.styles]
+        self.ws.append([
+            value if array is None or value is None else styled_cell(self.ws, value, array)
+            for value, array in zip(values, arrays)
+        ])
+        self.rows_written += 1
+
+    def write_rows(self, rows, highlight=None):
+        """Write an iterable of rows; highlight(row) → bool picks rows to highlight."""
+        for values in rows:
+            self.write_row(values, highlight(values) if highlight else False)
+
+
+class StreamingReport:
+    """with StreamingReport("report.xlsx") as report:
+           sheet = report.add_sheet("Sales", [("Date", "date", 12), ...])
+           sheet.write_rows(rows)
+    """
+
+    def __init__(self, path, styles=None):
+        if Workbook is None:
+            raise ImportError("openpyxl not installed - Install with: pip install openpyxl")
+        self.path = Path(path)
+        self.wb = Workbook(write_only=True)
+        self.styles = styles or report_styles()
+        self._arrays = {}
+
+    def style_array(self, name, highlight=False):
+        """Style array for a named style; registered with the workbook on first use."""
+        key = (name, highlight)
+        if key not in self._arrays:
+            if name == "text" and not highlight:
+                self._arrays[key] = None  # default style: plain values, no Cell object needed
+                return None
+            options = dict(self.styles[name])
+            if highlight:
+                options["fill"] = PatternFill(fill_type="solid", start_color=HIGHLIGHT_FILL, end_color=HIGHLIGHT_FILL)
+            style = NamedStyle(name=f"{name} highlight" if highlight else name, **options)
+            self.wb.add_named_style(style)
+            self._arrays[key] = style.as_tuple()
+        return self._arrays[key]
+
+    def add_sheet(self, title, columns, freeze_header=True):
+        return ReportSheet(self, title, columns, freeze_header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            return False
+        handle, temp_name = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp")
+        os.close(handle)
+        try:
+            self.wb.save(temp_name)
+            os.chmod(temp_name, bulk_writer.default_file_mode())  # mkstemp() files are 0600
+            os.replace(temp_name, self.path)
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+        return False
+
+
+def styled_cell(ws, value, style_array):
+    """Like WriteOnlyCell(ws, value), but with a cached style array (copied, not rebuilt)."""
+    return Cell(ws, row=1, column=1, value=value, style_array=style_array)  # ws.append sets the real position
+
+
+def column_letter(index):
+    """1 → A, 27 → AA."""
+    letters = ""
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+# ============================================================================
+# BENCHMARK - 06_file_excel.py style vs. streaming writer
+# ============================================================================
+
+SALES_COLUMNS = [("Date", "date", 12), ("Region", "text", 10), ("Product", "text", 18),
+                 ("Units", "integer", 10), ("Revenue", "money", 14), ("Margin", "percent", 10)]
+
+
+def sales_rows(rows):
+    """Generated report rows - produced one at a time, never held in a list."""
+    regions = ["DE", "FR", "IT", "ES", "NL", "AT"]
+    start = date(2025, 1, 1)
+    for i in range(rows):
+        units = 1 + i % 40
+        yield (start + timedelta(days=i % 365), regions[i % 6], f"Product {i % 250}", units,
+               round(units * 19.99, 2), (i % 35) / 100)
+
+
+def big_order(row):
+    return row[4] > 750
+
+
+def classic_report(path, rows):
+    """The 06_file_excel.py way: normal workbook, new style objects per cell."""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Sales"
+    ws.append([name for name, _, _ in SALES_COLUMNS])
+    for cell in ws[1]:
+        cell.font = Font(bold=True)
+    for row, values in enumerate(sales_rows(rows), 2):
+        ws.append(values)
+        # same formats as SALES_COLUMNS, set cell by cell
+        ws.cell(row=row, column=1).number_format = "YYYY-MM-DD"
+        ws.cell(row=row, column=4).number_format = "#,##0"
+        ws.cell(row=row, column=5).number_format = "#,##0.00 [$€-407]"
+        ws.cell(row=row, column=6).number_format = "0.0%"
+        if big_order(values):
+            for column in range(1, 7):
+                ws.cell(row=row, column=column).fill = PatternFill(start_color="FFF2CC", end_color="FFF2CC",
+                                                                   fill_type="solid")
+    wb.save(path)
+
+
+def streaming_report(path, rows):
+    with StreamingReport(path) as report:
+        sheet = report.add_sheet("Sales", SALES_COLUMNS)
+        sheet.write_rows(sales_rows(rows), highlight=big_order)
+
+
+def timed_in_fresh_process(writer, path, rows):
+    start = time.perf_counter()
+    writer(path, rows)
+    return time.perf_counter() - start, streaming.peak_rss_mb()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming Excel report writer vs. normal workbook")
+    parser.add_argument("--rows", type=int, default=200_000, help="report rows")
+    parser.add_argument("--skip-classic", action="store_true", help="skip the normal-workbook run")
+    args = parser.parse_args()
+
+    if Workbook is None:
+        print("openpyxl not installed")
+        print("Install with: pip install openpyxl")
+        sys.exit()
+
+    writers = {"normal workbook (06)": classic_report, "streaming + named styles": streaming_report}
+    if args.skip_classic:
+        del writers["normal workbook (06)"]
+
+    with tempfile.TemporaryDirectory() as folder:
+        print(f"Writing a {args.rows:,}-row sales report\n")
+        print(f"{'writer':<26} {'seconds':>9} {'rows/sec':>10} {'peak MB':>9} {'file MB':>9}")
+        for name, writer in writers.items():
+            path = os.path.join(folder, f"{writer.__name__}.xlsx")
+            with ProcessPoolExecutor(max_workers=1) as pool:  # fresh process: own peak memory
+                seconds, peak = pool.submit(timed_in_fresh_process, writer, path, args.rows).result()
+            size = os.path.getsize(path) / 1e6
+            print(f"{name:<26} {seconds:9.2f} {args.rows / seconds:>10,.0f} {peak:9.1f} {size:9.1f}")
+
+        from openpyxl import load_workbook
+        wb = load_workbook(os.path.join(folder, "streaming_report.xlsx"), read_only=True)
+        print(f"\nNamed styles in the streamed report: {', '.join(wb.named_styles)}")
+        wb.close()
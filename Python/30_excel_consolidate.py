@@ -0,0 +1,335 @@
+# ============================================================================
+# 30. CONSOLIDATING MANY WORKBOOKS - PROCESS POOL + SCHEMA ALIGNMENT + CACHE
+# ============================================================================
+# WHAT: Read hundreds of Excel files (regional/monthly reports), map their
+#       columns onto one target schema and merge everything into a single
+#       Parquet file
+# WHY: "Extract data from multiple Excel files" (06_file_excel.py) usually
+#      means: every region names its columns a bit differently (Umsatz vs.
+#      Revenue), adds extra columns, or uses several sheets. Reading them one
+#      by one with load_workbook takes ages
+# WHEN: Monthly consolidation of regional reports, merging exports from
+#       many teams
+#
+# How:
+# - Workbooks are read in a process pool with the streaming reader from
+#   28_excel_streaming_read.py (one core per workbook)
+# - Column names are normalised ("Booking Date" → "bookingdate") and matched
+#   against the target columns and their aliases; missing columns become
+#   empty, extra columns are dropped (and reported), types are coerced
+# - Cache: every aligned workbook is stored as Parquet under the SHA-256 of
+#   its content. On the next run unchanged files are not opened at all (size
+#   + mtime match the manifest; if only the mtime changed, the hash decides)
+# - The output is written piece by piece with a ParquetWriter (constant memory)
+#
+# Needs: pip install pandas pyarrow openpyxl (openpyxl only for the demo files)
+#
+# Run the demo:
+#     python 30_excel_consolidate.py
+#     python 30_excel_consolidate.py --files 300 --rows 5000
+
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+
+try:
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pd = None
+
+# Module names starting with a digit cannot be imported with "import ..."
+streaming = importlib.import_module("28_excel_streaming_read")
+
+CACHE_VERSION = 2   # bump when the alignment logic changes: invalidates all cached pieces
+
+# ============================================================================
+# TARGET SCHEMA
+# ============================================================================
+# column: (dtype, aliases). SourceSheet and SourceFile are added to every row
+# (SourceFile only when merging: identical files share one cached piece).
+
+TARGET_SCHEMA = {
+    "Date": ("datetime64[ns]", ["Datum", "BookingDate", "OrderDate"]),
+    "Region": ("string", ["Country", "Land", "Market"]),
+    "Product": ("string", ["Item", "Artikel", "SKU"]),
+    "Units": ("Int64", ["Qty", "Quantity", "Menge"]),
+    "Revenue": ("float64", ["Umsatz", "Amount", "Sales"]),
+}
+REQUIRED_COLUMNS = {"Date", "Revenue"}  # a sheet without these is not a data sheet
+
+
+def normalise(name):
+    """'Booking Date ' → 'bookingdate' (case, spaces, _ and - ignored)."""
+    return re.sub(r"[\s_\-]+", "", str(name)).casefold()
+
+
+def column_lookup(schema):
+    lookup = {}
+    for column, (_, aliases) in schema.items():
+        for name in [column, *aliases]:
+            lookup[normalise(name)] = column
+    return lookup
+
+
+def schema_fingerprint(schema):
+    return hashlib.sha256(json.dumps([CACHE_VERSION, schema], sort_keys=True).encode()).hexdigest()[:12]
+
+
+def arrow_schema(schema, source_file=True, fractional=()):
+    """Arrow schema for the target; Int64 columns listed in fractional are float64."""
+    types = {"datetime64[ns]": pa.timestamp("ns"), "string": pa.string(), "Int64": pa.int64(),
+             "float64": pa.float64()}
+    fields = [pa.field(column, types["float64" if column in fractional else dtype])
+              for column, (dtype, _) in schema.items()]
+    fields.append(pa.field("SourceSheet", pa.string()))
+    if source_file:
+        fields.append(pa.field("SourceFile", pa.string()))
+    return pa.schema(fields)
+
+
+# ============================================================================
+# ONE WORKBOOK - RUNS IN A WORKER PROCESS
+# ============================================================================
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(1024 * 1024):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def align_sheet(rows, schema, lookup):
+    """DataFrame in target layout from a sheet's rows, the dropped columns and
+    the bad values: {column: sheet row numbers} of cells that are not empty
+    but could not be read as a number/date (they become empty).
+
+    Int64 columns stay Int64 only when all values are whole numbers; a sheet
+    with 2.5 units gets a float64 column instead of failing.
+    """
+    header, *data = rows
+    positions, dropped = {}, []
+    for index, name in enumerate(header):
+        column = lookup.get(normalise(name)) if name is not None else None
+        if column and column not in positions:
+            positions[column] = index
+        elif name is not None:
+            dropped.append(str(name))
+    if not REQUIRED_COLUMNS <= positions.keys():
+        return None, dropped, {}
+
+    df = pd.DataFrame(index=range(len(data)))
+    bad_values = {}
+    for column, (dtype, _) in schema.items():
+        index = positions.get(column)
+        values = [row[index] if index < len(row) else None for row in data] if index is not None else [None] * len(data)
+        series = pd.Series(values, dtype=object)
+        if dtype == "string":
+            df[column] = series.where(series.isna(), series.astype(str)).astype(dtype)
+            continue
+        if dtype.startswith("datetime"):
+            converted = pd.to_datetime(series, errors="coerce")
+        else:
+            converted = pd.to_numeric(series, errors="coerce")
+            if dtype == "Int64" and (converted.dropna() % 1 != 0).any():
+                dtype = "float64"
+        bad = converted.isna() & series.notna() & (series.astype(str).str.strip() != "")
+        if bad.any():
+            bad_values[column] = (bad[bad].index + 2).tolist()  # + header row, 1-based
+        df[column] = converted.astype(dtype)
+    return df, dropped, bad_values
+
+
+def consolidate_workbook(path, content_hash, schema, cache_file):
+    """Read every data sheet of one workbook, align it, write it to cache_file."""
+    lookup = column_lookup(schema)
+    with streaming.zipfile.ZipFile(path) as archive:
+        sheet_names = list(streaming.sheet_paths(archive)[0])
+    frames, report = [], {"sheets": 0, "rows": 0, "dropped": set(), "bad_values": {}}
+    for sheet in sheet_names:
+        rows = list(streaming.iter_sheet_rows(path, sheet))
+        if not rows:
+            continue
+        df, dropped, bad_values = align_sheet(rows, schema, lookup)
+        if df is None:
+            continue
+        df["SourceSheet"] = sheet
+        frames.append(df)
+        report["sheets"] += 1
+        report["rows"] += len(df)
+        report["dropped"].update(dropped)
+        for column, sheet_rows in bad_values.items():
+            report["bad_values"][f"{sheet}!{column}"] = sheet_rows
+
+    fractional = {column for column, (dtype, _) in schema.items()
+                  if dtype == "Int64" and any(df[column].dtype == "float64" for df in frames)}
+    table_schema = arrow_schema(schema, source_file=False, fractional=fractional)
+    table = (pa.Table.from_pandas(pd.concat(frames, ignore_index=True), schema=table_schema, preserve_index=False)
+             if frames else table_schema.empty_table())
+    temp = Path(f"{cache_file}.{os.getpid()}.tmp")
+    pq.write_table(table, temp, compression="zstd")
+    os.replace(temp, cache_file)
+    report["dropped"] = sorted(report["dropped"])
+    return report
+
+
+def hash_if_needed(path, known):
+    """Content hash, reusing the manifest entry when size and mtime match."""
+    stat = os.stat(path)
+    if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+        return known["sha256"], stat
+    return file_sha256(path), stat
+
+
+# ============================================================================
+# CONSOLIDATION RUN
+# ============================================================================
+
+def consolidate(paths, output, cache_dir, schema=TARGET_SCHEMA, workers=None):
+    """Merge all workbooks into one Parquet file; returns a summary dict."""
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = cache_dir / "manifest.json"
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    fingerprint = schema_fingerprint(schema)
+    paths = [str(Path(p).resolve()) for p in paths]
+    summary = {"files": len(paths), "read": 0, "cached": 0, "rows": 0, "dropped": {}, "bad_values": {}}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # 1. content hashes (skipped for files whose size + mtime are unchanged)
+        hashed = list(pool.map(hash_if_needed, paths, [manifest.get(p) for p in paths], chunksize=16))
+        pieces, todo = [], []
+        for path, (content_hash, stat) in zip(paths, hashed):
+            cache_file = cache_dir / f"{content_hash}_{fingerprint}.parquet"
+            manifest[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": content_hash}
+            pieces.append((path, cache_file))
+            if not cache_file.exists() and cache_file not in (item[2] for item in todo):
+                todo.append((path, content_hash, cache_file))
+
+        # 2. read + align the new/changed workbooks in parallel
+        if todo:
+            todo_paths, hashes, cache_files = zip(*todo)
+            reports = pool.map(consolidate_workbook, todo_paths, hashes, [schema] * len(todo), cache_files)
+            for path, report in zip(todo_paths, reports):
+                summary["read"] += 1
+                if report["dropped"]:
+                    summary["dropped"][Path(path).name] = report["dropped"]
+                if report["bad_values"]:
+                    summary["bad_values"][Path(path).name] = report["bad_values"]
+
+    summary["cached"] = summary["files"] - summary["read"]  # includes identical copies read once this run
+
+    # 3. one columnar output, written piece by piece in input order; an Int64
+    #    column is float64 in the output as soon as one piece has fractions
+    fractional = {field.name for _, piece in pieces for field in pq.read_schema(piece)
+                  if field.name in schema and schema[field.name][0] == "Int64" and pa.types.is_floating(field.type)}
+    output_schema = arrow_schema(schema, fractional=fractional)
+    output = Path(output)
+    temp = output.with_name(f".{output.name}.tmp")
+    with pq.ParquetWriter(temp, output_schema, compression="zstd") as writer:
+        for path, piece in pieces:
+            table = pq.read_table(piece)
+            summary["rows"] += table.num_rows
+            if table.num_rows:
+                source = pa.array([Path(path).name] * table.num_rows, pa.string())
+                writer.write_table(table.append_column("SourceFile", source).cast(output_schema))
+    os.replace(temp, output)
+
+    # forget files that are gone, drop cache pieces nobody references
+    manifest = {path: entry for path, entry in manifest.items() if Path(path).exists()}
+    manifest_path.write_text(json.dumps(manifest, indent=1))
+    referenced = {f"{entry['sha256']}_{fingerprint}.parquet" for entry in manifest.values()}
+    for piece in cache_dir.glob("*.parquet"):
+        if piece.name not in referenced:
+            piece.unlink()
+    return summary
+
+
+# ============================================================================
+# DEMO - REGIONAL WORKBOOKS WITH DIFFERENT LAYOUTS
+# ============================================================================
+
+LAYOUTS = [
+    ["Date", "Region", "Product", "Units", "Revenue"],
+    ["Datum", "Land", "Artikel", "Menge", "Umsatz", "Kommentar"],             # German + extra column
+    ["Revenue", "Qty", "Order Date", "Country", "SKU"],                       # other order, other names
+    ["booking_date", "Market", "Item", "Sales"],                              # no Units column
+]
+
+
+def write_regional_workbook(path, index, rows):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    layout = LAYOUTS[index % len(LAYOUTS)]
+    start = date(2025, 1, 1)
+    lookup = column_lookup(TARGET_SCHEMA)
+    for month in range(2 if index % 3 == 0 else 1):     # some workbooks have two data sheets
+        ws = wb.create_sheet(f"Sales {month + 1}")
+        ws.append(layout)
+        for i in range(rows):
+            units = 1 + i % 9
+            if index == 1 and i == 3:
+                units = "n/a"                                # text in a number column: reported
+            elif index == 6:
+                units = units / 2                            # half units: Units becomes float64
+            values = {"date": start + timedelta(days=(i + month * 31) % 365), "region": ["DE", "FR", "IT"][index % 3],
+                      "product": f"P-{i % 40}", "units": units, "revenue": round(10 + (i * 3.7) % 490, 2)}
+            by_target = {"Date": values["date"], "Region": values["region"], "Product": values["product"],
+                         "Units": values["units"], "Revenue": values["revenue"]}
+            ws.append([by_target.get(lookup.get(normalise(name)), "note") for name in layout])
+    notes = wb.create_sheet("Notes")                     # not a data sheet: skipped
+    notes.append(["Prepared by", "Regional controlling"])
+    wb.save(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consolidate many Excel workbooks into one Parquet file")
+    parser.add_argument("--files", type=int, default=60, help="demo workbooks to generate")
+    parser.add_argument("--rows", type=int, default=2000, help="rows per sheet")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    args = parser.parse_args()
+
+    if pd is None:
+        print("pandas/pyarrow not installed")
+        print("Install with: pip install pandas pyarrow")
+        sys.exit()
+
+    with tempfile.TemporaryDirectory() as folder:
+        folder = Path(folder)
+        (folder / "regions").mkdir()
+        print(f"Writing {args.files} regional workbooks ({len(LAYOUTS)} different layouts)...")
+        paths = [folder / "regions" / f"region_{i:03d}.xlsx" for i in range(args.files)]
+        for i, path in enumerate(paths):
+            write_regional_workbook(path, i, args.rows)
+
+        output, cache = folder / "consolidated.parquet", folder / "cache"
+        runs = [("first run", None), ("unchanged", None), ("one file changed", paths[5])]
+        dropped, bad_values = {}, {}
+        for label, changed in runs:
+            if changed is not None:
+                write_regional_workbook(changed, 6, args.rows // 4)
+            start = time.perf_counter()
+            summary = consolidate(paths, output, cache, workers=args.workers)
+            seconds = time.perf_counter() - start
+            print(f"\n{label}: {seconds:.2f}s - {summary['read']} read, {summary['cached']} from cache, "
+                  f"{summary['rows']:,} rows")
+            dropped = dropped or summary["dropped"]
+            bad_values = bad_values or summary["bad_values"]
+
+        print(f"\nDropped extra columns (first files): {dict(list(dropped.items())[:2])}")
+        print(f"Values that are not numbers/dates (sheet rows, left empty): {bad_values}")
+        print(f"\nOutput schema:\n{pq.read_schema(output).to_string(show_schema_metadata=False)}\n")
+        df = pd.read_parquet(output)
+        print(df.groupby("Region", observed=True)["Revenue"].sum().round(2).to_string())
@@ -0,0 +1,832 @@
+# ============================================================================
+# 31. FORMULA ENGINE - EVALUATE EXCEL FORMULAS WITHOUT EXCEL
+# ============================================================================
+# WHAT: Parse formulas like =B2*C2 and =SUM(D2:D3), work out which cells
+#       depend on which, and compute the values in Python
+# WHY: openpyxl only stores the formula text (06_file_excel.py, sheet
+#      "Calculations"). The numbers exist only once Excel opens the file - so
+#      totals in generated workbooks cannot be checked on a server
+# WHEN: Validating generated reports, CI checks on workbook templates,
+#       "what if" recalculation after changing an input
+#
+# How:
+# - Tokenizer + recursive-descent parser → small syntax tree (tuples)
+# - Cell references are stored relative to the formula's cell (like Excel's
+#   R1C1 notation), so =B2*C2 in D2 and =B3*C3 in D3 give the SAME tree.
+#   Runs of identical trees down a column become one "block"
+# - A block is evaluated once with numpy over whole column slices
+#   (B2:B200001 * C2:C200001) instead of 200k separate evaluations
+# - Dependency graph between blocks (which block reads cells another one
+#   writes), evaluated in topological order; cycles are reported
+# - set_values() recomputes only the cells that depend on the changed ones
+#   (directly or indirectly): per block, the rows whose formula reads a
+#   changed cell (one row for =B2*C2 when C2 changes, every row for $H$1)
+#
+# - Running totals (=SUM($D$2:D2) filled down) use prefix sums: one pass over
+#   the column instead of re-adding a growing range for every row
+#
+# Supported: numbers, TRUE/FALSE, cell refs ($A$1 too), ranges, + - * / ^ %,
+# comparisons, SUM AVERAGE MIN MAX COUNT IF ROUND ABS. One sheet at a time.
+# Errors (#DIV/0!, text in arithmetic) become NaN; COUNT skips them, like
+# Excel. Formulas that cannot be evaluated - text (strings, &), other
+# functions, other sheets (Sheet2!A1), whole columns (A:A), defined names,
+# syntax errors - are listed in engine.unsupported, and so is every formula
+# that reads one of them.
+#
+# Run the demo:
+#     python 31_excel_formula_engine.py
+#     python 31_excel_formula_engine.py --rows 1000000
+
+import argparse
+import heapq
+import re
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict, deque
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# ============================================================================
+# CELL ADDRESSES
+# ============================================================================
+
+def column_number(letters):
+    """'A' → 0, 'AA' → 26."""
+    number = 0
+    for char in letters.upper():
+        number = number * 26 + ord(char) - 64
+    return number - 1
+
+
+def column_letters(number):
+    letters, number = "", number + 1
+    while number:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+CELL_RE = re.compile(r"(\$?)([A-Z]{1,3})(\$?)(\d+)$", re.IGNORECASE)
+
+
+def parse_address(address):
+    """'D2' → (3, 1): 0-based column and row."""
+    match = CELL_RE.match(address)
+    if not match:
+        raise ValueError(f"not a cell address: {address!r}")
+    return column_number(match.group(2)), int(match.group(4)) - 1
+
+
+# ============================================================================
+# TOKENIZER + PARSER
+# ============================================================================
+# Syntax tree nodes are plain tuples, so identical formulas compare equal:
+#   ("num", 1.5)  ("ref", col, row)  ("range", ref, ref)
+#   ("op", "+", left, right)  ("neg", x)  ("pct", x)  ("call", "SUM", (args...))
+# col/row inside a ref: ("abs", index) or ("rel", offset from the formula cell)
+
+TOKEN_RE = re.compile(r"""\s*(?:
+    (?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)
+  | (?P<string>"(?:[^"]|"")*")
+  | (?P<func>[A-Za-z][A-Za-z0-9.]*)\(
+  | (?P<range>\$?[A-Za-z]{1,3}\$?\d+:\$?[A-Za-z]{1,3}\$?\d+)
+  | (?P<cell>\$?[A-Za-z]{1,3}\$?\d+)
+  | (?P<bool>TRUE|FALSE)\b
+  | (?P<op><=|>=|<>|[-+*/^&=<>%(),])
+)""", re.VERBOSE | re.IGNORECASE)
+
+AGGREGATES = {"SUM", "AVERAGE", "MIN", "MAX", "COUNT"}
+ARGUMENTS = {"IF": (1, 3), "ROUND": (1, 2), "ABS": (1, 1)}  # (min, max) arguments
+FUNCTIONS = AGGREGATES | ARGUMENTS.keys()
+COMPARISONS = {"=", "<>", "<", ">", "<=", ">="}
+
+
+class UnsupportedFormula(ValueError):
+    pass
+
+
+def tokenize(text):
+    tokens, position = [], 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN_RE.match(text, position)
+        if not match or match.end() == position:
+            raise ValueError(f"cannot parse formula at {text[position:]!r}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+class Parser:
+    """Recursive descent, Excel precedence: comparison < & < +- < */ < ^ < unary - < %."""
+
+    def __init__(self, text, anchor):
+        self.tokens = tokenize(text.lstrip("="))
+        self.position = 0
+        self.anchor = anchor  # (col, row) of the formula cell
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def take(self, value=None):
+        token = self.peek()
+        if value is not None and token[1] != value:
+            raise ValueError(f"expected {value!r}, got {token[1]!r}")
+        self.position += 1
+        return token
+
+    def parse(self):
+        node = self.comparison()
+        if self.position != len(self.tokens):
+            raise ValueError(f"unexpected {self.peek()[1]!r}")
+        check_tree(node)
+        return node
+
+    def comparison(self):
+        node = self.concat()
+        while self.peek()[1] in COMPARISONS:
+            node = ("op", self.take()[1], node, self.concat())
+        return node
+
+    def concat(self):
+        node = self.additive()
+        if self.peek()[1] == "&":
+            raise UnsupportedFormula("text concatenation (&)")
+        return node
+
+    def additive(self):
+        node = self.multiplicative()
+        while self.peek()[1] in ("+", "-"):
+            node = ("op", self.take()[1], node, self.multiplicative())
+        return node
+
+    def multiplicative(self):
+        node = self.power()
+        while self.peek()[1] in ("*", "/"):
+            node = ("op", self.take()[1], node, self.power())
+        return node
+
+    def power(self):
+        node = self.unary()
+        while self.peek()[1] == "^":
+            self.take()
+            node = ("op", "^", node, self.unary())
+        return node
+
+    def unary(self):
+        if self.peek()[1] == "-":
+            self.take()
+            return ("neg", self.unary())
+        if self.peek()[1] == "+":
+            self.take()
+            return self.unary()
+        node = self.primary()
+        while self.peek()[1] == "%":
+            self.take()
+            node = ("pct", node)
+        return node
+
+    def primary(self):
+        kind, value = self.take()
+        if kind is None:
+            raise ValueError("formula ends too early")
+        if kind == "number":
+            return ("num", float(value))
+        if kind == "bool":
+            return ("num", 1.0 if value.upper() == "TRUE" else 0.0)
+        if kind == "string":
+            raise UnsupportedFormula("text values")
+        if kind == "cell":
+            return self.reference(value)
+        if kind == "range":
+            first, last = value.split(":")
+            return ("range", self.reference(first), self.reference(last))
+        if kind == "func":
+            name = value.upper()
+            if name not in FUNCTIONS:
+                raise UnsupportedFormula(f"function {name}")
+            args = []
+            if self.peek()[1] != ")":
+                args.append(self.comparison())
+                while self.peek()[1] == ",":
+                    self.take()
+                    args.append(self.comparison())
+            self.take(")")
+            return ("call", name, tuple(args))
+        if value == "(":
+            node = self.comparison()
+            self.take(")")
+            return node
+        raise ValueError(f"unexpected {value!r}")
+
+    def reference(self, text):
+        match = CELL_RE.match(text)
+        col, row = column_number(match.group(2)), int(match.group(4)) - 1
+        col_spec = ("abs", col) if match.group(1) else ("rel", col - self.anchor[0])
+        row_spec = ("abs", row) if match.group(3) else ("rel", row - self.anchor[1])
+        return ("ref", col_spec, row_spec)
+
+
+def check_tree(node, range_allowed=False):
+    """Reject what parses but cannot be evaluated: ranges outside SUM/AVERAGE/
+    MIN/MAX/COUNT (=A1:A3, =ABS(A1:A3)) and wrong argument counts."""
+    kind = node[0]
+    if kind == "range" and not range_allowed:
+        raise UnsupportedFormula("a range outside SUM/AVERAGE/MIN/MAX/COUNT")
+    if kind == "op":
+        check_tree(node[2])
+        check_tree(node[3])
+    elif kind in ("neg", "pct"):
+        check_tree(node[1])
+    elif kind == "call":
+        low, high = ARGUMENTS.get(node[1], (0, len(node[2])))
+        if not low <= len(node[2]) <= high:
+            raise ValueError(f"{node[1]} takes {low} to {high} arguments")
+        for arg in node[2]:
+            check_tree(arg, range_allowed=node[1] in AGGREGATES)
+
+
+REFERENCE_RE = re.compile(r"(?<![A-Za-z0-9.$])(\$?)([A-Za-z]{1,3})(\$?)(\d+)(?![A-Za-z0-9(])")
+
+
+def relative_key(text, anchor):
+    """Formula text with relative refs as offsets: =B2*C2 in D2 → '=RC[-2]*RC[-1]'.
+
+    Equal keys mean equal syntax trees, so a filled-down column is parsed once.
+    """
+    def replace(match):
+        col = match.group(2) if match.group(1) else f"C[{column_number(match.group(2)) - anchor[0]}]"
+        row = match.group(4) if match.group(3) else f"R[{int(match.group(4)) - 1 - anchor[1]}]"
+        return f"{match.group(1)}{col}{match.group(3)}{row}"
+    return REFERENCE_RE.sub(replace, text)
+
+
+def resolve(spec, base):
+    kind, number = spec
+    return number if kind == "abs" else base + number
+
+
+# ============================================================================
+# THE ENGINE
+# ============================================================================
+
+class Block:
+    """Consecutive cells in one column with the same (relative) formula."""
+
+    def __init__(self, col, start, tree, text):
+        self.col, self.start, self.end = col, start, start
+        self.tree, self.text = tree, text
+        self.reads = []          # (col, first_row, last_row) ranges this block reads
+        self.dependents = set()  # blocks that read cells this block writes
+        self.order = 0           # position in the topological order
+
+    @property
+    def rows(self):
+        return self.end - self.start + 1
+
+    def __repr__(self):
+        span = f"{column_letters(self.col)}{self.start + 1}"
+        if self.end > self.start:
+            span += f":{column_letters(self.col)}{self.end + 1}"
+        return f"<Block {span} {self.text}>"
+
+
+class FormulaEngine:
+    """One sheet: inputs, formulas, computed values.
+
+    engine = FormulaEngine({"B2": 1.5, "C2": 10, "D2": "=B2*C2"})
+    engine.calculate(); engine.value("D2") → 15.0
+    """
+
+    BUCKET = 1024  # rows per bucket in the "who reads this cell" index
+
+    def __init__(self, cells=None, vectorize=True):
+        if np is None:
+            raise ImportError("numpy not installed - Install with: pip install numpy")
+        self.vectorize = vectorize
+        self.values = {}   # col → float64 array (0 where empty)
+        self.kinds = {}    # col → int8 array: 0 empty, 1 number, 2 text
+        self.texts = {}    # (col, row) → text
+        self.formulas = {}
+        self.unsupported = {}
+        self.blocks = []
+        self.cells_computed = 0
+        for address, value in (cells or {}).items():
+            self.set_cell(address, value)
+
+    # --- storage -----------------------------------------------------------
+
+    def _ensure(self, col, rows):
+        values = self.values.get(col)
+        if values is None or len(values) < rows:
+            size = max(rows, 2 * len(values) if values is not None else 16)
+            new_values, new_kinds = np.zeros(size), np.zeros(size, dtype=np.int8)
+            if values is not None:
+                new_values[:len(values)] = values
+                new_kinds[:len(values)] = self.kinds[col]
+            self.values[col], self.kinds[col] = new_values, new_kinds
+        return self.values[col], self.kinds[col]
+
+    def _store(self, col, row, value):
+        values, kinds = self._ensure(col, row + 1)
+        self.texts.pop((col, row), None)
+        if value is None:
+            values[row], kinds[row] = 0.0, 0
+        elif isinstance(value, (bool, int, float)):
+            values[row], kinds[row] = float(value), 1
+        else:
+            values[row], kinds[row] = np.nan, 2
+            self.texts[(col, row)] = str(value)
+
+    def set_cell(self, address, value):
+        """Input value or formula (text starting with '='); call calculate() after."""
+        col, row = parse_address(address)
+        self.formulas.pop((col, row), None)
+        if isinstance(value, str) and value.startswith("="):
+            self.formulas[(col, row)] = value
+            self._store(col, row, None)
+        else:
+            self._store(col, row, value)
+        self.blocks = []  # formulas changed: graph is rebuilt on calculate()
+
+    def value(self, address):
+        col, row = parse_address(address)
+        if (col, row) in self.texts:
+            return self.texts[(col, row)]
+        if (col, row) in self.unsupported:
+            return None
+        values, kinds = self._ensure(col, row + 1)
+        return float(values[row]) if kinds[row] else None
+
+    # --- compile: formulas → blocks → dependency graph --------------------------
+
+    def _compile(self):
+        self.unsupported = {}
+        trees, parsed = {}, {}  # parsed: relative_key → tree (or the ValueError)
+        for (col, row), text in self.formulas.items():
+            key = relative_key(text, (col, row))
+            if key not in parsed:
+                try:
+                    parsed[key] = Parser(text, (col, row)).parse()
+                except ValueError as error:  # UnsupportedFormula or a syntax error
+                    parsed[key] = error
+            if isinstance(parsed[key], ValueError):
+                self.unsupported[(col, row)] = f"{text}: {parsed[key]}"
+            else:
+                trees[(col, row)] = parsed[key]
+
+        # Formulas reading an unsupported cell would compute with 0 instead of
+        # its value: they are unsupported too (and what reads them, and so on)
+        blocks = self._build(trees)
+        reads_unsupported = self._reading_unsupported(blocks)
+        if reads_unsupported:
+            for (col, row), (source_col, source_row) in reads_unsupported.items():
+                del trees[(col, row)]
+                self.unsupported[(col, row)] = (f"{self.formulas[(col, row)]}: reads unsupported "
+                                                f"{column_letters(source_col)}{source_row + 1}")
+            blocks = self._build(trees)
+        self.blocks = blocks
+
+    def _build(self, trees):
+        """Blocks for the parsed formulas, with the dependency graph, in evaluation order."""
+        blocks = []
+        for col, row in sorted(trees, key=lambda cell: (cell[0], cell[1])):
+            tree = trees[(col, row)]
+            last = blocks[-1] if blocks else None
+            if (self.vectorize and last and last.col == col and last.end == row - 1 and last.tree == tree):
+                last.end = row  # same relative formula directly below: extend the block
+            else:
+                blocks.append(Block(col, row, tree, self.formulas[(col, row)]))
+
+        # A block that reads its own cells (=A1+1 filled down) needs the row
+        # above first: split it into single cells and let the graph order them
+        checked = []
+        for block in blocks:
+            block.reads = list(self._read_ranges(block.tree, block))
+            if block.rows > 1 and any(col == block.col and first <= block.end and last >= block.start
+                                      for col, first, last in block.reads):
+                for row in range(block.start, block.end + 1):
+                    cell = Block(block.col, row, block.tree, self.formulas[(block.col, row)])
+                    cell.reads = list(self._read_ranges(cell.tree, cell))
+                    checked.append(cell)
+            else:
+                checked.append(block)
+        blocks = checked
+
+        writers = defaultdict(list)    # col → [(start, end, block)] sorted by start
+        readers = defaultdict(set)     # (col, bucket) → blocks reading rows in it
+        for block in blocks:
+            writers[block.col].append((block.start, block.end, block))
+            self._ensure(block.col, block.end + 1)
+            for col, first, last in block.reads:
+                self._ensure(col, last + 1)
+                for bucket in range(first // self.BUCKET, last // self.BUCKET + 1):
+                    readers[(col, bucket)].add(block)
+        starts = {col: [start for start, _, _ in spans] for col, spans in writers.items()}
+
+        for block in blocks:
+            for col, first, last in block.reads:
+                spans = writers.get(col, [])
+                index = bisect_right(starts.get(col, []), last) - 1
+                while index >= 0 and spans[index][1] >= first:
+                    spans[index][2].dependents.add(block)
+                    index -= 1
+        self.readers = readers
+        return self._topological(blocks)
+
+    def _reading_unsupported(self, blocks):
+        """{formula cell: unsupported cell it reads}, directly or through other
+        formulas. blocks are in evaluation order, so one pass finds them all."""
+        bad = defaultdict(list)  # col → sorted rows of unsupported cells
+        for col, row in sorted(self.unsupported):
+            bad[col].append(row)
+        found = {}
+        for block in blocks if bad else ():
+            rows = self._unsupported_reads(block.tree, block, bad)
+            for row in sorted(rows):
+                found[(block.col, row)] = rows[row]
+            if len(rows) == 1:
+                insort(bad[block.col], next(iter(rows)))
+            elif rows:
+                bad[block.col] = sorted(bad[block.col] + list(rows))
+        return found
+
+    def _unsupported_reads(self, node, block, bad):
+        """{row of block: unsupported cell} for the rows whose refs/ranges in
+        node cover a cell listed in bad."""
+        kind = node[0]
+        if kind in ("op", "neg", "pct", "call"):
+            children = node[2:4] if kind == "op" else node[2] if kind == "call" else node[1:]
+            found = {}
+            for child in children:
+                for row, source in self._unsupported_reads(child, block, bad).items():
+                    found.setdefault(row, source)
+            return found
+        if kind not in ("ref", "range"):
+            return {}
+        refs = (node, node) if kind == "ref" else node[1:]
+        rows = np.arange(block.start, block.end + 1)
+        ends = [np.full(len(rows), spec[1]) if spec[0] == "abs" else rows + spec[1] for spec in (ref[2] for ref in refs)]
+        low, high = np.minimum(*ends), np.maximum(*ends)  # window of every row, both never decrease
+        cols = sorted(resolve(ref[1], block.col) for ref in refs)
+        found = {}
+        for col in range(cols[0], cols[1] + 1):
+            bad_rows = bad.get(col, [])
+            bad_rows = np.array(bad_rows[bisect_left(bad_rows, low[0]):bisect_right(bad_rows, high[-1])], dtype=int)
+            if not len(bad_rows):
+                continue
+            # rows first[i]..stop[i]-1 have bad_rows[i] in their window
+            first, stop = np.searchsorted(high, bad_rows, "left"), np.searchsorted(low, bad_rows, "right")
+            latest = np.searchsorted(first, np.arange(len(rows)), "right") - 1
+            hit = (latest >= 0) & (stop[np.maximum(latest, 0)] > np.arange(len(rows)))
+            for index in np.flatnonzero(hit):
+                found.setdefault(int(rows[index]), (col, int(bad_rows[latest[index]])))
+        return found
+
+    def _read_ranges(self, node, block):
+        """Cell ranges a block reads, over all its rows."""
+        kind = node[0]
+        if kind == "ref":
+            col = resolve(node[1], block.col)
+            yield col, resolve(node[2], block.start), resolve(node[2], block.end)
+        elif kind == "range":
+            (_, c1, r1), (_, c2, r2) = node[1], node[2]
+            cols = sorted((resolve(c1, block.col), resolve(c2, block.col)))
+            rows = [resolve(r, base) for r in (r1, r2) for base in (block.start, block.end)]
+            for col in range(cols[0], cols[1] + 1):
+                yield col, min(rows), max(rows)
+        elif kind in ("op",):
+            yield from self._read_ranges(node[2], block)
+            yield from self._read_ranges(node[3], block)
+        elif kind in ("neg", "pct"):
+            yield from self._read_ranges(node[1], block)
+        elif kind == "call":
+            for arg in node[2]:
+                yield from self._read_ranges(arg, block)
+
+    @staticmethod
+    def _topological(blocks):
+        incoming = {block: 0 for block in blocks}
+        for block in blocks:
+            for dependent in block.dependents:
+                if dependent is not block:
+                    incoming[dependent] += 1
+        ready = deque(block for block in blocks if incoming[block] == 0)
+        ordered = []
+        while ready:
+            block = ready.popleft()
+            block.order = len(ordered)
+            ordered.append(block)
+            for dependent in block.dependents:
+                if dependent is not block:
+                    incoming[dependent] -= 1
+                    if incoming[dependent] == 0:
+                        ready.append(dependent)
+        cyclic = [block for block in blocks if incoming[block] > 0]
+        cyclic += [block for block in blocks if block in block.dependents]
+        if cyclic:
+            raise ValueError(f"circular reference: {cyclic[:5]}")
+        return ordered
+
+    # --- evaluation --------------------------------------------------------------
+
+    def calculate(self):
+        """(Re)compute every formula; returns the number of cells computed."""
+        if not self.blocks:
+            self._compile()
+        self.cells_computed = 0
+        for block in self.blocks:
+            self._evaluate_block(block)
+        return self.cells_computed
+
+    def set_values(self, changes):
+        """Change input cells and recompute only the cells that depend on them."""
+        if not self.blocks:
+            for address, value in changes.items():
+                self.set_cell(address, value)
+            return self.calculate()
+        dirty = {}   # block → (first, last) rows to recompute
+        ready = []   # heap of (topological order, block): upstream blocks first
+        for address, value in changes.items():
+            col, row = parse_address(address)
+            if (col, row) in self.formulas:
+                raise ValueError(f"{address} holds a formula; use set_cell() + calculate()")
+            self._store(col, row, value)
+            for block in self.readers.get((col, row // self.BUCKET), ()):
+                self._mark_dirty(dirty, ready, block, col, row, row)
+        self.cells_computed = 0
+        while ready:  # a block's dependents come later in the order, so its rows are complete when popped
+            _, block = heapq.heappop(ready)
+            first, last = dirty.pop(block)
+            self._evaluate_block(block, first, last)
+            for dependent in block.dependents:
+                self._mark_dirty(dirty, ready, dependent, block.col, first, last)
+        return self.cells_computed
+
+    def _mark_dirty(self, dirty, ready, block, col, first, last):
+        """Add the rows of block that read rows first..last of col to its dirty span."""
+        rows = np.arange(block.start, block.end + 1)
+        reading = np.flatnonzero(np.broadcast_to(self._rows_reading(block.tree, block.col, rows, col, first, last),
+                                                 rows.shape))
+        if not len(reading):
+            return
+        span = (block.start + int(reading[0]), block.start + int(reading[-1]))
+        if block in dirty:
+            span = (min(span[0], dirty[block][0]), max(span[1], dirty[block][1]))
+        else:
+            heapq.heappush(ready, (block.order, block))
+        dirty[block] = span
+
+    def _rows_reading(self, node, formula_col, rows, col, first, last):
+        """Mask of rows (cells of formula_col with formula node) that read a cell
+        in rows first..last of column col."""
+        kind = node[0]
+        if kind == "ref":
+            cells = resolve(node[2], rows)
+            return resolve(node[1], formula_col) == col and (cells >= first) & (cells <= last)
+        if kind == "range":
+            (_, c1, r1), (_, c2, r2) = node[1], node[2]
+            cols = sorted((resolve(c1, formula_col), resolve(c2, formula_col)))
+            ends = resolve(r1, rows), resolve(r2, rows)
+            return cols[0] <= col <= cols[1] and (np.minimum(*ends) <= last) & (np.maximum(*ends) >= first)
+        if kind == "op":
+            children = node[2:4]
+        elif kind in ("neg", "pct"):
+            children = node[1:2]
+        elif kind == "call":
+            children = node[2]
+        else:
+            children = ()
+        mask = False
+        for child in children:
+            mask = mask | self._rows_reading(child, formula_col, rows, col, first, last)
+        return mask
+
+    def _evaluate_block(self, block, first=None, last=None):
+        """Compute rows first..last of block (default: all of them)."""
+        first = block.start if first is None else first
+        last = block.end if last is None else last
+        values, kinds = self.values[block.col], self.kinds[block.col]
+        with np.errstate(all="ignore"):
+            result = self._eval(block.tree, block.col, np.arange(first, last + 1))
+            result = np.broadcast_to(np.asarray(result, dtype=float), (last - first + 1,))
+        result = np.where(np.isinf(result), np.nan, result)  # x/0 → error
+        values[first:last + 1] = result
+        kinds[first:last + 1] = 1
+        self.cells_computed += last - first + 1
+
+    def _eval(self, node, col, rows):
+        """Value of node for the cells at rows (array) of column col."""
+        kind = node[0]
+        if kind == "num":
+            return node[1]
+        if kind == "ref":
+            ref_col = resolve(node[1], col)
+            values, kinds = self._ensure(ref_col, 1)
+            if node[2][0] == "abs":
+                return values[node[2][1]]
+            return values[rows + node[2][1]]
+        if kind == "op":
+            left, right = self._eval(node[2], col, rows), self._eval(node[3], col, rows)
+            op = node[1]
+            if op == "+": return np.add(left, right)          # noqa: E701
+            if op == "-": return np.subtract(left, right)     # noqa: E701
+            if op == "*": return np.multiply(left, right)     # noqa: E701
+            if op == "/": return np.divide(left, right)       # noqa: E701
+            if op == "^": return np.power(left, right)        # noqa: E701
+            comparisons = {"=": np.equal, "<>": np.not_equal, "<": np.less, ">": np.greater,
+                           "<=": np.less_equal, ">=": np.greater_equal}
+            return comparisons[op](left, right).astype(float)
+        if kind == "neg":
+            return np.negative(self._eval(node[1], col, rows))
+        if kind == "pct":
+            return np.divide(self._eval(node[1], col, rows), 100)
+        if kind == "call":
+            return self._call(node[1], node[2], col, rows)
+        raise UnsupportedFormula("a range outside a function")
+
+    def _range_numbers(self, node, col, row):
+        """Numeric cells of a range (text and empty cells skipped, like Excel)."""
+        (_, c1, r1), (_, c2, r2) = node[1], node[2]
+        cols = sorted((resolve(c1, col), resolve(c2, col)))
+        first, last = sorted((resolve(r1, row), resolve(r2, row)))
+        parts = []
+        for c in range(cols[0], cols[1] + 1):
+            values, kinds = self._ensure(c, last + 1)
+            parts.append(values[first:last + 1][kinds[first:last + 1] == 1])
+        return np.concatenate(parts)
+
+    def _moving_range(self, node, col, rows, extremes):
+        """(sum, count, min, max) per row for a range whose rows move with the
+        formula cell, e.g. =SUM($D$2:D2) filled down.
+
+        Sums and counts come from prefix sums over the column: every row's
+        window in one vectorised step, instead of adding up a growing range
+        again for each row (O(n) instead of O(n²)). min/max (only computed when
+        extremes is True) use a running minimum/maximum when one end of the
+        window is fixed, and a loop over the rows otherwise.
+        """
+        (_, c1, r1), (_, c2, r2) = node[1], node[2]
+        cols = sorted((resolve(c1, col), resolve(c2, col)))
+        ends = [np.full(len(rows), spec[1]) if spec[0] == "abs" else rows + spec[1] for spec in (r1, r2)]
+        first, last = np.minimum(*ends), np.maximum(*ends)
+        total, count = np.zeros(len(rows)), np.zeros(len(rows), dtype=np.int64)
+        low, high = np.full(len(rows), np.inf), np.full(len(rows), -np.inf)
+        for c in range(cols[0], cols[1] + 1):
+            values, kinds = self._ensure(c, int(last.max()) + 1)
+            numeric = kinds == 1
+            errors = numeric & np.isnan(values)
+            sums = np.concatenate(([0.0], np.cumsum(np.where(numeric & ~errors, values, 0.0))))
+            counts = np.concatenate(([0], np.cumsum(numeric & ~errors)))
+            error_counts = np.concatenate(([0], np.cumsum(errors)))
+            total += sums[last + 1] - sums[first]
+            total[error_counts[last + 1] > error_counts[first]] = np.nan  # an error in the window
+            count += counts[last + 1] - counts[first]
+            if not extremes:
+                continue
+            for accumulate, fill, result in ((np.minimum.accumulate, np.inf, low), (np.maximum.accumulate, -np.inf, high)):
+                cells = np.where(numeric, values, fill)
+                if (first == first[0]).all():      # growing window: running min/max from the fixed start
+                    running = accumulate(cells[first[0]:])
+                    window = running[last - first[0]]
+                elif (last == last[0]).all():      # shrinking window: the same from the fixed end
+                    running = accumulate(cells[:last[0] + 1][::-1])
+                    window = running[last[0] - first]
+                else:                              # sliding window
+                    window = np.array([accumulate(cells[a:b + 1])[-1] for a, b in zip(first, last)])
+                np.copyto(result, np.minimum(result, window) if fill > 0 else np.maximum(result, window))
+        return total, count, low, high
+
+    def _call(self, name, args, col, rows):
+        if name == "IF":
+            condition = self._eval(args[0], col, rows)
+            yes = self._eval(args[1], col, rows) if len(args) > 1 else 1.0
+            no = self._eval(args[2], col, rows) if len(args) > 2 else 0.0
+            return np.where(np.not_equal(condition, 0), yes, no)
+        if name == "ABS":
+            return np.abs(self._eval(args[0], col, rows))
+        if name == "ROUND":
+            digits = self._eval(args[1], col, rows) if len(args) > 1 else 0
+            scale = np.power(10.0, digits)
+            x = self._eval(args[0], col, rows)
+            return np.sign(x) * np.floor(np.abs(x) * scale + 0.5) / scale  # half away from zero, like Excel
+
+        # aggregates: fixed ranges give one number each, moving ranges and
+        # other arguments one number per row
+        total, count, low, high = 0.0, 0, np.inf, -np.inf
+        for arg in args:
+            if arg[0] == "range" and len(rows) > 1 and any(ref[2][0] == "rel" for ref in arg[1:]):
+                sums, counts, lows, highs = self._moving_range(arg, col, rows, name in ("MIN", "MAX"))
+                total, count = total + sums, count + counts
+                low, high = np.minimum(low, lows), np.maximum(high, highs)
+            elif arg[0] == "range":
+                numbers = self._range_numbers(arg, col, int(rows[0]))
+                total, count = total + numbers.sum(), count + np.count_nonzero(~np.isnan(numbers))
+                if len(numbers):
+                    low, high = np.minimum(low, numbers.min()), np.maximum(high, numbers.max())
+            else:
+                value = self._eval(arg, col, rows)
+                total, count = total + value, count + np.logical_not(np.isnan(value))
+                low, high = np.minimum(low, value), np.maximum(high, value)
+        if name == "SUM":
+            return total
+        if name == "COUNT":
+            return np.asarray(count, dtype=float)
+        if name == "AVERAGE":
+            return np.where(np.equal(count, 0), np.nan, np.divide(total, np.maximum(count, 1)))
+        return np.where(np.equal(count, 0), 0.0, low if name == "MIN" else high)
+
+
+def from_worksheet(ws, vectorize=True):
+    """FormulaEngine with the values and formulas of an openpyxl worksheet."""
+    engine = FormulaEngine(vectorize=vectorize)
+    for row in ws.iter_rows():
+        for cell in row:
+            if cell.value is not None:
+                engine.set_cell(cell.coordinate, cell.value)
+    return engine
+
+
+# ============================================================================
+# DEMO
+# ============================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate Excel formulas with numpy")
+    parser.add_argument("--rows", type=int, default=200_000, help="rows in the generated order sheet")
+    args = parser.parse_args()
+
+    if np is None:
+        print("numpy not installed")
+        print("Install with: pip install numpy")
+        raise SystemExit
+
+    # 1. The "Calculations" sheet from 06_file_excel.py
+    print("1. Calculations sheet from 06_file_excel.py:")
+    try:
+        from openpyxl import Workbook
+        wb = Workbook()
+        ws = wb.active
+        ws.append(["Item", "Price", "Quantity", "Total"])
+        ws.append(["Apple", 1.5, 10, "=B2*C2"])
+        ws.append(["Banana", 0.8, 15, "=B3*C3"])
+        ws.append(["Total", "", "", "=SUM(D2:D3)"])
+        engine = from_worksheet(ws)
+    except ImportError:
+        engine = FormulaEngine({"A2": "Apple", "B2": 1.5, "C2": 10, "D2": "=B2*C2",
+                                "A3": "Banana", "B3": 0.8, "C3": 15, "D3": "=B3*C3", "D4": "=SUM(D2:D3)"})
+    engine.calculate()
+    print(f"   D2 = {engine.value('D2')}, D3 = {engine.value('D3')}, D4 = {engine.value('D4')}")
+    print(f"   Blocks: {engine.blocks}")
+
+    # 2. A big generated order sheet: line totals, VAT, running total, grand total
+    n = args.rows
+    last = n + 1
+    rng = np.random.default_rng(42)
+    prices, quantities = rng.uniform(1, 100, n).round(2), rng.integers(1, 20, n)
+    cells = {}
+    for i in range(n):
+        r = i + 2
+        cells[f"B{r}"], cells[f"C{r}"] = float(prices[i]), int(quantities[i])
+        cells[f"D{r}"] = f"=B{r}*C{r}"
+        cells[f"E{r}"] = f"=ROUND(D{r}*(1+$H$1),2)"
+        cells[f"F{r}"] = f"=IF(E{r}>1000,1,0)"
+    cells["H1"] = 0.19
+    cells["H2"] = f"=SUM(E2:E{last})"
+    cells["H3"] = f"=COUNT(D2:D{last})"
+    cells["H4"] = f"=SUM(F2:F{last})"
+    cells["H5"] = "=H2/H3"
+
+    print(f"\n2. Order sheet with {n:,} rows ({3 * n + 4:,} formulas):")
+    print(f"   {'engine':<18} {'parse + calculate':>18} {'recalculate all':>16} {'blocks':>9}")
+    timings = {}
+    for label, vectorize in (("cell by cell", False), ("vectorized blocks", True)):
+        engine = FormulaEngine(cells, vectorize=vectorize)
+        start = time.perf_counter()
+        engine.calculate()  # first call: parse formulas + build the graph + evaluate
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        engine.calculate()
+        timings[label] = time.perf_counter() - start
+        print(f"   {label:<18} {first:17.2f}s {timings[label]:15.3f}s {len(engine.blocks):>9,}")
+    print(f"   recalculation speedup: {timings['cell by cell'] / timings['vectorized blocks']:.0f}x")
+
+    expected = (np.floor(prices * quantities * 1.19 * 100 + 0.5) / 100).sum()
+    print(f"   H2 (gross total) = {engine.value('H2'):,.2f}  numpy check: {expected:,.2f}")
+    print(f"   H4 (orders > 1000) = {engine.value('H4'):,.0f}, H5 (average) = {engine.value('H5'):,.2f}")
+
+    # 3. Change inputs: only the cells that depend on them are recomputed
+    start = time.perf_counter()
+    computed = engine.set_values({"H1": 0.07})
+    print(f"\n3. VAT 19% → 7%: {computed:,} cells recomputed in {time.perf_counter() - start:.3f}s, "
+          f"H2 = {engine.value('H2'):,.2f}")
+    start = time.perf_counter()
+    computed = engine.set_values({"C2": 1000})
+    print(f"   C2 changed:  {computed:,} cells recomputed in {time.perf_counter() - start:.3f}s, "
+          f"D2 = {engine.value('D2'):,.2f}")
+    engine.set_values({"I1": 5})
+    print(f"   I1 changed (nothing reads it): {engine.cells_computed} cells recomputed")
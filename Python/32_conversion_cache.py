@@ -0,0 +1,284 @@
+# ============================================================================
+# 32. CONVERSION CACHE - PARSE A WORKBOOK ONCE, LOAD IT IN MILLISECONDS
+# ============================================================================
+# WHAT: Cache the DataFrame parsed from an Excel sheet or CSV file, keyed by
+#       the file's content hash + sheet + read options
+# WHY: Jobs built on the CSV ↔ Excel bridge (05_file_csv.py, 06_file_excel.py)
+#      parse the same unchanged source workbooks again on every run - a
+#      200 MB workbook takes minutes to parse, every time
+# WHEN: Scheduled jobs, notebooks and dashboards that re-read the same inputs
+#
+# How:
+# - Key = SHA-256 of the file content + sheet name + reader options. A copy
+#   of the file under another name hits the same entry; any edit misses
+# - Hashing 200 MB still takes a moment, so the hash is remembered per path
+#   together with size + mtime (like the manifest in 30_excel_consolidate.py):
+#   an untouched file is not read at all
+# - Entries are Arrow IPC files (Feather v2, uncompressed) and are read back
+#   memory-mapped: no parsing, no type inference, columns map straight into
+#   memory
+# - LRU eviction: a hit touches the entry's mtime; when the cache grows past
+#   max_bytes / max_entries the least recently used entries are deleted
+# - Entries and the index are written to a temp file and renamed into place,
+#   so a crashed job never leaves a half-written entry behind
+#
+# Needs: pip install pandas pyarrow (openpyxl only for the demo workbook)
+#
+# Run the demo:
+#     python 32_conversion_cache.py
+#     python 32_conversion_cache.py --rows 1000000
+
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+try:
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pd = None
+
+# Module names starting with a digit cannot be imported with "import ..."
+streaming = importlib.import_module("28_excel_streaming_read")
+
+CACHE_VERSION = 1   # bump when a converter changes: old entries are never hit again
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+# ============================================================================
+# CONVERTERS - FILE → DATAFRAME
+# ============================================================================
+
+def excel_to_dataframe(path, sheet=None, dtypes=None):
+    """Whole sheet via the streaming reader from 28_excel_streaming_read.py."""
+    frames = list(streaming.iter_dataframes(path, sheet, dtypes=dtypes))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def csv_to_dataframe(path, sheet=None, **options):
+    try:
+        return pd.read_csv(path, engine="pyarrow", **options)
+    except (ImportError, ValueError):  # options the pyarrow engine does not support
+        return pd.read_csv(path, **options)
+
+
+def to_arrow(df):
+    """Arrow table; object columns with mixed types (e.g. numbers + notes) become text."""
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        df = df.copy()
+        for column in df.columns:
+            try:
+                pa.array(df[column])
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                df[column] = df[column].map(lambda value: value if value is None else str(value))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def replace_atomically(path, write):
+    """write(temp_path), then rename over path."""
+    handle, temp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    os.close(handle)
+    try:
+        write(temp_name)
+        os.replace(temp_name, path)
+    except BaseException:
+        Path(temp_name).unlink(missing_ok=True)
+        raise
+
+
+# ============================================================================
+# THE CACHE
+# ============================================================================
+
+class ConversionCache:
+    """cache = ConversionCache("~/.cache/excel")
+       df = cache.read_excel("sales.xlsx", sheet="2025")   # parsed once
+       df = cache.read_excel("sales.xlsx", sheet="2025")   # memory-mapped Arrow file
+    """
+
+    def __init__(self, folder, max_bytes=DEFAULT_MAX_BYTES, max_entries=None):
+        if pd is None:
+            raise ImportError("pandas/pyarrow not installed - Install with: pip install pandas pyarrow")
+        self.folder = Path(folder).expanduser()
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.index_path = self.folder / "files.json"   # path → size, mtime_ns, sha256
+        self.files = json.loads(self.index_path.read_text()) if self.index_path.exists() else {}
+        self.stats = {"hits": 0, "misses": 0, "hashed": 0, "evicted": 0}
+
+    # --- public API ------------------------------------------------------------
+
+    def read_excel(self, path, sheet=None, dtypes=None, as_table=False):
+        options = {"dtypes": dtypes} if dtypes else {}
+        return self.load(path, excel_to_dataframe, sheet, as_table, **options)
+
+    def read_csv(self, path, as_table=False, **options):
+        return self.load(path, csv_to_dataframe, None, as_table, **options)
+
+    def load(self, path, converter, sheet=None, as_table=False, **options):
+        """DataFrame (or Arrow table) for path/sheet, converted only on a miss."""
+        entry = self.entry_path(self.content_hash(path), converter, sheet, options)
+        try:
+            table = feather.read_table(entry, memory_map=True)
+            self.stats["hits"] += 1
+            try:
+                os.utime(entry)  # mtime = last use, for LRU eviction
+            except OSError:      # read-only cache (e.g. a shared folder): still a hit
+                pass
+        except FileNotFoundError:
+            self.stats["misses"] += 1
+            table = to_arrow(converter(path, sheet, **options))
+            replace_atomically(entry, lambda temp: feather.write_feather(table, temp, compression="uncompressed"))
+            self.evict(keep=entry)
+        return table if as_table else table.to_pandas()
+
+    def entry_path(self, content_hash, converter, sheet, options):
+        key = json.dumps([CACHE_VERSION, content_hash, converter.__name__, sheet or "", options],
+                         sort_keys=True, default=str)
+        return self.folder / f"{hashlib.sha256(key.encode()).hexdigest()[:32]}.arrow"
+
+    def content_hash(self, path):
+        """SHA-256 of the file, re-hashed only when its size or mtime changed."""
+        path = str(Path(path).resolve())
+        stat = os.stat(path)
+        known = self.files.get(path)
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return known["sha256"]
+        content_hash = file_sha256(path)
+        self.stats["hashed"] += 1
+        self.files[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": content_hash}
+        self.files = {name: known for name, known in self.files.items() if os.path.exists(name)}
+        replace_atomically(self.index_path, lambda temp: Path(temp).write_text(json.dumps(self.files, indent=1)))
+        return content_hash
+
+    # --- eviction --------------------------------------------------------------
+
+    def entries(self):
+        """[(last use, size, path)], least recently used first."""
+        found = []
+        for entry in self.folder.glob("*.arrow"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:  # evicted by another process meanwhile
+                continue
+            found.append((stat.st_mtime_ns, stat.st_size, entry))
+        return sorted(found)
+
+    def evict(self, keep=None):
+        """Delete least recently used entries until the limits hold again."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        for _, size, entry in entries:
+            if total <= self.max_bytes and (self.max_entries is None or count <= self.max_entries):
+                break
+            if entry == keep:
+                continue
+            entry.unlink(missing_ok=True)
+            total, count = total - size, count - 1
+            self.stats["evicted"] += 1
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def clear(self):
+        for _, _, entry in self.entries():
+            entry.unlink(missing_ok=True)
+
+
+# ============================================================================
+# DEMO
+# ============================================================================
+
+def write_sales_workbook(path, rows, seed=0):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    start = date(2025, 1, 1)
+    for sheet, factor in (("Sales", 1), ("Returns", 0.1)):
+        ws = wb.create_sheet(sheet)
+        ws.append(["Date", "Region", "Product", "Units", "Revenue", "Note"])
+        for i in range(int(rows * factor)):
+            units = 1 + (i + seed) % 9
+            ws.append([start + timedelta(days=i % 365), ["DE", "FR", "IT", "ES"][i % 4], f"P-{i % 250}", units,
+                       round(units * 19.99, 2), "check" if i % 1000 == 0 else None])
+    wb.save(path)
+
+
+def timed(label, load):
+    start = time.perf_counter()
+    df = load()
+    print(f"   {label:<38} {(time.perf_counter() - start) * 1000:10.1f} ms   {len(df):,} rows")
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Content-addressed Excel/CSV conversion cache")
+    parser.add_argument("--rows", type=int, default=200_000, help="rows in the demo workbook")
+    parser.add_argument("--skip-pandas", action="store_true", help="skip the pandas.read_excel baseline")
+    args = parser.parse_args()
+
+    if pd is None:
+        print("pandas/pyarrow not installed")
+        print("Install with: pip install pandas pyarrow")
+        sys.exit()
+
+    with tempfile.TemporaryDirectory() as folder:
+        folder = Path(folder)
+        workbook = folder / "sales.xlsx"
+        write_sales_workbook(workbook, args.rows)
+        print(f"Workbook: {args.rows:,} rows, {workbook.stat().st_size / 1e6:.1f} MB\n")
+
+        cache = ConversionCache(folder / "cache")
+        print("1. Excel sheet 'Sales':")
+        if not args.skip_pandas:
+            timed("pandas.read_excel (no cache)", lambda: pd.read_excel(workbook, sheet_name="Sales"))
+        first = timed("miss: convert + store", lambda: cache.read_excel(workbook, "Sales"))
+        again = timed("hit: unchanged file", lambda: cache.read_excel(workbook, "Sales"))
+        print(f"   same data: {first.equals(again)}, hashed so far: {cache.stats['hashed']}x")
+
+        os.utime(workbook)  # e.g. copied back from a share: new mtime, same bytes
+        timed("hit: new mtime, same content (rehash)", lambda: cache.read_excel(workbook, "Sales"))
+        copy = folder / "sales_copy.xlsx"
+        shutil.copy(workbook, copy)
+        timed("hit: copy under another name", lambda: cache.read_excel(copy, "Sales"))
+        timed("miss: other sheet", lambda: cache.read_excel(workbook, "Returns"))
+        timed("hit: as Arrow table (no pandas)", lambda: cache.read_excel(workbook, "Sales", as_table=True))
+
+        write_sales_workbook(workbook, args.rows, seed=1)
+        timed("miss: workbook edited", lambda: cache.read_excel(workbook, "Sales"))
+
+        print("\n2. CSV export of the same data:")
+        csv_path = folder / "sales.csv"
+        first.to_csv(csv_path, index=False)
+        timed("miss: read_csv + store", lambda: cache.read_csv(csv_path))
+        timed("hit", lambda: cache.read_csv(csv_path))
+        timed("miss: other options (usecols)", lambda: cache.read_csv(csv_path, usecols=["Region", "Revenue"]))
+
+        print(f"\n   {cache.stats}, cache size {cache.size() / 1e6:.1f} MB")
+
+        print("\n3. LRU eviction (limit: room for about two 'Sales' entries):")
+        biggest = max(size for _, size, _ in cache.entries())
+        small = ConversionCache(folder / "cache", max_bytes=int(biggest * 2.5))
+        small.read_excel(copy, "Sales")      # recently used: survives
+        small.evict()
+        print(f"   {len(small.entries())} entries left, {small.size() / 1e6:.1f} MB, evicted {small.stats['evicted']}")
+        timed("still cached: copy, sheet 'Sales'", lambda: small.read_excel(copy, "Sales"))
+        print(f"   {small.stats}")
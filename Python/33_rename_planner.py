@@ -0,0 +1,371 @@
+# ============================================================================
+# 33. RENAME PLANNER - COLLISIONS, CYCLES, PARALLEL BATCHES, JOURNAL
+# ============================================================================
+# WHAT: Plan a whole batch rename first, check it, then run it in parallel
+#       batches with a journal that allows resume and rollback
+# WHY: 07_automation_rename.py renames inside the os.listdir() loop:
+#      - the number comes from enumerate() over ALL files, so it has gaps
+#      - os.rename() silently replaces an existing file_3.txt (data loss)
+#      - a → b while b → a (swap/rotation) destroys one of the two files
+#      - stopped halfway (Ctrl+C, network share gone), nobody knows which
+#        files already have their new name
+# WHEN: Renaming thousands to millions of files, on local or network drives
+#
+# How:
+# - os.scandir() lists the folder once (name + type from the directory
+#   entry, no extra stat per file); the rule runs over the sorted matches
+# - The plan is checked before anything is touched: two files → one name,
+#   name already taken by a file that stays, cycles (a → b → a)
+# - Two phases: files whose current name is the NEW name of another file
+#   first move to a unique temp name; then everything moves to its final
+#   name. Within a phase no rename depends on another, so each phase runs
+#   in parallel batches (threads - os.rename releases the GIL; mostly helps
+#   on network drives, where every rename is a round trip)
+# - Journal (JSON lines, fsync'd): the plan, one line per finished batch,
+#   "phase 1 complete" and "finished". Where each file is can be derived
+#   from the plan + which names exist, so resume() and rollback() work
+#   even if the process died between a rename and its journal line
+#
+# Run the demo:
+#     python 33_rename_planner.py
+#     python 33_rename_planner.py --files 200000 --workers 16
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+JOURNAL_NAME = ".rename-journal.jsonl"
+TEMP_PREFIX = ".rename-"          # temp names and the journal; never planned themselves
+DEFAULT_BATCH = 1000
+DEFAULT_WORKERS = 8
+
+
+# ============================================================================
+# PLANNING
+# ============================================================================
+
+def scan(folder):
+    """All entry names in folder (files, folders, links), one scandir pass."""
+    with os.scandir(folder) as entries:
+        return [(entry.name, entry.is_file(follow_symlinks=False)) for entry in entries]
+
+
+class RenamePlan:
+    """Checked rename plan: steps = [(source, temp or None, target)]."""
+
+    def __init__(self, folder, renames, existing, case_insensitive=None):
+        if case_insensitive is None:  # Windows and macOS file systems ignore case by default
+            case_insensitive = sys.platform in ("win32", "darwin")
+        key = str.casefold if case_insensitive else str
+        self.folder = Path(folder)
+        renames = [(source, target) for source, target in renames if source != target]
+        sources = {key(source) for source, _ in renames}
+        target_count = Counter(key(target) for _, target in renames)
+        existing = {key(name) for name in existing}
+
+        self.collisions = []
+        for source, target in renames:
+            if target_count[key(target)] > 1:
+                self.collisions.append((source, target, "several files get this name"))
+            elif key(target) in existing and key(target) not in sources:
+                self.collisions.append((source, target, "name already taken"))
+            elif not target or "/" in target or os.sep in target or target.startswith(TEMP_PREFIX):
+                self.collisions.append((source, target, "not a valid file name"))
+
+        run_id = uuid.uuid4().hex[:8]
+        self.steps = []
+        for index, (source, target) in enumerate(renames):
+            # source name is someone's new name → free it first via a temp name
+            temp = f"{TEMP_PREFIX}{run_id}-{index}.tmp" if key(source) in target_count else None
+            self.steps.append((source, temp, target))
+        self.cycles = find_cycles(renames, key)
+
+    def __len__(self):
+        return len(self.steps)
+
+    def summary(self):
+        two_phase = sum(1 for _, temp, _ in self.steps if temp)
+        return (f"{len(self.steps):,} renames ({two_phase:,} via temp name), {len(self.cycles):,} cycles, "
+                f"{len(self.collisions):,} collisions")
+
+    def check(self):
+        """Raise FileExistsError if the plan has collisions."""
+        if self.collisions:
+            source, target, reason = self.collisions[0]
+            raise FileExistsError(f"{len(self.collisions)} collisions, e.g. {source} → {target}: {reason}")
+
+    def execute(self, workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH, journal=None, on_batch=None, run=None):
+        """Run the plan; raises FileExistsError if the plan has collisions.
+
+        run: an id stored in the journal, for callers that group journals of
+        several folders into one run (see 34_rename_templates.py).
+        """
+        self.check()
+        journal = Path(journal or self.folder / JOURNAL_NAME)
+        if journal.exists() and not read_journal(journal)["finished"]:
+            raise RuntimeError(f"unfinished run in {journal}: resume() or rollback() it first")
+        start_journal(journal, self.folder, self.steps, "rename", run)
+        run_steps(self.folder, self.steps, ["source"] * len(self.steps), journal, workers, batch_size, on_batch)
+
+
+def find_cycles(renames, key=str):
+    """Groups of files that rename into each other (a → b → c → a)."""
+    following = {key(source): key(target) for source, target in renames}
+    names = {key(source): source for source, _ in renames}
+    cycles, state = [], {}  # state: 1 = on the current path, 2 = finished
+    for start in following:
+        path, name = [], start
+        while name in following and name not in state:
+            state[name] = 1
+            path.append(name)
+            name = following[name]
+        if state.get(name) == 1:  # walked back into the current path
+            cycles.append([names[n] for n in path[path.index(name):]])
+        for n in path:
+            state[n] = 2
+    return cycles
+
+
+def plan_renames(folder, new_name, match=None, case_insensitive=None):
+    """Plan renames for the files where match(name) is true.
+
+    new_name(name, number) → new file name; number counts the matching files
+    (sorted by name), not every entry in the folder like enumerate(os.listdir()).
+    """
+    entries = scan(folder)
+    existing = [name for name, _ in entries]
+    matching = sorted(name for name, is_file in entries
+                      if is_file and not name.startswith(TEMP_PREFIX) and (match is None or match(name)))
+    renames = [(name, new_name(name, number)) for number, name in enumerate(matching)]
+    return RenamePlan(folder, renames, existing, case_insensitive)
+
+
+# ============================================================================
+# EXECUTION + JOURNAL
+# ============================================================================
+# A file is always at one of three names: its source, its temp name or its
+# target. Phase 1 only creates temp names, phase 2 only removes them, and a
+# direct step's target was free when the plan was made - so after a crash:
+#   temp name exists             → at temp
+#   direct step, target exists   → at target
+#   two-phase step, no temp name → at target if phase 1 completed, else source
+
+def journal_line(journal, record):
+    with open(journal, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def start_journal(journal, folder, steps, action, run=None):
+    temp = journal.with_name(journal.name + ".tmp")
+    with open(temp, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"folder": str(folder), "action": action, "run": run, "steps": steps}) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, journal)
+
+
+def read_journal(journal):
+    with open(journal, encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        state = {"folder": Path(header["folder"]), "action": header["action"], "run": header.get("run"),
+                 "steps": [tuple(step) for step in header["steps"]], "phase1": False, "finished": False,
+                 "batches": 0}
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:  # last line cut off by the crash
+                break
+            state["phase1"] = state["phase1"] or record.get("phase1_complete", False)
+            state["finished"] = state["finished"] or record.get("finished", False)
+            state["batches"] += "batch" in record
+    return state
+
+
+def locate(folder, steps, phase1_complete):
+    """Where each step's file is now: "source", "temp" or "target"."""
+    existing = {name for name, _ in scan(folder)}
+    where = []
+    for source, temp, target in steps:
+        if temp and temp in existing:
+            where.append("temp")
+        elif temp:
+            where.append("target" if phase1_complete else "source")
+        else:
+            where.append("target" if target in existing and source not in existing else "source")
+    return where
+
+
+def rename_batch(folder, moves):
+    for old, new in moves:
+        new_path = os.path.join(folder, new)
+        if os.path.lexists(new_path):  # appeared after planning: never overwrite
+            raise FileExistsError(f"{new} already exists")
+        os.rename(os.path.join(folder, old), new_path)
+    return len(moves)
+
+
+def run_batches(folder, moves, phase, journal, workers, batch_size, on_batch):
+    """Renames of one phase (independent of each other) in parallel batches."""
+    batches = [moves[i:i + batch_size] for i in range(0, len(moves), batch_size)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        try:
+            for number, batch in enumerate(batches):
+                pending.append((number, pool.submit(rename_batch, folder, batch)))
+                while len(pending) > 2 * workers or (pending and number == len(batches) - 1):
+                    done_number, future = pending.popleft()
+                    journal_line(journal, {"phase": phase, "batch": done_number, "renamed": future.result()})
+                    if on_batch:
+                        on_batch(phase, done_number, len(batches))
+        except BaseException:
+            for _, future in pending:  # not started yet: don't start them
+                future.cancel()
+            raise
+
+
+def run_steps(folder, steps, where, journal, workers, batch_size, on_batch):
+    phase1 = [(source, temp) for (source, temp, _), at in zip(steps, where) if temp and at == "source"]
+    run_batches(folder, phase1, 1, journal, workers, batch_size, on_batch)
+    journal_line(journal, {"phase1_complete": True})
+    phase2 = [(temp or source, target)  # two-phase steps are all at their temp name by now
+              for (source, temp, target), at in zip(steps, where) if at != "target"]
+    run_batches(folder, phase2, 2, journal, workers, batch_size, on_batch)
+    journal_line(journal, {"finished": True})
+
+
+def resume(journal, workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH, on_batch=None):
+    """Finish an interrupted run (rename or rollback) from its journal."""
+    journal = Path(journal)
+    state = read_journal(journal)
+    if state["finished"]:
+        return 0
+    where = locate(state["folder"], state["steps"], state["phase1"])
+    if state["phase1"]:
+        journal_line(journal, {"resumed": True})
+    else:  # phase 1 was cut short: redo it for the files still at their source
+        start_journal(journal, state["folder"], state["steps"], state["action"], state["run"])
+    run_steps(state["folder"], state["steps"], where, journal, workers, batch_size, on_batch)
+    return sum(at != "target" for at in where)
+
+
+def rollback(journal, workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH, on_batch=None):
+    """Give every file of a (finished or interrupted) run its old name back.
+
+    The way back is planned like any other rename: current name → old name,
+    with its own temp names. Reusing the forward plan's temps would be wrong:
+    in a chain a → b, b → c the file going back to b must wait until b is
+    free, which the forward plan never needed. The rollback is journaled
+    like a normal run, so an interrupted rollback can be resumed too.
+
+    On a rollback journal this only finishes an interrupted rollback; a
+    finished one returns 0 - rolling back twice does not redo the run.
+    """
+    journal = Path(journal)
+    state = read_journal(journal)
+    if state["action"] == "rollback":
+        return resume(journal, workers, batch_size, on_batch)
+    folder = state["folder"]
+    where = locate(folder, state["steps"], state["phase1"])
+    renames = [(temp if at == "temp" else target, source)
+               for (source, temp, target), at in zip(state["steps"], where) if at != "source"]
+    plan = RenamePlan(folder, renames, [name for name, _ in scan(folder)])
+    plan.check()
+    start_journal(journal, folder, plan.steps, "rollback", state["run"])
+    run_steps(folder, plan.steps, ["source"] * len(plan), journal, workers, batch_size, on_batch)
+    return len(plan)
+
+
+# ============================================================================
+# DEMO
+# ============================================================================
+
+def make_files(folder, count):
+    """report 0.txt ... with their own name as content (to check nothing got lost)."""
+    for i in range(count):
+        (folder / f"report {i}.txt").write_text(f"report {i}.txt")
+    (folder / "notes.md").write_text("notes.md")
+    (folder / "file_0.txt").write_text("file_0.txt")  # already follows the convention
+
+
+def contents(folder):
+    return sorted(path.read_text() for path in folder.iterdir() if not path.name.startswith(TEMP_PREFIX))
+
+
+def is_txt_to_rename(name):  # the rule from 07_automation_rename.py
+    return name.endswith(".txt") and not name.startswith("file_")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch rename planner with journal")
+    parser.add_argument("--files", type=int, default=20_000, help="files to create and rename")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="rename threads")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        folder = Path(folder)
+        make_files(folder, args.files)
+        before = contents(folder)
+
+        print("1. The 07_automation_rename.py rule as a plan:")
+        plan = plan_renames(folder, lambda name, number: f"file_{number}.txt", match=is_txt_to_rename)
+        print(f"   {plan.summary()}")
+        for source, target, reason in plan.collisions[:3]:
+            print(f"   ✗ {source} → {target}: {reason}")
+        try:
+            plan.execute()
+        except FileExistsError as error:
+            print(f"   execute() refused: {error}")
+
+        print("\n2. Numbers after the existing ones:")
+        start = time.perf_counter()
+        plan = plan_renames(folder, lambda name, number: f"file_{number + 1}.txt", match=is_txt_to_rename)
+        print(f"   {plan.summary()}  (scan + plan: {time.perf_counter() - start:.2f}s)")
+
+        def crash_after_three(phase, batch, batches):
+            if batch == 2:
+                raise KeyboardInterrupt
+
+        try:
+            plan.execute(workers=args.workers, on_batch=crash_after_three)
+        except KeyboardInterrupt:
+            done = sum(name.startswith("file_") for name, _ in scan(folder)) - 1
+            print(f"   interrupted (Ctrl+C) after {done:,} renames")
+        journal = folder / JOURNAL_NAME
+        start = time.perf_counter()
+        remaining = resume(journal, workers=args.workers)
+        print(f"   resume(): {remaining:,} files left to rename, done in {time.perf_counter() - start:.2f}s")
+        print(f"   all renamed: {sum(name.startswith('file_') for name, _ in scan(folder)) - 1 == args.files}, "
+              f"no file lost: {contents(folder) == before}")
+
+        start = time.perf_counter()
+        rollback(journal, workers=args.workers)
+        names = {name for name, _ in scan(folder)}
+        print(f"   rollback(): {time.perf_counter() - start:.2f}s, original names back: "
+              f"{all(f'report {i}.txt' in names for i in range(args.files))}")
+
+        print("\n3. Cycles (swap + rotation) go through temp names:")
+        for name in ("a.txt", "b.txt", "x.txt", "y.txt", "z.txt"):
+            (folder / name).write_text(name)
+        swap = {"a.txt": "b.txt", "b.txt": "a.txt", "x.txt": "y.txt", "y.txt": "z.txt", "z.txt": "x.txt"}
+        plan = plan_renames(folder, lambda name, number: swap[name], match=swap.__contains__)
+        print(f"   {plan.summary()}: {plan.cycles}")
+        plan.execute()
+        print("   " + ", ".join(f"{name} holds {(folder / name).read_text()}" for name in sorted(swap)))
+
+        print(f"\n4. Rename speed, {args.files:,} files (one phase, no collisions):")
+        for workers in (1, args.workers):
+            plan = plan_renames(folder, lambda name, number: f"{workers}w_{name}", match=is_txt_to_rename)
+            start = time.perf_counter()
+            plan.execute(workers=workers)
+            seconds = time.perf_counter() - start
+            print(f"   {workers:>2} thread(s): {seconds:.2f}s ({len(plan) / seconds:,.0f} renames/sec)")
+            rollback(journal)
@@ -0,0 +1,325 @@
+# ============================================================================
+# 34. TEMPLATE RENAMES FOR WHOLE FOLDER TREES
+# ============================================================================
+# WHAT: Rename files in a folder and all its subfolders with a template like
+#       "{mtime:%Y-%m-%d}_{n:04d}{suffix}" - dates from file metadata,
+#       counters, parts of the old name captured with a regex
+# WHY: 07_automation_rename.py only handles .txt files in the current folder
+#      with a fixed file_{count}.txt pattern. Photo dumps, scanner output and
+#      report archives are trees with millions of files
+# WHEN: Organising photos by date, normalising report names, cleaning up
+#       exports before they go to a shared drive
+#
+# How:
+# - walk() is a generator: it yields one folder at a time, while a thread
+#   pool already scans the next folders (os.scandir, plus os.stat only when
+#   the template needs dates or sizes). Memory depends on the number of
+#   folders in flight, not on the number of files
+# - every folder gets its own checked plan from 33_rename_planner.py
+#   (collisions, cycles, temp names, journal); folders with collisions are
+#   skipped and reported, the rest are renamed in parallel
+# - dry_run=True does everything except renaming: counts, a sample of the
+#   plan, the collisions, and a runtime estimate from the measured scan time
+#   plus a measured rename + fsync on the same drive
+# - every folder has a journal in <root>/.rename-journals, tagged with the id
+#   of the rename_tree() run that wrote it. rollback_tree() undoes one run
+#   (default: the newest not undone yet) and leaves journals of other runs,
+#   e.g. in folders that run never touched, alone
+#
+# Template fields:
+#   {name} {stem} {suffix} {ext} {parent}   old name parts, parent folder name
+#   {n}                                     counter per folder ({n:04d})
+#   {mtime} {created}                       datetimes ({mtime:%Y-%m-%d})
+#   {size}                                  bytes
+#   {g1} {g2} ... and (?P<name>...)         regex groups from the pattern
+#
+# Run the demo:
+#     python 34_rename_templates.py
+#     python 34_rename_templates.py --folders 2000 --files-per-folder 500
+
+import argparse
+import hashlib
+import importlib
+import os
+import re
+import string
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+# Module names starting with a digit cannot be imported with "import ..."
+planner = importlib.import_module("33_rename_planner")
+streaming = importlib.import_module("28_excel_streaming_read")  # peak_rss_mb()
+
+JOURNAL_FOLDER = planner.TEMP_PREFIX + "journals"   # skipped by the walk like every .rename-* name
+STAT_FIELDS = {"mtime", "created", "size"}
+
+
+# ============================================================================
+# TEMPLATES
+# ============================================================================
+
+class RenameTemplate:
+    """template: str.format-style new name; pattern: regex the old name must match."""
+
+    def __init__(self, template, pattern=None, start=1, order="name"):
+        self.template = template
+        self.regex = re.compile(pattern) if pattern else None
+        self.start = start
+        self.order = order  # "name" or "mtime": which file gets n = start
+        fields = {field.split(".")[0].split("[")[0] for _, field, _, _ in string.Formatter().parse(template) if field}
+        self.needs_stat = bool(fields & STAT_FIELDS) or order == "mtime"
+        self.template.format(**self.sample_fields())  # unknown fields fail now, not after a million files
+
+    def sample_fields(self):
+        groups = {f"g{i}": "" for i in range(1, (self.regex.groups if self.regex else 0) + 1)}
+        groups.update({name: "" for name in (self.regex.groupindex if self.regex else {})})
+        now = datetime.now()
+        return dict(name="a.txt", stem="a", suffix=".txt", ext="txt", parent="", n=self.start, mtime=now,
+                    created=now, size=0, **groups)
+
+    def match(self, name):
+        if self.regex is None:
+            return True
+        return self.regex.search(name)
+
+    def render(self, name, folder, number, stat, match):
+        stem, dot, ext = name.rpartition(".") if "." in name.lstrip(".") else (name, "", "")
+        fields = {"name": name, "stem": stem, "suffix": dot + ext, "ext": ext, "parent": Path(folder).name,
+                  "n": number}
+        if stat is not None:
+            fields["mtime"] = datetime.fromtimestamp(stat.st_mtime)
+            fields["created"] = datetime.fromtimestamp(getattr(stat, "st_birthtime", stat.st_ctime))
+            fields["size"] = stat.st_size
+        if match is not None and match is not True:
+            fields.update({f"g{i}": group or "" for i, group in enumerate(match.groups(), 1)})
+            fields.update({key: value or "" for key, value in match.groupdict().items()})
+        return self.template.format(**fields)
+
+
+# ============================================================================
+# GENERATOR WALK - FOLDERS SCANNED CONCURRENTLY, YIELDED ONE BY ONE
+# ============================================================================
+
+def scan_folder(folder, with_stat):
+    """(subfolders, entries) of one folder; entries = [(name, is_file, stat or None)]."""
+    subfolders, files = [], []
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.name.startswith(planner.TEMP_PREFIX):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    subfolders.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    files.append((entry.name, True, entry.stat(follow_symlinks=False) if with_stat else None))
+                else:
+                    files.append((entry.name, False, None))  # links etc.: never renamed, but the name is taken
+    except (PermissionError, FileNotFoundError):
+        pass
+    return subfolders, files
+
+
+def walk(root, with_stat=False, workers=8, ahead=32):
+    """Yield (folder, entries) for root and every folder below it.
+
+    Up to `ahead` folders are scanned in the background; folders waiting to
+    be scanned are kept as paths only.
+    """
+    waiting = deque([str(root)])
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        scanning = deque()
+        while waiting or scanning:
+            while waiting and len(scanning) < ahead:
+                folder = waiting.popleft()
+                scanning.append((folder, pool.submit(scan_folder, folder, with_stat)))
+            folder, future = scanning.popleft()
+            subfolders, files = future.result()
+            waiting.extend(subfolders)
+            yield folder, files
+
+
+# ============================================================================
+# PLANNING + RUNNING A WHOLE TREE
+# ============================================================================
+
+def plan_folder(folder, files, template, case_insensitive=None):
+    matches = [(name, stat, found) for name, is_file, stat in files if is_file and (found := template.match(name))]
+    if template.order == "mtime":
+        matches.sort(key=lambda item: (item[1].st_mtime, item[0]))
+    else:
+        matches.sort(key=lambda item: item[0])
+    renames = [(name, template.render(name, folder, number, stat, found))
+               for number, (name, stat, found) in enumerate(matches, template.start)]
+    return planner.RenamePlan(folder, renames, [name for name, _, _ in files], case_insensitive)
+
+
+def journal_for(root, folder):
+    return Path(root) / JOURNAL_FOLDER / f"{hashlib.sha1(str(folder).encode()).hexdigest()[:20]}.jsonl"
+
+
+def rename_tree(root, template, dry_run=True, workers=8, sample=5):
+    """Plan (and unless dry_run, run) template renames under root; returns a report dict."""
+    root = Path(root).resolve()
+    report = {"run": f"{time.time_ns():020d}", "folders": 0, "files": 0, "renames": 0, "temp_renames": 0,
+              "cycles": 0, "collisions": 0, "skipped_folders": [], "sample": [], "seconds": 0.0}
+    start = time.perf_counter()
+    if not dry_run:
+        (root / JOURNAL_FOLDER).mkdir(exist_ok=True)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        running = deque()
+        for folder, files in walk(root, template.needs_stat, workers):
+            plan = plan_folder(folder, files, template)
+            report["folders"] += 1
+            report["files"] += len(files)
+            if plan.collisions:
+                report["collisions"] += len(plan.collisions)
+                if len(report["skipped_folders"]) < sample:
+                    report["skipped_folders"].append((os.path.relpath(folder, root), plan.collisions[:sample]))
+                continue
+            report["renames"] += len(plan)
+            report["temp_renames"] += sum(1 for _, temp, _ in plan.steps if temp)
+            report["cycles"] += len(plan.cycles)
+            for source, _, target in plan.steps[:sample - len(report["sample"])]:
+                report["sample"].append((os.path.relpath(os.path.join(folder, source), root), target))
+            if dry_run or not len(plan):
+                continue
+            running.append(pool.submit(plan.execute, workers=1, journal=journal_for(root, folder),
+                                       run=report["run"]))
+            while len(running) > 2 * workers:  # bounded: finished folders are let go
+                running.popleft().result()
+        for future in running:
+            future.result()
+    report["seconds"] = time.perf_counter() - start
+    if dry_run:
+        report["estimated_seconds"] = estimate_runtime(root, report)
+    return report
+
+
+def rollback_tree(root, run=None, workers=8):
+    """Undo (or finish undoing) one rename_tree() run; returns the files renamed back.
+
+    run: report["run"] of that run; default the newest run not undone yet.
+    Only the journals of that run are rolled back.
+    """
+    journals = {journal: planner.read_journal(journal)
+                for journal in sorted((Path(root) / JOURNAL_FOLDER).glob("*.jsonl"))}
+    undo = {journal: state for journal, state in journals.items()
+            if state["run"] and (state["action"] == "rename" or not state["finished"])}
+    if run is None:
+        run = max((state["run"] for state in undo.values()), default=None)
+    journals = [journal for journal, state in undo.items() if state["run"] == run]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(lambda journal: planner.rollback(journal, workers=1), journals))
+
+
+# ============================================================================
+# DRY RUN: RUNTIME ESTIMATE
+# ============================================================================
+
+def measure_rename_costs(folder, repeats=200):
+    """Seconds per os.rename and per journal fsync, measured on this drive."""
+    first, second = Path(folder) / f"{planner.TEMP_PREFIX}probe-a", Path(folder) / f"{planner.TEMP_PREFIX}probe-b"
+    first.write_bytes(b"probe")
+    try:
+        start = time.perf_counter()
+        for _ in range(repeats // 2):
+            os.rename(first, second)
+            os.rename(second, first)
+        rename = (time.perf_counter() - start) / repeats
+        start = time.perf_counter()
+        for _ in range(10):
+            planner.journal_line(second, {"probe": True})
+        fsync = (time.perf_counter() - start) / 10
+    finally:
+        first.unlink(missing_ok=True)
+        second.unlink(missing_ok=True)
+    return rename, fsync
+
+
+def estimate_runtime(root, report):
+    """Scan + plan time (just measured) + renames and journal writes (probed)."""
+    rename, fsync = measure_rename_costs(root)
+    folders_with_renames = min(report["folders"], report["renames"])
+    journal_writes = 4 * folders_with_renames + report["renames"] // planner.DEFAULT_BATCH
+    return report["seconds"] + (report["renames"] + report["temp_renames"]) * rename + journal_writes * fsync
+
+
+# ============================================================================
+# DEMO - A PHOTO ARCHIVE
+# ============================================================================
+
+def make_photo_tree(root, folders, files_per_folder):
+    """camera/<year>/<album>/IMG_1234.jpg with mtimes spread over the year, plus reports."""
+    base = datetime(2023, 1, 1).timestamp()
+    for f in range(folders):
+        folder = root / "camera" / str(2023 + f % 3) / f"album {f}"
+        folder.mkdir(parents=True)
+        for i in range(files_per_folder):
+            path = folder / f"IMG_{1000 + i}.jpg"
+            path.write_bytes(b"")
+            taken = base + (f % 3) * 365 * 86400 + i * 3600 * 7
+            os.utime(path, (taken, taken))
+        (folder / "thumbs.db").write_bytes(b"")
+    reports = root / "reports"
+    reports.mkdir()
+    for region in ("north", "south", "east", "west"):
+        for year in (2023, 2024):
+            (reports / f"Sales Report {region} {year}.xlsx").write_bytes(b"")
+
+
+def tree_names(root):
+    return sorted(str(path.relative_to(root)) for path in Path(root).rglob("*")
+                  if not path.name.startswith(planner.TEMP_PREFIX) and JOURNAL_FOLDER not in path.parts)
+
+
+def print_report(report):
+    print(f"   {report['folders']:,} folders, {report['files']:,} files, {report['renames']:,} renames "
+          f"({report['temp_renames']:,} via temp name, {report['cycles']} cycles), "
+          f"{report['collisions']:,} collisions, {report['seconds']:.2f}s")
+    for source, target in report["sample"][:3]:
+        print(f"   {source} → {target}")
+    for folder, collisions in report["skipped_folders"][:2]:
+        print(f"   skipped {folder}: {collisions[0][0]} → {collisions[0][1]} ({collisions[0][2]})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Template renames for whole folder trees")
+    parser.add_argument("--folders", type=int, default=300, help="photo album folders to create")
+    parser.add_argument("--files-per-folder", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        root = Path(root)
+        make_photo_tree(root, args.folders, args.files_per_folder)
+        original = tree_names(root)
+        photos = RenameTemplate("{mtime:%Y-%m-%d}_{parent}_{n:04d}{suffix}", pattern=r"^IMG_\d+\.jpe?g$",
+                                order="mtime")
+
+        print("1. Dry run - photos by date:")
+        report = rename_tree(root, photos, dry_run=True, workers=args.workers)
+        print_report(report)
+        print(f"   estimated runtime: {report['estimated_seconds']:.1f}s, nothing renamed: {tree_names(root) == original}")
+
+        print("\n2. The real run:")
+        report = rename_tree(root, photos, dry_run=False, workers=args.workers)
+        print_report(report)
+
+        print("\n3. Regex captures - reports:")
+        reports = RenameTemplate("{year}_{region}{suffix}", pattern=r"^Sales Report (?P<region>\w+) (?P<year>\d{4})")
+        print_report(rename_tree(root, reports, dry_run=False))
+
+        print("\n4. A template that gives two files the same name is refused per folder:")
+        clash = RenameTemplate("{mtime:%Y}{suffix}", pattern=r"\.jpg$")
+        print_report(rename_tree(root, clash, dry_run=True))
+
+        start = time.perf_counter()
+        rollback_tree(root)  # the newest run first: step 3 (reports/), then step 2 (the albums)
+        rollback_tree(root)
+        print(f"\n5. rollback_tree(): {time.perf_counter() - start:.2f}s, original names back: "
+              f"{tree_names(root) == original}")
+        print(f"\nPeak memory: {streaming.peak_rss_mb():.0f} MB")
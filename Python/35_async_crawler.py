@@ -0,0 +1,400 @@
+# ============================================================================
+# 35. ASYNC CRAWLER - THOUSANDS OF PAGES PER MINUTE, POLITELY
+# ============================================================================
+# WHAT: Crawl many pages concurrently with asyncio + aiohttp
+# WHY: 08_web_scrape.py calls requests.get(url) for one page at a time and
+#      waits for every answer. With ~100 ms per page, a price check over 50k
+#      product pages takes well over an hour - almost all of it waiting
+# WHEN: Price monitoring, catalogue snapshots, link checks - anything with
+#       more than a few hundred pages
+#
+# How:
+# - One ClientSession for the whole crawl: connections are kept alive and
+#   reused (no new TCP/TLS handshake per page)
+# - N worker tasks share one URL frontier: an asyncio.Queue with a maximum
+#   size, so memory stays bounded; links found while it is full are counted
+#   as dropped (and can be found again later)
+# - Per host: a semaphore (max parallel requests) and a politeness delay
+#   (minimum time between two request starts), plus robots.txt
+# - 429/5xx/timeouts are retried with backoff (Retry-After is respected)
+# - Pages are parsed by a callback: parse(url, html) → (record, links)
+#
+# Needs: pip install aiohttp (requests only for the sequential comparison)
+#
+# Run the demo (starts a local fixture shop on 127.0.0.1):
+#     python 35_async_crawler.py
+#     python 35_async_crawler.py --pages 50000 --latency 0.1
+
+import argparse
+import asyncio
+import multiprocessing
+import random
+import re
+import socket
+import time
+import urllib.robotparser
+from collections import Counter
+from urllib.parse import urldefrag, urljoin, urlsplit
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+HREF_RE = re.compile(r"""<a\s[^>]*?href\s*=\s*["']([^"'#]+)""", re.IGNORECASE)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def parse_links(url, html):
+    """Default parser: no record, every <a href> on the page."""
+    return None, HREF_RE.findall(html)
+
+
+# ============================================================================
+# PER-HOST LIMITS
+# ============================================================================
+
+class HostLimiter:
+    """async with limiter: at most `concurrency` requests, starts `delay` seconds apart."""
+
+    def __init__(self, concurrency, delay):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.delay = delay
+        self.next_start = 0.0
+        self.robots = None  # task loading robots.txt → RobotFileParser, or None if there is none
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        if self.delay:
+            now = asyncio.get_running_loop().time()
+            start = max(now, self.next_start)  # reserve the next free slot (no await in between)
+            self.next_start = start + self.delay
+            if start > now:
+                await asyncio.sleep(start - now)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.semaphore.release()
+
+
+# ============================================================================
+# CRAWLER
+# ============================================================================
+
+class Crawler:
+    """crawler = Crawler(["https://shop.example/"], parse=my_parser, max_pages=50_000)
+       stats = asyncio.run(crawler.run())      # records arrive via on_record
+    """
+
+    def __init__(self, start_urls, parse=parse_links, on_record=None, max_pages=10_000, workers=64,
+                 per_host=8, delay=0.0, frontier_size=10_000, allowed_hosts=None, timeout=30,
+                 retries=3, respect_robots=True, user_agent="ai-lab-crawler/1.0"):
+        if aiohttp is None:
+            raise ImportError("aiohttp not installed - Install with: pip install aiohttp")
+        self.start_urls = list(start_urls)
+        self.parse = parse
+        self.on_record = on_record
+        self.max_pages = max_pages
+        self.workers = workers
+        self.per_host = per_host
+        self.delay = delay
+        self.frontier_size = frontier_size
+        self.allowed_hosts = set(allowed_hosts or (urlsplit(url).netloc for url in self.start_urls))
+        self.timeout = timeout
+        self.retries = retries
+        self.respect_robots = respect_robots
+        self.user_agent = user_agent
+        self.stats = Counter()
+        self.per_host_pages = Counter()
+
+    async def run(self):
+        """Crawl until the frontier is empty or max_pages is reached; returns stats."""
+        self.frontier = asyncio.Queue(maxsize=self.frontier_size)
+        self.pending = 0              # URLs queued, being fetched or waiting for a retry
+        self.finished = asyncio.Event()
+        self.seen = set()
+        self.limiters = {}
+        connector = aiohttp.TCPConnector(limit=self.workers, limit_per_host=self.per_host, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        start = time.perf_counter()
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         headers={"User-Agent": self.user_agent}) as session:
+            self.session = session
+            for url in self.start_urls:
+                self.schedule(url)
+            tasks = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+            if self.pending:
+                await self.finished.wait()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self.stats["seconds"] = time.perf_counter() - start
+        return self.stats
+
+    def schedule(self, url, attempt=0):
+        """Add a URL to the frontier if it is new, allowed and there is room."""
+        url = urldefrag(url)[0]
+        if attempt == 0:
+            host = urlsplit(url).netloc
+            if url in self.seen or host not in self.allowed_hosts or len(self.seen) >= self.max_pages:
+                return
+            limiter = self.limiters.get(host)
+            if limiter and limiter.robots and limiter.robots.done() and not self.allowed(limiter, url):
+                self.stats["robots.txt"] += 1
+                return
+        try:
+            self.frontier.put_nowait((url, attempt))
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1  # not marked seen: can be found again later
+            return
+        self.seen.add(url)
+        self.pending += 1
+
+    def done_with(self, url):
+        self.pending -= 1
+        if self.pending == 0:
+            self.finished.set()
+
+    async def worker(self):
+        while True:
+            url, attempt = await self.frontier.get()
+            retrying = False
+            try:
+                retrying = await self.fetch(url, attempt)
+            except Exception as error:  # a broken page must not stop the crawl
+                self.stats[f"error {type(error).__name__}"] += 1
+            if not retrying:
+                self.done_with(url)
+
+    def retry(self, url, attempt):
+        try:
+            self.frontier.put_nowait((url, attempt))  # still counted in self.pending
+        except asyncio.QueueFull:
+            self.stats["failed"] += 1
+            self.done_with(url)
+
+    async def limiter(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.limiters:
+            self.limiters[host] = HostLimiter(self.per_host, self.delay)
+        limiter = self.limiters[host]
+        if self.respect_robots:
+            if limiter.robots is None:  # first URL of this host: everyone waits for the same download
+                limiter.robots = asyncio.ensure_future(self.load_robots(url))
+            await limiter.robots
+        return limiter
+
+    def allowed(self, limiter, url):
+        robots = limiter.robots.result() if limiter.robots else None
+        return robots is None or robots.can_fetch(self.user_agent, url)
+
+    async def load_robots(self, url):
+        parts = urlsplit(url)
+        try:
+            async with self.session.get(f"{parts.scheme}://{parts.netloc}/robots.txt") as response:
+                if response.status != 200:
+                    return None
+                robots = urllib.robotparser.RobotFileParser()
+                robots.parse((await response.text()).splitlines())
+                return robots
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None
+
+    async def fetch(self, url, attempt):
+        """Fetch + parse one page; True if a retry was scheduled instead."""
+        limiter = await self.limiter(url)
+        if not self.allowed(limiter, url):
+            self.stats["robots.txt"] += 1
+            return False
+        try:
+            async with limiter:
+                async with self.session.get(url) as response:
+                    status = response.status
+                    retry_after = response.headers.get("Retry-After")
+                    html = await response.text(errors="replace") if status == 200 else ""
+                    is_html = "html" in response.headers.get("Content-Type", "")
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            status, retry_after = "timeout/connection", None
+
+        if status in RETRY_STATUS or status == "timeout/connection":
+            if attempt < self.retries:
+                self.stats["retries"] += 1
+                wait = float(retry_after) if retry_after and retry_after.isdigit() else 0.5 * 2 ** attempt
+                asyncio.get_running_loop().call_later(wait * random.uniform(0.8, 1.2), self.retry, url, attempt + 1)
+                return True
+            self.stats["failed"] += 1
+            return False
+        self.stats[f"status {status}"] += 1
+        if status != 200 or not is_html:
+            return False
+        self.stats["pages"] += 1
+        self.stats["bytes"] += len(html)
+        self.per_host_pages[urlsplit(url).netloc] += 1
+        record, links = self.parse(url, html)
+        if record is not None and self.on_record:
+            self.on_record(record)
+        for link in links:
+            self.schedule(urljoin(url, link))
+        return False
+
+
+def crawl(start_urls, **options):
+    """Synchronous entry point: crawl(urls, parse=..., on_record=...) → stats."""
+    return asyncio.run(Crawler(start_urls, **options).run())
+
+
+# ============================================================================
+# LOCAL FIXTURE SHOP - RUNS IN ITS OWN PROCESS
+# ============================================================================
+# /                   → category links
+# /category/<c>       → 50 product links + next page
+# /product/<id>       → title, price, 3 related products
+# /robots.txt         → Disallow: /cart/
+# Every response waits `latency` seconds (like a real server far away) and
+# every 97th product answers 503 once. /stats reports what the server saw.
+
+PRODUCTS_PER_CATEGORY = 50
+
+
+def run_fixture_shop(port, products, latency, ready):
+    from aiohttp import web
+
+    seen = {"requests": 0, "connections": set(), "in_flight": Counter(), "peak": Counter(), "failed_once": set()}
+
+    async def slow(request, body, status=200, content_type="text/html"):
+        host = request.host.split(":")[0]
+        seen["requests"] += 1
+        seen["connections"].add(request.transport.get_extra_info("peername"))
+        seen["in_flight"][host] += 1
+        seen["peak"][host] = max(seen["peak"][host], seen["in_flight"][host])
+        try:
+            await asyncio.sleep(latency)
+        finally:
+            seen["in_flight"][host] -= 1
+        return web.Response(text=body, status=status, content_type=content_type)
+
+    async def home(request):
+        categories = (products + PRODUCTS_PER_CATEGORY - 1) // PRODUCTS_PER_CATEGORY
+        links = "".join(f'<a href="/category/{c}">Category {c}</a>' for c in range(categories))
+        return await slow(request, f"<html><body>{links}<a href='/cart/'>Cart</a></body></html>")
+
+    async def category(request):
+        c = int(request.match_info["c"])
+        first = c * PRODUCTS_PER_CATEGORY
+        links = "".join(f'<li><a href="/product/{i}">Product {i}</a></li>'
+                        for i in range(first, min(first + PRODUCTS_PER_CATEGORY, products)))
+        return await slow(request, f"<html><body><ul>{links}</ul></body></html>")
+
+    async def product(request):
+        i = int(request.match_info["i"])
+        if i % 97 == 0 and i not in seen["failed_once"]:
+            seen["failed_once"].add(i)
+            return await slow(request, "busy", status=503, content_type="text/plain")
+        related = "".join(f'<a href="/product/{(i * 7 + k) % products}">related</a>' for k in (1, 2, 3))
+        price = 5 + (i * 37) % 500 + 0.99
+        return await slow(request, f'<html><head><title>Product {i}</title></head><body><h1>Product {i}</h1>'
+                                   f'<span class="price">{price:.2f}</span>{related}'
+                                   f'<a href="/cart/add/{i}">Add to cart</a></body></html>')
+
+    async def robots(request):
+        return await slow(request, "User-agent: *\nDisallow: /cart/\n", content_type="text/plain")
+
+    async def stats(request):
+        return web.json_response({"requests": seen["requests"], "connections": len(seen["connections"]),
+                                  "peak_per_host": dict(seen["peak"])})
+
+    app = web.Application()
+    app.add_routes([web.get("/", home), web.get("/category/{c}", category), web.get("/product/{i}", product),
+                    web.get("/robots.txt", robots), web.get("/stats", stats)])
+
+    async def serve():
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# ============================================================================
+# DEMO
+# ============================================================================
+
+PRICE_RE = re.compile(r'<span class="price">([\d.]+)</span>')
+TITLE_RE = re.compile(r"<h1>(.*?)</h1>")
+
+
+def parse_product(url, html):
+    """Price monitoring: a record for product pages, links from every page."""
+    price, title = PRICE_RE.search(html), TITLE_RE.search(html)
+    record = {"url": url, "title": title.group(1), "price": float(price.group(1))} if price and title else None
+    return record, HREF_RE.findall(html)
+
+
+def sequential_requests(base, pages):
+    """The 08_web_scrape.py way: requests.get() one page after another."""
+    import requests
+
+    start = time.perf_counter()
+    for i in range(pages):
+        requests.get(f"{base}/product/{i + 1}").text
+    return pages / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Async crawler against a local fixture shop")
+    parser.add_argument("--pages", type=int, default=5000, help="products in the fixture shop")
+    parser.add_argument("--latency", type=float, default=0.05, help="server response time in seconds")
+    parser.add_argument("--workers", type=int, default=128)
+    parser.add_argument("--per-host", type=int, default=64)
+    args = parser.parse_args()
+
+    if aiohttp is None:
+        print("aiohttp not installed")
+        print("Install with: pip install aiohttp")
+        raise SystemExit
+
+    port = free_port()
+    ready = multiprocessing.Event()
+    shop = multiprocessing.Process(target=run_fixture_shop, args=(port, args.pages, args.latency, ready), daemon=True)
+    shop.start()
+    ready.wait(10)
+    base = f"http://127.0.0.1:{port}"
+
+    try:
+        print(f"Fixture shop: {args.pages:,} products, {args.latency * 1000:.0f} ms per response\n")
+        try:
+            per_second = sequential_requests(base, 100)
+            print(f"1. requests.get() one by one: {per_second * 60:,.0f} pages/min "
+                  f"→ {args.pages / per_second / 60:.1f} min for the shop")
+        except ImportError:
+            print("1. requests not installed - sequential comparison skipped")
+
+        records = []
+        stats = crawl([base + "/"], parse=parse_product, on_record=records.append, max_pages=args.pages * 2,
+                      workers=args.workers, per_host=args.per_host)
+        seconds = stats["seconds"]
+        print(f"2. async crawler ({args.workers} workers, {args.per_host} per host): {stats['pages']:,} pages in "
+              f"{seconds:.1f}s = {stats['pages'] / seconds * 60:,.0f} pages/min")
+        print(f"   products with price: {len(records):,}, retries (503): {stats['retries']}, "
+              f"blocked by robots.txt: {stats['robots.txt']}, dropped: {stats['dropped']}")
+
+        import json
+        import urllib.request
+        with urllib.request.urlopen(base + "/stats") as response:
+            server = json.load(response)
+        print(f"   server saw {server['requests']:,} requests over {server['connections']} connections, "
+              f"peak parallel per host: {server['peak_per_host']}")
+
+        stats = crawl([base + "/"], max_pages=300, workers=32, per_host=4, delay=0.02, frontier_size=50)
+        print(f"3. polite: 4 per host, 20 ms apart, frontier of 50: {stats['pages']} pages in {stats['seconds']:.1f}s "
+              f"({stats['pages'] / stats['seconds']:.0f}/s, limit 50/s), dropped {stats['dropped']:,} links while full")
+    finally:
+        shop.terminate()
@@ -0,0 +1,423 @@
+# ============================================================================
+# 36. FAST HTML EXTRACTION - COMPILE THE SELECTORS ONCE
+# ============================================================================
+# WHAT: Pull fields out of HTML pages with a declarative spec of CSS-like
+#       selectors, compiled once and run on every page
+# WHY: 08_web_scrape.py builds a full BeautifulSoup tree (a Python object for
+#      every tag and every text) and then searches it with find_all(). For a
+#      scrape job that needs a title, a price and the links, building that
+#      tree is most of the CPU time
+# WHEN: Scrape jobs with many pages of the same layout (product pages, news
+#       articles, listings) - together with 35_async_crawler.py
+#
+# How:
+# - compile_spec() turns the spec into selector objects once: tag, #id,
+#   .class, [attr], [attr=value], descendant (space) and child (>)
+# - backend "lxml": the page is parsed by libxml2 in C, every field is one
+#   precompiled XPath (the CSS selector translated once). No Python object
+#   per tag - only the matched values become Python strings
+# - backend "stream": no tree at all. The stdlib HTMLParser reports start
+#   tags, text and end tags; a stack of open tags is enough to match the
+#   selectors, text is only collected inside matched elements, and parsing
+#   stops as soon as every single-value field is found
+#
+# Spec:
+#   {"title": "h1",                                     text of the first match
+#    "price": {"css": "span.price", "type": float},     converted (None if it fails)
+#    "links": {"css": "a", "attr": "href", "all": True},  every match, as a list
+#    "sku":   {"xpath": "//meta[@name='sku']/@content"}}  raw XPath (lxml only)
+#
+# Needs: pip install lxml (the "stream" backend needs nothing;
+#        beautifulsoup4 only for the comparison)
+#
+# Run the benchmark:
+#     python 36_html_extract.py
+#     python 36_html_extract.py --pages 2000 --links 400
+
+import argparse
+import re
+import time
+from html.parser import HTMLParser
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+except ImportError:
+    etree = None
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source",
+             "track", "wbr"}
+# Start tag → open tags it ends (only checked against the innermost open tag)
+IMPLIED_END = {"p": {"p"}, "li": {"li"}, "dt": {"dt", "dd"}, "dd": {"dt", "dd"}, "tr": {"tr", "td", "th"},
+               "td": {"td", "th"}, "th": {"td", "th"}, "option": {"option"},
+               **{tag: {"p"} for tag in ("div", "ul", "ol", "table", "section", "h1", "h2", "h3", "h4", "h5",
+                                         "h6", "form", "header", "footer", "aside", "blockquote", "pre")}}
+STEP_RE = re.compile(r"""
+    (?P<tag>[a-zA-Z][\w-]*|\*)?
+    (?P<rest>(?:\#[\w-]+|\.[\w-]+|\[[\w-]+(?:=["']?[^\]"']*["']?)?\])*)$
+""", re.VERBOSE)
+PART_RE = re.compile(r"""\#([\w-]+)|\.([\w-]+)|\[([\w-]+)(=["']?([^\]"']*)["']?)?\]""")
+
+
+def clean(text):
+    """Collapse whitespace like a browser shows the text."""
+    return " ".join(text.split())
+
+
+# ============================================================================
+# SELECTORS
+# ============================================================================
+
+class Step:
+    """One compound selector: tag#id.class[attr=value]."""
+
+    __slots__ = ("tag", "id", "classes", "attrs")
+
+    def __init__(self, text):
+        match = STEP_RE.match(text)
+        if not match:
+            raise ValueError(f"Unsupported selector part: {text!r}")
+        self.tag = (match["tag"] or "*").lower()
+        self.id, self.classes, self.attrs = None, set(), []
+        for id_, class_, attr, equals, value in PART_RE.findall(match["rest"]):
+            if id_:
+                self.id = id_
+            elif class_:
+                self.classes.add(class_)
+            else:
+                self.attrs.append((attr.lower(), value if equals else None))
+
+    def matches(self, tag, attrs):
+        if self.tag != "*" and self.tag != tag:
+            return False
+        if self.id is not None and attrs.get("id") != self.id:
+            return False
+        if self.classes and not self.classes <= set((attrs.get("class") or "").split()):
+            return False
+        return all(name in attrs and (value is None or attrs[name] == value) for name, value in self.attrs)
+
+    def xpath(self):
+        predicates = []
+        if self.id is not None:
+            predicates.append(f"@id='{self.id}'")
+        for name in sorted(self.classes):
+            predicates.append(f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')")
+        for name, value in self.attrs:
+            predicates.append(f"@{name}" if value is None else f"@{name}='{value}'")
+        return self.tag + "".join(f"[{p}]" for p in predicates)
+
+
+class Selector:
+    """"div.product > span.price" → steps plus the combinator in front of each step."""
+
+    def __init__(self, css):
+        self.css = css
+        tokens = css.replace(">", " > ").split()
+        self.steps, self.child = [], []  # child[i]: steps[i] must be a direct child of steps[i - 1]
+        direct = False
+        for token in tokens:
+            if token == ">":
+                direct = True
+                continue
+            self.steps.append(Step(token))
+            self.child.append(direct)
+            direct = False
+        if not self.steps or direct or self.child[0]:
+            raise ValueError(f"Unsupported selector: {css!r}")
+
+    @property
+    def last_tag(self):
+        return self.steps[-1].tag
+
+    def matches(self, stack, pos=None, i=None):
+        """stack: open elements as (tag, attrs); does stack[pos] match steps[:i + 1]?"""
+        pos = len(stack) - 1 if pos is None else pos
+        i = len(self.steps) - 1 if i is None else i
+        if not self.steps[i].matches(*stack[pos]):
+            return False
+        if i == 0:
+            return True
+        if self.child[i]:
+            return pos > 0 and self.matches(stack, pos - 1, i - 1)
+        return any(self.matches(stack, j, i - 1) for j in range(pos - 1, -1, -1))
+
+    def xpath(self):
+        return "//" + "".join(("/" if child else "//") * (i > 0) + step.xpath()
+                              for i, (step, child) in enumerate(zip(self.steps, self.child)))
+
+
+# ============================================================================
+# SPEC
+# ============================================================================
+
+class Field:
+    __slots__ = ("name", "selector", "xpath", "attr", "all", "type")
+
+    def __init__(self, name, spec):
+        if isinstance(spec, str):
+            spec = {"css": spec}
+        unknown = set(spec) - {"css", "xpath", "attr", "all", "type"}
+        if unknown or ("css" in spec) == ("xpath" in spec):
+            raise ValueError(f"Field {name!r}: needs exactly one of css/xpath, unknown keys {sorted(unknown)}")
+        self.name = name
+        self.selector = Selector(spec["css"]) if "css" in spec else None
+        self.xpath = spec.get("xpath")
+        self.attr = spec.get("attr")
+        self.all = spec.get("all", False)
+        self.type = spec.get("type")
+
+    def convert(self, value):
+        if value is None or self.type is None:
+            return value
+        try:
+            return self.type(value)
+        except ValueError:
+            return None
+
+    def result(self, values):
+        if self.all:
+            return [self.convert(value) for value in values]
+        return self.convert(values[0]) if values else None
+
+
+def compile_spec(spec, backend="auto"):
+    """spec dict → extractor with .extract(html) → {field: value}."""
+    if backend == "auto":
+        backend = "lxml" if etree is not None else "stream"
+    fields = [Field(name, field_spec) for name, field_spec in spec.items()]
+    if backend == "lxml":
+        return LxmlExtractor(fields)
+    if backend == "stream":
+        return StreamExtractor(fields)
+    raise ValueError(f"Unknown backend: {backend!r} (auto, lxml or stream)")
+
+
+# ============================================================================
+# BACKEND "lxml" - C PARSER + PRECOMPILED XPATH
+# ============================================================================
+
+class LxmlExtractor:
+    def __init__(self, fields):
+        if etree is None:
+            raise ImportError("lxml not installed - Install with: pip install lxml")
+        self.fields = []
+        for field in fields:
+            if field.xpath:
+                expression = field.xpath
+            else:
+                expression = field.selector.xpath() + (f"/@{field.attr}" if field.attr else "")
+                if not field.all:
+                    expression = f"({expression})[1]"
+            self.fields.append((field, etree.XPath(expression, smart_strings=False)))
+
+    def extract(self, html):
+        try:
+            root = lxml_html.fromstring(html)
+        except etree.ParserError:  # nothing but whitespace/comments: "Document is empty"
+            return {field.name: field.result([]) for field, _ in self.fields}
+        record = {}
+        for field, xpath in self.fields:
+            found = xpath(root)
+            if not isinstance(found, list):
+                found = [found]
+            values = [clean(item.text_content()) if hasattr(item, "text_content") else str(item) for item in found]
+            record[field.name] = field.result(values)
+        return record
+
+
+# ============================================================================
+# BACKEND "stream" - NO TREE, STOPS EARLY
+# ============================================================================
+
+class _StreamParser(HTMLParser):
+    def __init__(self, extractor):
+        super().__init__(convert_charrefs=True)
+        self.by_tag = extractor.by_tag
+        self.any_tag = extractor.any_tag
+        self.waiting = extractor.single_fields  # single-value fields not found yet
+        self.endless = extractor.has_all_fields
+        self.values = {field.name: [] for field in extractor.fields}
+        self.stack = []
+        self.captures = []  # [depth, field, text parts, slot in values] for matched elements still open
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.stack and self.stack[-1][0] in IMPLIED_END.get(tag, ()):
+            self.handle_endtag(self.stack[-1][0])  # <li>A<li>B: the second <li> ends the first
+        attrs = dict(attrs)
+        self.stack.append((tag, attrs))
+        for field in self.by_tag.get(tag, ()) + self.any_tag:
+            if not field.all and field.name not in self.waiting:
+                continue
+            if not field.selector.matches(self.stack):
+                continue
+            if field.attr:
+                if attrs.get(field.attr) is not None:
+                    self.found(field, attrs[field.attr])
+            else:
+                values = self.values[field.name]
+                values.append(None)  # keep document order: the slot is filled when the element ends
+                self.captures.append([len(self.stack), field, [], len(values) - 1])
+                if not field.all:
+                    self.waiting = self.waiting - {field.name}  # no second capture for the same field
+        if tag in VOID_TAGS:
+            self.finish(len(self.stack))
+            self.stack.pop()
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        # Unclosed tags are common: close everything down to the matching tag
+        for depth in range(len(self.stack), 0, -1):
+            if self.stack[depth - 1][0] == tag:
+                self.finish(depth)
+                del self.stack[depth - 1:]
+                return
+
+    def handle_data(self, data):
+        for capture in self.captures:
+            capture[2].append(data)
+
+    def finish(self, depth):
+        """Finish the captures of elements at `depth` or deeper."""
+        while self.captures and self.captures[-1][0] >= depth:
+            _, field, parts, slot = self.captures.pop()
+            self.found(field, clean("".join(parts)), slot)
+
+    def found(self, field, value, slot=None):
+        if slot is None:
+            self.values[field.name].append(value)
+        else:
+            self.values[field.name][slot] = value
+        if not field.all:
+            self.waiting = self.waiting - {field.name}
+        if not self.waiting and not self.captures and not self.endless:
+            self.done = True
+
+
+class StreamExtractor:
+    chunk_size = 4 * 1024  # small enough to stop early on typical pages
+
+    def __init__(self, fields):
+        if any(field.xpath for field in fields):
+            raise ValueError("xpath fields need the lxml backend")
+        self.fields = fields
+        self.by_tag, self.any_tag = {}, ()
+        for field in fields:
+            if field.selector.last_tag == "*":
+                self.any_tag += (field,)
+            else:
+                self.by_tag[field.selector.last_tag] = self.by_tag.get(field.selector.last_tag, ()) + (field,)
+        self.single_fields = frozenset(field.name for field in fields if not field.all)
+        self.has_all_fields = any(field.all for field in fields)
+
+    def extract(self, html):
+        parser = _StreamParser(self)
+        for start in range(0, len(html), self.chunk_size):
+            parser.feed(html[start:start + self.chunk_size])
+            if parser.done:
+                break
+        else:
+            parser.close()
+            parser.finish(1)  # text of elements that were never closed still counts
+        return {field.name: field.result(parser.values[field.name]) for field in self.fields}
+
+
+def parser_for(spec, links_field="links", backend="auto"):
+    """parse(url, html) → (record, links) for Crawler(parse=...) in 35_async_crawler.py."""
+    extractor = compile_spec(spec, backend)
+
+    def parse(url, html):
+        record = extractor.extract(html)
+        links = record.pop(links_field, None) or []
+        record["url"] = url
+        return record, links
+    return parse
+
+
+# ============================================================================
+# BENCHMARK - PAGES/SEC ON ONE CORE
+# ============================================================================
+
+PRODUCT_SPEC = {
+    "title": "h1",
+    "price": {"css": "div.product span.price", "type": float},
+    "stock": {"css": "div.product > p.stock"},
+    "links": {"css": "a", "attr": "href", "all": True},
+}
+
+
+def product_page(i, links=200, paragraphs=40):
+    """A shop page of typical size: navigation, product block, description, footer."""
+    nav = "".join(f'<li class="nav-item"><a href="/category/{c}">Category {c}</a></li>' for c in range(links // 2))
+    text = "".join(f"<p>Paragraph {p} of the description for product {i}, with <b>bold</b> words &amp; "
+                   f"entities.</p>" for p in range(paragraphs))
+    related = "".join(f'<a href="/product/{(i * 7 + k) % 100_000}">Related {k}</a>' for k in range(links // 2))
+    return (f'<!DOCTYPE html><html><head><title>Product {i} | Shop</title><meta charset="utf-8">'
+            f'<link rel="stylesheet" href="/s.css"></head><body><header><ul class="nav">{nav}</ul></header>'
+            f'<main><div class="product main" id="p{i}"><h1>  Product\n {i} </h1><img src="/img/{i}.jpg">'
+            f'<span class="price">{5 + (i * 37) % 500 + 0.99:.2f}</span><p class="stock">In stock</p>'
+            f'</div><section class="description">{text}</section><aside>{related}</aside></main>'
+            f'<footer><p>Imprint<br>Contact</p></footer></body></html>')
+
+
+def extract_bs4(html, features="html.parser"):
+    """The 08_web_scrape.py way: full BeautifulSoup tree, then search it."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, features)
+    h1 = soup.find("h1")
+    price = soup.select_one("div.product span.price")
+    stock = soup.select_one("div.product > p.stock")
+    return {"title": clean(h1.get_text()) if h1 else None,
+            "price": float(price.get_text()) if price else None,
+            "stock": clean(stock.get_text()) if stock else None,
+            "links": [a["href"] for a in soup.find_all("a") if a.get("href") is not None]}
+
+
+def pages_per_second(extract, pages):
+    start = time.perf_counter()
+    for html in pages:
+        extract(html)
+    return len(pages) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compiled HTML extraction vs BeautifulSoup")
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--links", type=int, default=200, help="links per page")
+    args = parser.parse_args()
+
+    pages = [product_page(i, args.links) for i in range(args.pages)]
+    print(f"{args.pages} product pages, {sum(map(len, pages)) / len(pages) / 1024:.0f} KB each, one core\n")
+
+    runs = {}
+    try:
+        import bs4  # noqa: F401
+        runs["BeautifulSoup(html.parser) - 08_web_scrape.py"] = extract_bs4
+        if etree is not None:
+            runs["BeautifulSoup(lxml)"] = lambda html: extract_bs4(html, "lxml")
+    except ImportError:
+        print("beautifulsoup4 not installed - comparison skipped (pip install beautifulsoup4)\n")
+    if etree is not None:
+        runs["compiled spec, lxml backend"] = compile_spec(PRODUCT_SPEC, "lxml").extract
+    else:
+        print("lxml not installed - lxml backend skipped (pip install lxml)\n")
+    runs["compiled spec, stream backend"] = compile_spec(PRODUCT_SPEC, "stream").extract
+    no_links = {name: spec for name, spec in PRODUCT_SPEC.items() if name != "links"}
+    runs["stream backend, no links (stops early)"] = compile_spec(no_links, "stream").extract
+
+    expected = extract_bs4(pages[0]) if "bs4" in globals() else compile_spec(PRODUCT_SPEC).extract(pages[0])
+    baseline = None
+    for name, extract in runs.items():
+        result = extract(pages[0])
+        same = all(result[key] == expected[key] for key in result)
+        rate = pages_per_second(extract, pages)
+        baseline = baseline or rate
+        print(f"{name:<48} {rate:>8,.0f} pages/s  {rate / baseline:>5.1f}x  same fields: {same}")
+
+    print(f"\nFirst page: { {key: value for key, value in expected.items() if key != 'links'} }, "
+          f"{len(expected['links'])} links")
@@ -0,0 +1,535 @@
+# ============================================================================
+# 37. HTTP CACHE - CONDITIONAL REQUESTS, 304 FROM DISK
+# ============================================================================
+# WHAT: An on-disk HTTP cache for requests.get() that follows the server's
+#       caching headers: ETag, Last-Modified, Cache-Control, Expires
+# WHY: The scraper in 08_web_scrape.py and the price check in 09_api_call.py
+#      download the full body on every run. An hourly monitoring job mostly
+#      gets back exactly what it got an hour ago
+# WHEN: Scheduled scrapes, API polling, price and news monitors
+#
+# How:
+# - Fresh entry (max-age / Expires not reached yet) → served from disk, no
+#   request at all
+# - Stale entry with a validator → conditional request: If-None-Match (ETag)
+#   and/or If-Modified-Since (Last-Modified). The server answers
+#   "304 Not Modified" with headers only; the body comes from disk and the
+#   entry's headers and age are updated (only the header line is rewritten)
+# - no-store responses are never stored (and drop the old entry), no-cache
+#   ones are always revalidated. A 4xx deletes the entry (after a 404 the old
+#   copy is wrong; 410 Gone is cacheable and stored instead); a 5xx or a
+#   network error leaves it alone. Without max-age/Expires the entry is fresh
+#   for 10% of the time since Last-Modified (at most a day), like browsers do
+# - Vary: the request headers the response depends on are stored with the
+#   entry; a request with other values is a miss
+# - One file per URL: a JSON header line + the body, written to a temp file
+#   and renamed into place. The header line is padded with spaces to a
+#   multiple of 512 bytes, so after a 304 it is overwritten in place and the
+#   body is not written again. LRU eviction by mtime (touched on every use),
+#   like 32_conversion_cache.py, once the folder grows past max_bytes - down
+#   to 90% of it, so the next stores fit without another scan of the folder
+#
+# Needs: pip install requests
+#
+# Run the demo (starts a local fixture server on 127.0.0.1):
+#     python 37_http_cache.py
+#     python 37_http_cache.py --products 2000 --runs 48
+
+import argparse
+import email.utils
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+CACHEABLE_STATUS = {200, 203, 300, 301, 410}
+STORED_HEADERS = ("ETag", "Last-Modified", "Cache-Control", "Expires", "Date", "Age", "Vary", "Content-Type")
+HEURISTIC_FRACTION = 0.1
+HEURISTIC_MAX = 24 * 3600
+EVICT_TO = 0.9  # eviction frees space down to this fraction of max_bytes
+META_LINE_BLOCK = 512  # header line padded to a multiple of this (room for changed headers after a 304)
+
+
+def cache_control(value):
+    """ "max-age=60, no-cache" → {"max-age": "60", "no-cache": None}"""
+    directives = {}
+    for part in (value or "").split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') if argument else None
+    return directives
+
+
+def http_date(value):
+    """Timestamp of an HTTP date header, None if missing or invalid."""
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp() if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def seconds(value):
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return None
+
+
+# ============================================================================
+# ENTRIES
+# ============================================================================
+
+class CachedResponse:
+    """The parts of a requests.Response that callers use, plus where it came from."""
+
+    def __init__(self, url, status_code, headers, content, source):
+        self.url = url
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict(headers) if requests else dict(headers)
+        self.content = content
+        self.source = source  # "fresh" (no request), "revalidated" (304), "downloaded"
+
+    @property
+    def from_cache(self):
+        return self.source != "downloaded"
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors="replace")
+
+    @property
+    def encoding(self):
+        _, _, charset = self.headers.get("Content-Type", "").partition("charset=")
+        return charset.split(";")[0].strip() or "utf-8"
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class Entry:
+    """One stored response: metadata (url, status, headers, stored_at, vary values) + body."""
+
+    def __init__(self, meta, body):
+        self.meta = meta
+        self.body = body
+
+    @property
+    def headers(self):
+        return self.meta["headers"]
+
+    def header(self, name):
+        return next((value for key, value in self.headers.items() if key.lower() == name.lower()), None)
+
+    def directives(self):
+        return cache_control(self.header("Cache-Control"))
+
+    def freshness_lifetime(self):
+        directives = self.directives()
+        if "no-cache" in directives:
+            return 0
+        if seconds(directives.get("max-age")) is not None:
+            return seconds(directives["max-age"])
+        date = http_date(self.header("Date")) or self.meta["stored_at"]
+        expires = self.header("Expires")
+        if expires is not None:
+            expires_at = http_date(expires)
+            return max(0, expires_at - date) if expires_at is not None else 0  # invalid Expires = expired
+        last_modified = http_date(self.header("Last-Modified"))
+        if last_modified is not None:
+            return min(HEURISTIC_MAX, max(0, (date - last_modified) * HEURISTIC_FRACTION))
+        return 0
+
+    def age(self, now):
+        return (seconds(self.header("Age")) or 0) + max(0, now - self.meta["stored_at"])
+
+    def is_fresh(self, now):
+        return self.age(now) < self.freshness_lifetime()
+
+    def validators(self):
+        """Headers for a conditional request."""
+        conditional = {}
+        if self.header("ETag"):
+            conditional["If-None-Match"] = self.header("ETag")
+        if self.header("Last-Modified"):
+            conditional["If-Modified-Since"] = self.header("Last-Modified")
+        return conditional
+
+    def matches(self, request_headers):
+        """Vary: were the request headers the same as for the stored response?"""
+        return self.meta.get("vary_values", {}) == vary_values(self.header("Vary"), request_headers)
+
+
+def vary_values(vary, request_headers):
+    lowered = {key.lower(): value for key, value in (request_headers or {}).items()}
+    return {name.strip().lower(): lowered.get(name.strip().lower()) for name in (vary or "").split(",") if name.strip()}
+
+
+def kept_headers(headers):
+    return {name: headers[name] for name in STORED_HEADERS if headers.get(name) is not None}
+
+
+def meta_line(meta, length=None):
+    """JSON header line, padded with spaces to length (default: next multiple of META_LINE_BLOCK)."""
+    line = json.dumps(meta).encode()
+    if length is None:
+        length = len(line) + 1 + (-(len(line) + 1) % META_LINE_BLOCK)
+    return line + b" " * (length - len(line) - 1) + b"\n"
+
+
+# ============================================================================
+# THE CACHE
+# ============================================================================
+
+class HttpCache:
+    """cache = HttpCache("~/.cache/http")
+       response = cache.get("https://shop.example/product/42")   # requests.get() with a cache
+       response.source → "fresh" | "revalidated" | "downloaded"
+    """
+
+    def __init__(self, folder, max_bytes=DEFAULT_MAX_BYTES, session=None, clock=time.time, timeout=30):
+        self.folder = Path(folder).expanduser()
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.session = session
+        self.clock = clock  # replaceable, so the demo can simulate hours passing
+        self.timeout = timeout
+        self.total_bytes = None  # known after the first scan, then kept up to date by write()
+        self.stats = {"fresh": 0, "revalidated": 0, "downloaded": 0, "not_stored": 0, "evicted": 0,
+                      "bytes_downloaded": 0, "bytes_from_cache": 0}
+
+    # --- public API ------------------------------------------------------------
+
+    def get(self, url, headers=None, refresh=False):
+        """GET through the cache; refresh=True revalidates even a fresh entry."""
+        entry = self.lookup(url, headers)
+        if entry is not None and not refresh and entry.is_fresh(self.clock()):
+            self.touch(url)
+            return self.served(url, entry, "fresh")
+        request_headers = dict(headers or {})
+        if entry is not None:
+            request_headers.update(entry.validators())
+        if self.session is None:
+            if requests is None:
+                raise ImportError("requests not installed - Install with: pip install requests")
+            self.session = requests.Session()  # keep-alive for all requests through this cache
+        response = self.session.get(url, headers=request_headers, timeout=self.timeout)
+        if response.status_code == 304 and entry is not None:
+            return self.served(url, self.revalidate(url, entry, response.headers), "revalidated")
+        self.stats["downloaded"] += 1
+        self.stats["bytes_downloaded"] += len(response.content)
+        self.store(url, headers, response.status_code, response.headers, response.content)
+        return CachedResponse(url, response.status_code, response.headers, response.content, "downloaded")
+
+    def lookup(self, url, request_headers=None):
+        """Stored entry for url (whatever its freshness), None on a miss."""
+        try:
+            with open(self.entry_path(url), "rb") as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+        except (FileNotFoundError, ValueError):
+            return None
+        entry = Entry(meta, body)
+        return entry if entry.matches(request_headers) else None
+
+    def store(self, url, request_headers, status, headers, body):
+        """Store a response if HTTP allows it; True if stored.
+
+        A response that is not stored removes the old entry only if it says
+        the old one is wrong: no-store, Vary: *, or a 4xx (404 - the page is
+        gone). A 5xx is a server hiccup: the last good copy is kept.
+        """
+        directives = cache_control(headers.get("Cache-Control"))
+        no_store = "no-store" in directives or (headers.get("Vary") or "").strip() == "*"
+        if status not in CACHEABLE_STATUS or no_store:
+            self.stats["not_stored"] += 1
+            if no_store or 400 <= status < 500:
+                self.delete(url)
+            return False
+        meta = {"url": url, "status": status, "headers": kept_headers(headers), "stored_at": self.clock(),
+                "vary_values": vary_values(headers.get("Vary"), request_headers)}
+        self.write(url, meta, body)
+        if self.total_bytes is None or self.total_bytes > self.max_bytes:
+            self.evict(keep=self.entry_path(url))
+        return True
+
+    def revalidate(self, url, entry, headers):
+        """304: keep the body, take the new headers (RFC 9111 4.3.4), restart the age."""
+        stored_at = entry.meta["stored_at"]
+        entry.meta["headers"].update(kept_headers(headers))
+        if "Age" not in headers:
+            entry.meta["headers"].pop("Age", None)
+        entry.meta["stored_at"] = self.clock()
+        if not self.write_meta(url, entry.meta, stored_at):
+            self.write(url, entry.meta, entry.body)
+        return entry
+
+    def served(self, url, entry, source):
+        self.stats[source] += 1
+        self.stats["bytes_from_cache"] += len(entry.body)
+        return CachedResponse(url, entry.meta["status"], entry.headers, entry.body, source)
+
+    # --- files -----------------------------------------------------------------
+
+    def entry_path(self, url):
+        return self.folder / f"{hashlib.sha256(url.encode()).hexdigest()[:32]}.http"
+
+    def write(self, url, meta, body):
+        path = self.entry_path(url)
+        try:
+            old_size = path.stat().st_size
+        except FileNotFoundError:
+            old_size = 0
+        handle, temp_name = tempfile.mkstemp(dir=self.folder, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as f:
+                f.write(meta_line(meta))
+                f.write(body)
+            os.replace(temp_name, path)
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+        if self.total_bytes is not None:
+            self.total_bytes += path.stat().st_size - old_size
+
+    def write_meta(self, url, meta, stored_at):
+        """Overwrite just the header line of the entry stored at stored_at.
+
+        False (caller writes the whole entry) if the new line does not fit
+        into the old one's space or the entry was replaced meanwhile. A reader
+        catching a half-written line sees invalid JSON, which is a miss.
+        """
+        try:
+            with open(self.entry_path(url), "r+b") as f:
+                old = f.readline()
+                try:
+                    if json.loads(old)["stored_at"] != stored_at:
+                        return False
+                except (ValueError, KeyError):
+                    return False
+                line = meta_line(meta, len(old))
+                if len(line) != len(old):
+                    return False
+                f.seek(0)
+                f.write(line)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def touch(self, url):
+        try:
+            os.utime(self.entry_path(url))  # mtime = last use, for LRU eviction
+        except OSError:
+            pass
+
+    def delete(self, url):
+        path = self.entry_path(url)
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return
+        if self.total_bytes is not None:
+            self.total_bytes -= size
+
+    # --- eviction --------------------------------------------------------------
+
+    def entries(self):
+        """[(last use, size, path)], least recently used first."""
+        found = []
+        for entry in self.folder.glob("*.http"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:  # evicted by another process meanwhile
+                continue
+            found.append((stat.st_mtime_ns, stat.st_size, entry))
+        return sorted(found)
+
+    def evict(self, keep=None):
+        """Delete least recently used entries once the folder is over max_bytes,
+        down to EVICT_TO x max_bytes."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TO if total > self.max_bytes else self.max_bytes
+        for _, size, entry in entries:
+            if total <= target:
+                break
+            if entry == keep:
+                continue
+            entry.unlink(missing_ok=True)
+            total -= size
+            self.stats["evicted"] += 1
+        self.total_bytes = total
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def clear(self):
+        for _, _, entry in self.entries():
+            entry.unlink(missing_ok=True)
+        self.total_bytes = 0
+
+
+# ============================================================================
+# LOCAL FIXTURE SERVER
+# ============================================================================
+# /product/<i>   shop page (~20 KB), ETag + Last-Modified, Cache-Control: no-cache
+# /api/price     JSON price feed, ETag, max-age=600
+# /api/catalog   big JSON, max-age=7200 (fresh for two hourly runs)
+# Every run, `change_rate` of the products get a new price. The server counts
+# the body bytes it sends, so both sides of the transfer can be compared.
+
+class FixtureShop:
+    def __init__(self, products, change_rate=0.05):
+        self.products = products
+        self.change_rate = change_rate
+        self.version = [0] * products
+        self.run = 0
+        self.sent = {"requests": 0, "304": 0, "body_bytes": 0}
+        self.lock = threading.Lock()
+
+    def next_run(self):
+        """An hour passes: some prices change."""
+        self.run += 1
+        step = max(1, round(1 / self.change_rate)) if self.change_rate else 0
+        for i in range(self.run % step if step else self.products, self.products, step or 1):
+            self.version[i] = self.run
+
+    def product(self, i):
+        price = 5 + (i * 37 + self.version[i] * 11) % 500 + 0.99
+        filler = "".join(f"<p>Feature {k} of product {i}: long description text.</p>" for k in range(300))
+        return f"<html><h1>Product {i}</h1><span class='price'>{price:.2f}</span>{filler}</html>".encode()
+
+    def handler(shop):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # headers and body are separate writes
+
+            def do_GET(self):
+                if self.path.startswith("/product/"):
+                    i = int(self.path.rsplit("/", 1)[1])
+                    body, version = shop.product(i), shop.version[i]
+                    headers = {"Cache-Control": "no-cache", "Content-Type": "text/html; charset=utf-8"}
+                elif self.path == "/api/price":
+                    version = shop.run
+                    body = json.dumps({"BTC": {"USD": 60_000 + shop.run}}).encode()
+                    headers = {"Cache-Control": "max-age=600", "Content-Type": "application/json"}
+                elif self.path == "/api/catalog":
+                    version = 0
+                    body = json.dumps([{"id": i, "name": f"Product {i}"} for i in range(shop.products)]).encode()
+                    headers = {"Cache-Control": "max-age=7200", "Content-Type": "application/json"}
+                else:
+                    self.send_error(404)
+                    return
+                etag = f'"{hashlib.md5(body).hexdigest()}"'
+                headers["ETag"] = etag
+                headers["Last-Modified"] = email.utils.formatdate(1_700_000_000 + version * 3600, usegmt=True)
+                with shop.lock:
+                    shop.sent["requests"] += 1
+                if self.headers.get("If-None-Match") == etag:
+                    with shop.lock:
+                        shop.sent["304"] += 1
+                    self.send_response(304)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    return
+                with shop.lock:
+                    shop.sent["body_bytes"] += len(body)
+                self.send_response(200)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def start_server(shop):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), shop.handler())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ============================================================================
+# DEMO - HOURLY MONITORING RUNS
+# ============================================================================
+
+class FakeClock:
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self):
+        return self.now
+
+
+def monitoring_run(get, base, products):
+    for i in range(products):
+        get(f"{base}/product/{i}")
+    get(f"{base}/api/price").json()
+    get(f"{base}/api/catalog")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP conditional-request cache against a local fixture shop")
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=24, help="hourly monitoring runs")
+    parser.add_argument("--change-rate", type=float, default=0.05, help="share of products changing per run")
+    args = parser.parse_args()
+
+    if requests is None:
+        print("requests not installed")
+        print("Install with: pip install requests")
+        raise SystemExit
+
+    results = {}
+    for label, cached in (("requests.get() every run", False), ("HttpCache", True)):
+        shop = FixtureShop(args.products, args.change_rate)
+        server = start_server(shop)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        clock = FakeClock()
+        with tempfile.TemporaryDirectory() as folder:
+            cache = HttpCache(folder, clock=clock) if cached else None
+            session = requests.Session()
+            get = cache.get if cached else session.get
+            start = time.perf_counter()
+            for run in range(args.runs):
+                monitoring_run(get, base, args.products)
+                shop.next_run()
+                clock.now += 3600
+            results[label] = (time.perf_counter() - start, dict(shop.sent), cache and dict(cache.stats))
+        server.shutdown()
+
+    print(f"{args.runs} hourly runs, {args.products} product pages + 2 API calls, "
+          f"{args.change_rate:.0%} of the prices change per hour\n")
+    for label, (elapsed, sent, stats) in results.items():
+        print(f"{label:<26} {sent['requests']:>7,} requests  {sent['304']:>7,} x 304  "
+              f"{sent['body_bytes'] / 1e6:>8.1f} MB bodies  {elapsed:.1f}s")
+    plain, cached = (sent["body_bytes"] for _, sent, _ in results.values())
+    stats = results["HttpCache"][2]
+    print(f"\nHttpCache: {plain / max(1, cached):.0f}x fewer body bytes - fresh from disk: {stats['fresh']:,}, "
+          f"revalidated (304): {stats['revalidated']:,}, downloaded: {stats['downloaded']:,}")
+
+    with tempfile.TemporaryDirectory() as folder:
+        shop = FixtureShop(args.products)
+        server = start_server(shop)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        cache = HttpCache(folder, max_bytes=2 * 1024 ** 2)
+        for i in range(args.products):
+            cache.get(f"{base}/product/{i}")
+        server.shutdown()
+        print(f"\nLRU: max 2 MB, {args.products} pages stored → {len(cache.entries())} kept, "
+              f"{cache.stats['evicted']} evicted, {cache.size() / 1e6:.1f} MB on disk")
@@ -0,0 +1,327 @@
+# ============================================================================
+# 38. CHANGE DETECTION - FINGERPRINTS INSTEAD OF RE-COMPARING PAGES
+# ============================================================================
+# WHAT: Remember a small fingerprint per URL and report only what changed:
+#       "price 19.99 → 17.49", "article text rewritten", "new page"
+# WHY: The Price Monitor Bot and News Aggregator ideas in 08_web_scrape.py
+#      re-parse every page on every poll and compare it with the last copy.
+#      With 100k URLs that is a lot of CPU - and every rotating ad or
+#      "updated 3 minutes ago" line becomes an alert
+# WHEN: Monitors that poll many pages and should only wake up downstream
+#       work (alerts, database writes, emails) when something changed
+#
+# How, cheapest check first:
+# 1. Page hash: a 64-bit BLAKE2b of the raw HTML. Same page as last time →
+#    done, not even parsed
+# 2. Otherwise the fields are extracted (e.g. a spec from 36_html_extract.py)
+#    and fingerprinted: exact fields (price, title, stock) together as one
+#    64-bit hash; text fields (article body) as a 64-bit simhash of word
+#    shingles (only computed if the text itself changed). Similar texts have
+#    simhashes a few bits apart, so a changed timestamp or ad line stays
+#    below `text_threshold` and is not a change. The simhash is compared with
+#    the one from the last reported change, not the last poll, so many small
+#    edits add up until they are reported
+# 3. Only if a fingerprint differs are the stored values loaded and a diff
+#    emitted: {"price": (19.99, 17.49)} or {"body": "text changed (23 bits)"}
+#
+# Storage: one SQLite row per URL (WAL, one transaction per batch) with the
+# fingerprints and the values of the exact fields - a few hundred bytes per
+# URL, so 100k URLs are a few tens of MB.
+# Together with 37_http_cache.py: a response that came from the cache
+# (response.from_cache) is the same page - skip it before step 1.
+#
+# Run the demo:
+#     python 38_change_detection.py
+#     python 38_change_detection.py --urls 100000
+
+import argparse
+import hashlib
+import importlib
+import json
+import random
+import re
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+# Module names starting with a digit cannot be imported with "import ..."
+extraction = importlib.import_module("36_html_extract")
+
+WORD_RE = re.compile(r"\w+")
+SHINGLE_WORDS = 3
+DEFAULT_TEXT_THRESHOLD = 16  # bits of 64; measured on 300-word articles: ad/timestamp noise 0-12, rewrites 21+
+BATCH_SIZE = 500
+
+
+def hash64(data):
+    """Signed 64-bit BLAKE2b - fits into an SQLite INTEGER."""
+    if isinstance(data, str):
+        data = data.encode()
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big", signed=True)
+
+
+def simhash(text):
+    """64-bit simhash of the word 3-shingles of text (Charikar)."""
+    words = WORD_RE.findall(text.lower())
+    shingles = [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))]
+    blake2b = hashlib.blake2b
+    digests = b"".join([blake2b(shingle.encode(), digest_size=8).digest() for shingle in shingles])
+    # All hashes as one long bit string: bits[i::64] is bit i of every shingle
+    # hash, so counting the 1-bits per position is 64 C calls, not a 64 x n loop
+    bits = format(int.from_bytes(digests, "big"), f"0{len(digests) * 8}b")
+    half = len(shingles) / 2
+    value = 0
+    for i in range(64):
+        value = (value << 1) | (bits[i::64].count("1") > half)
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def distance(a, b):
+    return ((a ^ b) & 0xFFFF_FFFF_FFFF_FFFF).bit_count()
+
+
+# ============================================================================
+# THE DETECTOR
+# ============================================================================
+
+class ChangeDetector:
+    """detector = ChangeDetector("monitor.db", extract=compile_spec(SPEC).extract, text_fields={"body"})
+       for change in detector.check_batch(pages):     # pages: [(url, html), ...]
+           alert(change)                               # only new or changed pages
+    """
+
+    def __init__(self, path, extract, text_fields=(), ignore=(), text_threshold=DEFAULT_TEXT_THRESHOLD):
+        self.path = Path(path)
+        self.extract = extract
+        self.text_fields = set(text_fields)
+        self.ignore = set(ignore)   # fields that never count as a change (e.g. "updated at")
+        self.text_threshold = text_threshold
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS pages (
+            url TEXT PRIMARY KEY, page_hash INTEGER, fields_hash INTEGER, text_hashes TEXT, field_values TEXT,
+            checked_at REAL, changed_at REAL)""")
+        self.stats = {"same_page": 0, "parsed": 0, "same_fields": 0, "text_noise": 0, "new": 0, "changed": 0}
+
+    def check(self, url, html):
+        """Change dict for one page, or None if nothing meaningful changed."""
+        changes = self.check_batch([(url, html)])
+        return changes[0] if changes else None
+
+    def check_batch(self, pages):
+        """[(url, html)] → [change dicts]; fingerprints are saved in one transaction."""
+        changes = []
+        for start in range(0, len(pages), BATCH_SIZE):
+            changes.extend(self._check(pages[start:start + BATCH_SIZE]))
+        return changes
+
+    def _check(self, pages):
+        now = time.time()
+        stored = self.load([url for url, _ in pages])
+        touched, updates, changes = [], [], []
+        for url, html in pages:
+            page_hash = hash64(html)
+            old = stored.get(url)
+            if old is not None and old[0] == page_hash:
+                self.stats["same_page"] += 1
+                touched.append((now, url))
+                continue
+            self.stats["parsed"] += 1
+            record = self.extract(html)
+            values = json.loads(json.dumps({name: value for name, value in record.items()
+                                            if name not in self.text_fields and name not in self.ignore},
+                                           default=str))  # exactly what a later poll reads back
+            fields_hash = hash64(json.dumps(values, sort_keys=True))
+            texts, text = self.compare_texts(record, json.loads(old[2]) if old else {})
+            change = self.compare(url, old, fields_hash, texts, text, values)
+            changed_at = now if change else (old[5] if old else now)
+            updates.append((url, page_hash, fields_hash, json.dumps(texts), json.dumps(values), now, changed_at))
+            if change:
+                changes.append(change)
+        with self.conn:
+            self.conn.executemany("UPDATE pages SET checked_at = ? WHERE url = ?", touched)
+            self.conn.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)", updates)
+        return changes
+
+    def compare_texts(self, record, old_texts):
+        """({field: [hash of the exact text, baseline simhash]}, {field: change message}).
+
+        The baseline is the simhash of the last reported change: noise only
+        updates the exact hash, so edit after edit drifts away from the
+        baseline until it crosses text_threshold. A field without an old entry
+        (new page, or a text field added to the monitor) starts its baseline
+        here and is not a change.
+        """
+        texts, changes = {}, {}
+        for name in sorted(self.text_fields):
+            text = record.get(name) or ""
+            text_hash = hash64(text)
+            old = old_texts.get(name)
+            if old is None:
+                texts[name] = [text_hash, simhash(text)]
+            elif old[0] == text_hash:  # same text, no simhash needed
+                texts[name] = old
+            elif (bits := distance(value := simhash(text), old[1])) > self.text_threshold:
+                texts[name] = [text_hash, value]
+                changes[name] = f"text changed ({bits} bits)"
+            else:
+                texts[name] = [text_hash, old[1]]
+        return texts, changes
+
+    def compare(self, url, old, fields_hash, texts, text, values):
+        if old is None:
+            self.stats["new"] += 1
+            return {"url": url, "kind": "new", "fields": values}
+        _, old_fields_hash, old_texts, old_values, _, _ = old
+        if old_fields_hash == fields_hash:
+            self.stats["same_fields"] += 1
+            if not text:
+                if texts != json.loads(old_texts):
+                    self.stats["text_noise"] += 1
+                return None
+            fields = {}
+        else:  # only now are the stored values needed
+            old_values = json.loads(old_values)
+            fields = {name: (old_values.get(name), value) for name, value in values.items()
+                      if old_values.get(name) != value}
+            fields.update({name: (value, None) for name, value in old_values.items() if name not in values})
+        self.stats["changed"] += 1
+        return {"url": url, "kind": "changed", "fields": {**fields, **text}}
+
+    def load(self, urls):
+        """url → (page_hash, fields_hash, text_hashes, field_values, checked_at, changed_at) for known URLs."""
+        marks = ", ".join("?" * len(urls))
+        rows = self.conn.execute(f"SELECT * FROM pages WHERE url IN ({marks})", urls)
+        return {row[0]: row[1:] for row in rows}
+
+    def not_checked_since(self, timestamp):
+        """URLs that were not in any batch since timestamp (gone from the site?)."""
+        return [url for (url,) in self.conn.execute("SELECT url FROM pages WHERE checked_at < ?", (timestamp,))]
+
+    def forget(self, urls):
+        with self.conn:
+            self.conn.executemany("DELETE FROM pages WHERE url = ?", ((url,) for url in urls))
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+# ============================================================================
+# DEMO - A PRICE MONITOR AND A NEWS MONITOR, TWO POLLS
+# ============================================================================
+
+MONITOR_SPEC = {
+    "title": "h1",
+    "price": {"css": "span.price", "type": float},
+    "stock": "p.stock",
+    "body": "div.article",
+}
+
+ARTICLE_WORDS = ("market prices energy city council report growth quarter company shares vote plan school "
+                 "rail budget weather season team results study health data water tax").split()
+
+
+def product_page(i, version):
+    price = 5 + (i * 37 + version * 11) % 500 + 0.99
+    return (f"<html><body><h1>Product {i}</h1><span class='price'>{price:.2f}</span>"
+            f"<p class='stock'>In stock</p><div class='article'>Solid product number {i} for everyday use."
+            f"</div></body></html>")
+
+
+def article(i, version):
+    rng = random.Random(i * 1000 + version)
+    return " ".join(rng.choice(ARTICLE_WORDS) for _ in range(300))
+
+
+def news_page(i, poll, rewritten):
+    """Every poll changes the ad and the page timestamp; live tickers (every 10th) also say "updated X minutes
+    ago" inside the article. Some articles get rewritten."""
+    text = article(i, 1 if rewritten else 0)
+    if i % 10 == 1:
+        text += f" Updated {poll * 7 % 60} minutes ago."
+    return (f"<html><body><h1>Headline {i}</h1><div class='article'>{text}</div><aside>Advertisement "
+            f"{poll * 31 + i}</aside><footer>Generated {time.time():.0f}</footer></body></html>")
+
+
+def poll(urls, poll_number, changed_prices, rewritten):
+    pages = []
+    for i in range(urls):
+        if i % 2 == 0:
+            pages.append((f"https://shop.example/p/{i}", product_page(i, int(i in changed_prices and poll_number))))
+        else:
+            pages.append((f"https://news.example/a/{i}", news_page(i, poll_number, poll_number and i in rewritten)))
+    return pages
+
+
+def naive_monitor(pages, previous):
+    """The 08_web_scrape.py way: parse every page with BeautifulSoup, compare with the last copy."""
+    from bs4 import BeautifulSoup
+
+    alerts = 0
+    for url, html in pages:
+        soup = BeautifulSoup(html, "html.parser")
+        price, body = soup.find("span", class_="price"), soup.find("div", class_="article")
+        record = (soup.h1.get_text(), price and price.get_text(), body and body.get_text())
+        alerts += url in previous and previous[url] != record
+        previous[url] = record
+    return alerts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Change detection with per-URL fingerprints")
+    parser.add_argument("--urls", type=int, default=20_000, help="half product pages, half news articles")
+    parser.add_argument("--change-rate", type=float, default=0.02, help="share of prices/articles that change")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    changed_prices = set(rng.sample(range(0, args.urls, 2), int(args.urls / 2 * args.change_rate)))
+    rewritten = set(rng.sample(range(1, args.urls, 2), int(args.urls / 2 * args.change_rate)))
+    polls = [poll(args.urls, number, changed_prices, rewritten) for number in range(2)]
+    print(f"{args.urls:,} URLs (half product pages, half news pages with a new ad + timestamp every poll), "
+          f"second poll: {len(changed_prices)} new prices, {len(rewritten)} rewritten articles\n")
+
+    try:
+        previous = {}
+        naive_monitor(polls[0], previous)
+        start = time.perf_counter()
+        alerts = naive_monitor(polls[1], previous)
+        print(f"1. BeautifulSoup + compare everything: {time.perf_counter() - start:6.2f}s, {alerts:,} alerts")
+    except ImportError:
+        print("1. beautifulsoup4 not installed - comparison skipped (pip install beautifulsoup4)")
+
+    with tempfile.TemporaryDirectory() as folder:
+        detector = ChangeDetector(Path(folder) / "monitor.db", extraction.compile_spec(MONITOR_SPEC).extract,
+                                  text_fields={"body"})
+        start = time.perf_counter()
+        detector.check_batch(polls[0])
+        detector.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")  # everything into monitor.db for the size
+        print(f"2. ChangeDetector, first poll (all new): {time.perf_counter() - start:6.2f}s, "
+              f"{Path(folder, 'monitor.db').stat().st_size / len(detector) / 1024:.1f} KB per URL")
+
+        detector.stats = dict.fromkeys(detector.stats, 0)
+        start = time.perf_counter()
+        changes = detector.check_batch(polls[1])
+        stats = detector.stats
+        print(f"   second poll:                       {time.perf_counter() - start:6.2f}s, {len(changes):,} changes")
+        print(f"   same page (not parsed): {stats['same_page']:,}, parsed: {stats['parsed']:,}, "
+              f"only noise in the text: {stats['text_noise']:,}")
+        found_prices = {c["url"] for c in changes if "price" in c["fields"]}
+        found_texts = {c["url"] for c in changes if "body" in c["fields"]}
+        print(f"   found {len(found_prices)}/{len(changed_prices)} price changes, "
+              f"{len(found_texts)}/{len(rewritten)} rewritten articles")
+        for field in ("price", "body"):
+            change = next(c for c in changes if field in c["fields"])
+            print(f"   {change['url']}: {change['fields']}")
+
+        edited = article(1, 0).split()
+        edited[100:103] = ["unexpected", "storm", "warning"]
+        bits = distance(simhash(article(1, 0)), simhash(" ".join(edited)))
+        print(f"\nSimhash distance: 3 words replaced → {bits} bits, "
+              f"rewritten article → {distance(simhash(article(1, 0)), simhash(article(1, 1)))} bits "
+              f"(threshold {detector.text_threshold})")
+        detector.close()
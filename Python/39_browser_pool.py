@@ -0,0 +1,454 @@
+# ============================================================================
+# 39. BROWSER POOL - WARM SELENIUM SESSIONS, PLAIN HTTP WHEN POSSIBLE
+# ============================================================================
+# WHAT: A pool of headless browsers that stay open between jobs, plus a
+#       fetcher that only uses them for pages that need JavaScript
+# WHY: The Selenium example in 08_web_scrape.py starts webdriver.Chrome()
+#      for every job and quits at the end - seconds of browser startup per
+#      page, plus every image and font downloaded for nothing
+# WHEN: Scrape jobs with JavaScript-rendered pages (shops, dashboards, SPAs)
+#       mixed with ordinary server-rendered pages
+#
+# How:
+# - BrowserPool starts `size` browsers in parallel and keeps them warm.
+#   pool.session() hands one out to a job (like a connection pool) and takes
+#   it back afterwards; cookies are cleared between jobs
+# - A WebDriver session runs one command at a time, so the unit handed to
+#   concurrent jobs is a whole session (one tab each); more parallel jobs =
+#   a bigger pool, not more tabs in one browser
+# - Images, fonts and media are blocked (Chrome: images off in the profile,
+#   Network.setBlockedURLs for the rest) and pages load "eager": the job
+#   continues at DOMContentLoaded instead of waiting for every resource
+# - A browser is recycled after `recycle_after` pages (memory grows in long
+#   sessions) and replaced at once when it crashed. A job that fails on the
+#   page (timeout, missing element) gives the browser back; only a lost
+#   session or a browser that no longer answers is thrown away
+# - SmartFetcher tries requests.get() first. Only if the fields a job needs
+#   are missing (checked with a spec from 36_html_extract.py), or the page
+#   is an empty JavaScript app shell, does it go to the pool. Site sections
+#   (host + first path segment) that needed the browser twice go there
+#   directly; the pool itself is only started when the first page needs it.
+#   A 404 or 500 raises requests.HTTPError - the browser would only render
+#   the same error page
+#
+# Needs: pip install selenium requests, plus Chrome (Selenium Manager finds
+#        or downloads the matching driver)
+#
+# Run the demo (serves a local static site on 127.0.0.1):
+#     python 39_browser_pool.py
+#     python 39_browser_pool.py --pages 200 --pool 4
+
+import argparse
+import importlib
+import queue
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+try:
+    from selenium import webdriver
+    from selenium.common.exceptions import InvalidSessionIdException, WebDriverException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+except ImportError:
+    webdriver = None
+    WebDriverException = InvalidSessionIdException = Exception
+
+# Module names starting with a digit cannot be imported with "import ..."
+extraction = importlib.import_module("36_html_extract")
+
+BLOCKED_URLS = ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico", "*.woff", "*.woff2",
+                "*.ttf", "*.otf", "*.eot", "*.mp4", "*.webm", "*.mp3"]
+SCRIPT_RE = re.compile(r"<script\b", re.IGNORECASE)
+TAG_RE = re.compile(r"<script\b.*?</script>|<style\b.*?</style>|<[^>]+>", re.IGNORECASE | re.DOTALL)
+APP_SHELL_TEXT = 200   # visible characters below which a page full of <script> is an empty app shell
+
+
+def chrome_driver(headless=True, block_assets=True, extra_args=()):
+    """Default driver factory: headless Chrome with images/fonts/media blocked."""
+    if webdriver is None:
+        raise ImportError("selenium not installed - Install with: pip install selenium")
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument("--headless=new")
+    options.add_argument("--window-size=1280,1024")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--disable-extensions")
+    for arg in extra_args:   # e.g. "--no-sandbox" inside containers
+        options.add_argument(arg)
+    options.page_load_strategy = "eager"
+    if block_assets:
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    driver = webdriver.Chrome(options=options)
+    if block_assets:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URLS})
+    return driver
+
+
+# ============================================================================
+# THE POOL
+# ============================================================================
+
+class Worker:
+    """One warm browser and how many pages it has served."""
+
+    def __init__(self, driver, number):
+        self.driver = driver
+        self.number = number
+        self.pages = 0
+
+
+class BrowserPool:
+    """pool = BrowserPool(size=4)
+       with pool.session() as driver:      # a warm browser, only for this job
+           driver.get(url)
+       pool.close()
+    """
+
+    def __init__(self, size=4, recycle_after=200, driver_factory=chrome_driver, timeout=30):
+        self.size = size
+        self.recycle_after = recycle_after
+        self.driver_factory = driver_factory
+        self.timeout = timeout
+        self.idle = queue.Queue()
+        self.lock = threading.Lock()
+        self.started = 0
+        self.closed = False
+        self.stats = Counter()
+        with ThreadPoolExecutor(size) as executor:  # browsers start in parallel
+            starting = [executor.submit(self.new_worker) for _ in range(size)]
+        started = [future.result() for future in starting if future.exception() is None]
+        if len(started) < size:  # quit the ones that did start: no orphaned Chrome processes
+            for worker in started:
+                self.quit(worker)
+            raise next(future.exception() for future in starting if future.exception() is not None)
+        for worker in started:
+            self.idle.put(worker)
+
+    def new_worker(self):
+        start = time.perf_counter()
+        driver = self.driver_factory()
+        driver.set_page_load_timeout(self.timeout)
+        with self.lock:
+            self.started += 1
+            number = self.started
+            self.stats["startup_seconds"] += time.perf_counter() - start
+        return Worker(driver, number)
+
+    @contextmanager
+    def session(self):
+        """Lease a warm browser for one job; waits while all are busy."""
+        if self.closed:
+            raise RuntimeError("BrowserPool is closed")
+        worker = self.idle.get()
+        if worker is None:  # its browser could not be replaced earlier: try again now
+            try:
+                worker = self.new_worker()
+            except Exception:
+                self.idle.put(None)
+                raise
+        broken = False
+        try:
+            yield worker.driver
+        except InvalidSessionIdException:
+            broken = True  # session gone: never hand it out again
+            raise
+        # any other error (e.g. a TimeoutException in wait_for) is the job's;
+        # release() finds out whether the browser still answers
+        finally:
+            worker.pages += 1
+            self.stats["pages"] += 1
+            self.release(worker, broken)
+
+    def release(self, worker, broken=False):
+        if not broken and worker.pages < self.recycle_after and not self.closed:
+            try:
+                self.reset(worker.driver)
+                self.idle.put(worker)
+                return
+            except Exception:  # WebDriverException, or no connection to a dead driver process
+                broken = True
+        self.stats["crashed" if broken else "recycled"] += 1
+        self.quit(worker)
+        if not self.closed:  # the replacement starts in the background, jobs keep using the others
+            threading.Thread(target=self.replace, daemon=True).start()
+
+    def replace(self):
+        try:
+            worker = self.new_worker()
+            if self.closed:  # close() ran while this browser was starting
+                self.quit(worker)
+                return
+            self.idle.put(worker)
+        except Exception:
+            self.stats["start_failed"] += 1
+            self.idle.put(None)
+
+    @staticmethod
+    def reset(driver):
+        """Forget the previous job's cookies (all domains where the browser supports it)."""
+        try:
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        except (AttributeError, WebDriverException):
+            driver.delete_all_cookies()
+
+    @staticmethod
+    def quit(worker):
+        try:
+            worker.driver.quit()
+        except Exception:  # already dead
+            pass
+
+    def fetch(self, url, wait_for=None):
+        """page_source after JavaScript ran; wait_for: CSS selector that must appear first."""
+        with self.session() as driver:
+            driver.get(url)
+            if wait_for:
+                WebDriverWait(driver, self.timeout).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, wait_for)))
+            return driver.page_source
+
+    def close(self):
+        self.closed = True
+        while True:
+            try:
+                worker = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                self.quit(worker)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ============================================================================
+# PLAIN HTTP FIRST, BROWSER ONLY WHEN NEEDED
+# ============================================================================
+
+def site_section(url):
+    """"https://shop.example/app/42" → "shop.example/app": pages that are usually rendered the same way."""
+    parts = urlsplit(url)
+    return f"{parts.netloc}/{parts.path.lstrip('/').split('/')[0]}"
+
+
+def looks_like_app_shell(html):
+    """Scripts but (almost) no visible text: the content is rendered by JavaScript."""
+    return bool(SCRIPT_RE.search(html)) and len(" ".join(TAG_RE.sub(" ", html).split())) < APP_SHELL_TEXT
+
+
+class SmartFetcher:
+    """fetcher = SmartFetcher(spec={"price": "span.price"}, pool_size=4)
+       html, via = fetcher.fetch(url)      # via: "http" or "browser"
+    """
+
+    def __init__(self, spec=None, required=None, pool_size=4, recycle_after=200, driver_factory=chrome_driver,
+                 session=None, timeout=30, learn_after=2):
+        self.extractor = extraction.compile_spec(spec) if spec else None
+        self.required = list(required if required is not None else (spec or {}))
+        self.wait_for = None
+        if spec and self.required:
+            field = spec[self.required[0]]
+            self.wait_for = field if isinstance(field, str) else field.get("css")
+        self.pool_options = dict(size=pool_size, recycle_after=recycle_after, driver_factory=driver_factory,
+                                 timeout=timeout)
+        self.pool = None
+        self.pool_lock = threading.Lock()
+        self.session = session
+        self.timeout = timeout
+        self.learn_after = learn_after
+        self.js_sections = Counter()   # site_section() → pages that needed the browser
+        self.stats = Counter()
+
+    def needs_browser(self, html):
+        if self.extractor is not None:
+            record = self.extractor.extract(html)
+            return any(record.get(name) in (None, "", []) for name in self.required)
+        return looks_like_app_shell(html)
+
+    def fetch(self, url):
+        """(html, "http" | "browser"); requests.HTTPError for a non-2xx response."""
+        section = site_section(url)
+        if self.js_sections[section] < self.learn_after:
+            if self.session is None:
+                if requests is None:
+                    raise ImportError("requests not installed - Install with: pip install requests")
+                self.session = requests.Session()
+            response = self.session.get(url, timeout=self.timeout)
+            if not 200 <= response.status_code < 300:  # not a page that lacks JavaScript
+                self.stats["http_error"] += 1
+                raise requests.HTTPError(f"{response.status_code} {response.reason} for url: {url}",
+                                         response=response)
+            if not self.needs_browser(response.text):
+                self.stats["http"] += 1
+                return response.text, "http"
+            self.js_sections[section] += 1
+        self.stats["browser"] += 1
+        return self.browser().fetch(url, self.wait_for), "browser"
+
+    def browser(self):
+        with self.pool_lock:  # the first page that needs it starts the pool, the others wait
+            if self.pool is None:
+                self.pool = BrowserPool(**self.pool_options)
+            return self.pool
+
+    def fetch_many(self, urls, workers=None):
+        """[(url, html, via)] in input order; as many parallel jobs as browsers by default.
+
+        An error in any job (e.g. requests.HTTPError for a 404) is raised for the whole batch.
+        """
+        workers = workers or self.pool_options["size"]
+        with ThreadPoolExecutor(workers) as executor:
+            return list(executor.map(lambda url: (url, *self.fetch(url)), urls))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+
+
+# ============================================================================
+# LOCAL STATIC SITE
+# ============================================================================
+# /static/<i>.html   server-rendered product page (title + price in the HTML)
+# /app/<i>.html      app shell: <div id="app"> is filled by app.js
+# Both reference a product image and a web font. The server counts requests
+# per file type, so blocked assets show up as missing image/font requests.
+
+APP_JS = """
+const id = location.pathname.match(/(\\d+)/)[1];
+document.getElementById("app").innerHTML =
+  `<h1>Product ${id}</h1><span class="price">${(5 + (id * 37) % 500 + 0.99).toFixed(2)}</span>`;
+"""
+
+PAGE_HEAD = ('<html><head><title>Shop</title><style>@font-face {font-family: Shop; src: url("/fonts/shop.woff2")}'
+             ' body {font-family: Shop}</style></head><body>')
+
+SITE_SPEC = {"title": "h1", "price": {"css": "span.price", "type": float}}
+
+
+def write_site(root, pages):
+    root = Path(root)
+    for folder in ("static", "app", "img", "fonts"):
+        (root / folder).mkdir(parents=True, exist_ok=True)
+    (root / "app.js").write_text(APP_JS)
+    (root / "fonts" / "shop.woff2").write_bytes(b"\0" * 40_000)
+    for i in range(pages):
+        (root / "img" / f"{i}.jpg").write_bytes(b"\xff\xd8" + b"\0" * 150_000)
+        image = f'<img src="/img/{i}.jpg">'
+        (root / "static" / f"{i}.html").write_text(
+            f'{PAGE_HEAD}<h1>Product {i}</h1><span class="price">{5 + (i * 37) % 500 + 0.99:.2f}</span>'
+            f'{image}</body></html>')
+        (root / "app" / f"{i}.html").write_text(f'{PAGE_HEAD}<div id="app"></div>{image}'
+                                                f'<script src="/app.js"></script></body></html>')
+
+
+def serve_site(root):
+    served = Counter()
+
+    class Handler(SimpleHTTPRequestHandler):
+        def do_GET(self):
+            served[Path(urlsplit(self.path).path).suffix or "/"] += 1
+            super().do_GET()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(Handler, directory=str(root)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, served
+
+
+# ============================================================================
+# DEMO
+# ============================================================================
+
+def new_browser_per_job(url, extra_args=()):
+    """The 08_web_scrape.py way: start Chrome, load the page, quit."""
+    driver = chrome_driver(block_assets=False, extra_args=extra_args)
+    try:
+        driver.get(url)
+        return driver.page_source
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm headless-browser pool with plain HTTP fallback")
+    parser.add_argument("--pages", type=int, default=60, help="pages per kind (static and app)")
+    parser.add_argument("--pool", type=int, default=4, help="browsers in the pool")
+    parser.add_argument("--recycle-after", type=int, default=50)
+    parser.add_argument("--no-sandbox", action="store_true", help="pass --no-sandbox to Chrome (containers)")
+    args = parser.parse_args()
+
+    if requests is None:
+        print("requests not installed")
+        print("Install with: pip install requests")
+        raise SystemExit
+
+    with tempfile.TemporaryDirectory() as root:
+        write_site(root, args.pages)
+        server, served = serve_site(root)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        static = [f"{base}/static/{i}.html" for i in range(args.pages)]
+        app = [f"{base}/app/{i}.html" for i in range(args.pages)]
+        print(f"Local site: {args.pages} server-rendered + {args.pages} JavaScript pages\n")
+
+        http_only = SmartFetcher(SITE_SPEC)
+        decisions = Counter(http_only.needs_browser(requests.get(url).text) for url in static + app)
+        print(f"1. Plain HTTP check: {decisions[False]} pages complete without JavaScript, "
+              f"{decisions[True]} need the browser")
+
+        extra_args = ["--no-sandbox"] if args.no_sandbox else []
+        factory = partial(chrome_driver, extra_args=extra_args)
+        try:
+            factory().quit()
+        except Exception as error:  # no selenium, no Chrome, no display...
+            print(f"\nNo browser available ({type(error).__name__}: {str(error).splitlines()[0][:80]})")
+            print("Install with: pip install selenium - and install Chrome")
+            raise SystemExit
+
+        jobs = app[:min(10, args.pages)]
+        served.clear()
+        start = time.perf_counter()
+        for url in jobs:
+            new_browser_per_job(url, extra_args)
+        per_job = (time.perf_counter() - start) / len(jobs)
+        print(f"2. webdriver.Chrome() per job: {per_job:.2f}s per page, "
+              f"{served['.jpg']} images + {served['.woff2']} fonts downloaded for {len(jobs)} pages")
+
+        served.clear()
+        fetcher = SmartFetcher(SITE_SPEC, pool_size=args.pool, recycle_after=args.recycle_after,
+                               driver_factory=factory)
+        start = time.perf_counter()
+        results = fetcher.fetch_many(static + app)
+        elapsed = time.perf_counter() - start
+        pool = fetcher.pool
+        extract = extraction.compile_spec(SITE_SPEC).extract
+        complete = sum(extract(html)["price"] is not None for _, html, _ in results)
+        print(f"3. SmartFetcher + pool of {args.pool}: {len(results)} pages in {elapsed:.1f}s "
+              f"({elapsed / len(results):.2f}s per page), via http: {fetcher.stats['http']}, "
+              f"via browser: {fetcher.stats['browser']}")
+        print(f"   prices found: {complete}/{len(results)}, browsers started: {pool.started} "
+              f"({pool.stats['startup_seconds'] / pool.started:.1f}s each), recycled: {pool.stats['recycled']}")
+        print(f"   images downloaded: {served['.jpg']}, fonts: {served['.woff2']} (blocked in the pool)")
+        fetcher.close()
+        server.shutdown()
@@ -0,0 +1,102 @@
+"""Tests for rollback in 33_rename_planner.py and 34_rename_templates.py (run with: pytest)."""
+
+import importlib
+
+import pytest
+
+# Module names starting with a digit cannot be imported with "import ..."
+planner = importlib.import_module("33_rename_planner")
+templates = importlib.import_module("34_rename_templates")
+
+
+def make_files(folder, names):
+    for name in names:
+        (folder / name).write_text(name)
+
+
+def state(folder):
+    """{name: content} of the planned files (temp names and the journal left out)."""
+    return {path.name: path.read_text() for path in folder.iterdir() if not path.name.startswith(planner.TEMP_PREFIX)}
+
+
+@pytest.mark.parametrize("renames", [
+    {"a.txt": "b.txt", "b.txt": "c.txt"},                    # chain
+    {"b.txt": "a.txt", "c.txt": "b.txt"},                    # chain, the other way round
+    {"a.txt": "b.txt", "b.txt": "a.txt"},                    # swap
+    {"x.txt": "y.txt", "y.txt": "z.txt", "z.txt": "x.txt"},  # rotation
+])
+def test_rollback_of_chains_and_cycles(tmp_path, renames):
+    make_files(tmp_path, renames)
+    before = state(tmp_path)
+    plan = planner.plan_renames(tmp_path, lambda name, number: renames[name], match=renames.__contains__)
+    plan.execute()
+    assert state(tmp_path) == {target: source for source, target in renames.items()}
+
+    assert planner.rollback(tmp_path / planner.JOURNAL_NAME) == len(renames)
+    assert state(tmp_path) == before
+    assert not [path for path in tmp_path.iterdir() if path.name.endswith(".tmp")]
+
+
+def test_rollback_of_interrupted_chain(tmp_path):
+    renames = {f"{i}.txt": f"{i + 1}.txt" for i in range(5)}  # 0 → 1 → ... → 5
+    make_files(tmp_path, renames)
+    before = state(tmp_path)
+    plan = planner.plan_renames(tmp_path, lambda name, number: renames[name], match=renames.__contains__)
+
+    def crash_in_phase_2(phase, batch, batches):
+        if phase == 2:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        plan.execute(batch_size=2, workers=1, on_batch=crash_in_phase_2)
+    planner.rollback(tmp_path / planner.JOURNAL_NAME)
+    assert state(tmp_path) == before
+
+
+def test_rollback_tree_of_chain(tmp_path):
+    folder = tmp_path / "album"
+    folder.mkdir()
+    make_files(folder, ["IMG_1.jpg", "IMG_2.jpg", "IMG_3.jpg"])
+    before = state(folder)
+    # renumbering from 0 is a chain: IMG_1 → IMG_0, IMG_2 → IMG_1, IMG_3 → IMG_2
+    template = templates.RenameTemplate("IMG_{n}.jpg", pattern=r"IMG_\d+\.jpg", start=0)
+    templates.rename_tree(tmp_path, template, dry_run=False, workers=1)
+    assert state(folder) == {"IMG_0.jpg": "IMG_1.jpg", "IMG_1.jpg": "IMG_2.jpg", "IMG_2.jpg": "IMG_3.jpg"}
+
+    assert templates.rollback_tree(tmp_path, workers=1) == 3
+    assert state(folder) == before
+
+
+def test_second_rollback_changes_nothing(tmp_path):
+    renames = {"a.txt": "b.txt", "b.txt": "c.txt"}
+    make_files(tmp_path, renames)
+    before = state(tmp_path)
+    planner.plan_renames(tmp_path, lambda name, number: renames[name], match=renames.__contains__).execute()
+    journal = tmp_path / planner.JOURNAL_NAME
+
+    assert planner.rollback(journal) == 2
+    assert planner.rollback(journal) == 0
+    assert state(tmp_path) == before
+
+
+
+def test_rollback_tree_undoes_one_run_at_a_time(tmp_path):
+    for album in ("a", "b"):
+        (tmp_path / album).mkdir()
+        make_files(tmp_path / album, ["IMG_1.jpg", "IMG_2.jpg"])
+    make_files(tmp_path / "b", ["DSC_1.jpg"])
+    before = state(tmp_path / "a")
+    templates.rename_tree(tmp_path, templates.RenameTemplate("x_{n}.jpg", pattern=r"IMG_\d+\.jpg"),
+                          dry_run=False, workers=1)
+    renamed = state(tmp_path / "a")
+    # the second run only has something to do in album b
+    templates.rename_tree(tmp_path, templates.RenameTemplate("d_{n}.jpg", pattern=r"DSC_\d+\.jpg"),
+                          dry_run=False, workers=1)
+
+    assert templates.rollback_tree(tmp_path, workers=1) == 1  # the second run only
+    assert state(tmp_path / "a") == renamed
+    assert "DSC_1.jpg" in state(tmp_path / "b")
+    assert templates.rollback_tree(tmp_path, workers=1) == 2  # then the first run (album a's journal)
+    assert state(tmp_path / "a") == before
+    assert templates.rollback_tree(tmp_path, workers=1) == 0  # nothing left: no names toggle back
+    assert state(tmp_path / "a") == before